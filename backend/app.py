@@ -6,6 +6,18 @@ import os
 # 导入配置和模型
 from config import config
 from models import db, User, Category, Question, PracticeRecord
+from utils.etag import init_table_versions
+from utils.compression import init_compression
+from utils.change_log import init_change_log
+from utils.metrics import init_metrics
+from utils.password_hasher import init_password_hasher
+from utils.token_revocation import init_token_revocation
+from utils.db_routing import init_db_routing
+from utils.cache import init_cache
+from services.ocr import init_ocr
+from services.llm_client import init_llm_client
+from services.paper_generator import init_question_index
+from services.question_bulk import init_question_bulk
 
 # 导入路由蓝图
 from routes.auth_routes import auth_bp
@@ -17,6 +29,7 @@ from routes.upload_routes import upload_bp
 from routes.dashboard_routes import dashboard_bp
 from routes.favorites_routes import favorites_bp
 from routes.api_routes import api_bp
+from routes.sync_routes import sync_bp
 
 def create_app(config_name='development'):
     """应用工厂函数"""
@@ -27,6 +40,13 @@ def create_app(config_name='development'):
     
     # 初始化扩展
     db.init_app(app)
+    init_db_routing(app)
+    init_cache(app)
+    init_password_hasher(app)
+    init_token_revocation(app)
+    init_ocr(app)
+    init_llm_client(app)
+    init_question_index(app)
     # 配置CORS，允许前端访问
     CORS(app, 
          origins=['http://localhost:3000', 'http://127.0.0.1:3000', 'http://localhost:3001', 'http://127.0.0.1:3001', 'http://localhost:3002', 'http://127.0.0.1:3002'],
@@ -34,6 +54,8 @@ def create_app(config_name='development'):
          allow_headers=['Content-Type', 'Authorization'],
          methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
     migrate = Migrate(app, db)
+    init_compression(app)
+    init_metrics(app)
     
     # 注册蓝图
     app.register_blueprint(auth_bp)
@@ -45,6 +67,7 @@ def create_app(config_name='development'):
     app.register_blueprint(dashboard_bp)
     app.register_blueprint(favorites_bp)
     app.register_blueprint(api_bp)
+    app.register_blueprint(sync_bp)
     
     # 创建数据库表和初始数据
     with app.app_context():
@@ -78,6 +101,13 @@ def create_app(config_name='development'):
             db.session.commit()
             print('✅ 默认分类创建完成')
     
+    # 数据表版本号（ETag条件请求）
+    init_table_versions(app)
+    # 题目变更日志（增量同步）
+    init_change_log(app)
+    # 清理上次退出时中断的批量任务
+    init_question_bulk(app)
+    
     return app
 
 # 创建应用实例
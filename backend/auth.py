@@ -1,42 +1,64 @@
 from functools import wraps
 from flask import request, jsonify, current_app
 import jwt
+import uuid
 from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
 from models import User, db
+from utils.password_hasher import password_hasher
+from utils.token_revocation import revocation_set
 
 def generate_token(user_id):
     """生成JWT令牌"""
     payload = {
         'user_id': user_id,
         'exp': datetime.utcnow() + timedelta(days=7),  # 7天过期
-        'iat': datetime.utcnow()
+        'iat': datetime.utcnow(),
+        'jti': uuid.uuid4().hex  # 令牌唯一ID，用于登出吊销
     }
     return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
 
-def verify_token(token):
-    """验证JWT令牌"""
+def decode_token(token):
+    """解码JWT令牌，无效、过期或已吊销时返回None"""
     try:
         payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        return payload['user_id']
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    
+    # 旧版本签发的令牌没有jti，无法吊销，只能等待自然过期
+    jti = payload.get('jti')
+    if jti and revocation_set.is_revoked(jti):
+        return None
+    return payload
+
+def verify_token(token):
+    """验证JWT令牌"""
+    payload = decode_token(token)
+    return payload['user_id'] if payload else None
+
+def get_request_token():
+    """从请求头中取出Bearer令牌
+
+    Returns:
+        str: 令牌；没有认证头时返回None
+        
+    Raises:
+        IndexError: 认证头格式不正确
+    """
+    if 'Authorization' not in request.headers:
+        return None
+    return request.headers['Authorization'].split(' ')[1]  # Bearer <token>
 
 def token_required(f):
     """装饰器：要求用户登录"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
         # 从请求头获取token
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                token = auth_header.split(' ')[1]  # Bearer <token>
-            except IndexError:
-                return jsonify({'error': '无效的认证头格式'}), 401
+        try:
+            token = get_request_token()
+        except IndexError:
+            return jsonify({'error': '无效的认证头格式'}), 401
         
         if not token:
             return jsonify({'error': '缺少认证令牌'}), 401
@@ -65,9 +87,13 @@ def admin_required(f):
     return decorated
 
 def hash_password(password):
-    """密码哈希"""
-    return generate_password_hash(password)
+    """密码哈希（在有界线程池中执行，繁忙时抛出 PasswordHasherBusy）"""
+    return password_hasher.hash(password)
 
 def verify_password(password_hash, password):
-    """验证密码"""
-    return check_password_hash(password_hash, password)
\ No newline at end of file
+    """验证密码（在有界线程池中执行，繁忙时抛出 PasswordHasherBusy）"""
+    return password_hasher.verify(password_hash, password)
+
+def password_needs_rehash(password_hash):
+    """密码哈希参数与当前配置不一致时需要重新哈希"""
+    return password_hasher.needs_rehash(password_hash)
\ No newline at end of file
@@ -0,0 +1 @@
+# 性能基准测试
\ No newline at end of file
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应压缩基准测试
+
+模拟1万道题目的题库列表响应，比较各压缩编码的体积和耗时。
+
+用法（在backend目录下）：
+    python -m benchmarks.bench_compression [题目数量] [压缩级别]
+"""
+
+import json
+import random
+import sys
+import time
+from datetime import datetime
+
+from utils.compression import available_encodings, compress_bytes, compress_iter
+
+
+def build_listing(count, seed=7):
+    """生成与 Question.to_dict() 结构一致的题目列表"""
+    rng = random.Random(seed)
+    words = ['函数', '导数', '极限', '方程', '概率', '向量', '数列', '集合', '积分', '不等式',
+             'function', 'limit', 'matrix', 'vector', 'proof']
+    now = datetime.utcnow().isoformat()
+    items = []
+    for i in range(count):
+        sentence = lambda n: ''.join(rng.choice(words) for _ in range(n))
+        items.append({
+            'id': i + 1,
+            'category_id': rng.randint(1, 10),
+            'user_id': rng.randint(1, 50),
+            'type': rng.choice(['single_choice', 'multiple_choice', 'true_false', 'fill_blank']),
+            'content': sentence(rng.randint(8, 30)),
+            'options': [f'{letter}. {sentence(rng.randint(2, 6))}' for letter in 'ABCD'],
+            'answer': rng.choice(['A', 'B', ['A', 'C'], True]),
+            'explanation': sentence(rng.randint(20, 80)),
+            'difficulty': rng.randint(1, 5),
+            'source_file': f'paper_{rng.randint(1, 200)}.pdf',
+            'tags': [rng.choice(words) for _ in range(3)],
+            'is_active': True,
+            'created_at': now,
+            'updated_at': now,
+        })
+    return items
+
+
+def timed(func, repeat=3):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    level = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    items = build_listing(count)
+
+    body, serialize_seconds = timed(lambda: json.dumps({'questions': items}, ensure_ascii=False).encode())
+    print(f"题目数量: {count}，压缩级别: {level}")
+    print(f"{'identity':10s} {len(body):>12,d} B  序列化 {serialize_seconds * 1000:8.2f} ms")
+
+    for encoding in available_encodings():
+        compressed, seconds = timed(lambda: compress_bytes(encoding, body, level))
+        ratio = len(compressed) / len(body)
+        print(f"{encoding:10s} {len(compressed):>12,d} B  压缩 {seconds * 1000:8.2f} ms  比例 {ratio:6.1%}")
+
+        # 生成器响应：按500道题一块流式压缩
+        def streamed():
+            chunks = (json.dumps(items[i:i + 500], ensure_ascii=False) for i in range(0, count, 500))
+            return b''.join(compress_iter(encoding, chunks, level))
+        streamed_body, seconds = timed(streamed)
+        print(f"{encoding + '/流式':10s} {len(streamed_body):>12,d} B  序列化+压缩 {seconds * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
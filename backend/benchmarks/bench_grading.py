@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+判分微基准测试
+
+对比"每次提交都解析并归一化答案"与"预编译匹配器 + 缓存"两种判分方式。
+
+用法（在backend目录下）：
+    python -m benchmarks.bench_grading [作答数量] [重复次数]
+"""
+
+import json
+import random
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from services.answer_grader import AnswerGrader, compile_answer
+
+
+def build_questions(count, seed=42, pool_size=500):
+    """生成各题型混合的模拟作答，题目从 pool_size 道题中抽取（模拟整班做同一套题）"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    questions, answers = [], []
+    for _ in range(count):
+        i = rng.randrange(pool_size)
+        kind = ('single_choice', 'multiple_choice', 'true_false', 'fill_blank')[i % 4]
+        if kind == 'single_choice':
+            answer, given = 'B', rng.choice(['B', 'ｂ', 'C'])
+        elif kind == 'multiple_choice':
+            answer, given = ['A', 'C', 'D'], rng.choice(['ACD', 'Ａ，Ｃ，Ｄ', 'AC'])
+        elif kind == 'true_false':
+            answer, given = True, rng.choice(['正确', 'true', '错误'])
+        else:
+            answer, given = [['北京', '北平'], 'Ｈ２Ｏ'], rng.choice([['北平', 'h2o'], ['上海', 'H2O']])
+        questions.append(SimpleNamespace(id=i, type=kind, answer=json.dumps(answer, ensure_ascii=False),
+                                         updated_at=now))
+        answers.append(json.dumps(given, ensure_ascii=False))
+    return questions, answers
+
+
+def run_uncached(questions, answers):
+    """每次都重新编译答案"""
+    return [compile_answer(q.type, q.answer).match(a) for q, a in zip(questions, answers)]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    questions, answers = build_questions(count)
+    grader = AnswerGrader(max_entries=count)
+    grader.grade_batch(questions, answers)  # 预热缓存
+
+    timings = {}
+    for name, func in [
+        ('uncached', lambda: run_uncached(questions, answers)),
+        ('cached_single', lambda: [grader.grade(q, a) for q, a in zip(questions, answers)]),
+        ('cached_batch', lambda: grader.grade_batch(questions, answers)),
+    ]:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+
+    print(f"作答数量: {count}，重复次数: {repeat}（取最优）")
+    for name, seconds in timings.items():
+        print(f"{name:15s} {seconds * 1000:9.2f} ms  {count / seconds:12.0f} 题/秒")
+    print(f"缓存命中: {grader.hits}，未命中: {grader.misses}")
+
+
+if __name__ == '__main__':
+    main()
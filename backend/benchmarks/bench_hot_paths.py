@@ -0,0 +1,128 @@
+"""
+请求热路径基准测试：JWT令牌、API密钥加解密、密码哈希、模型序列化
+"""
+
+import json
+import uuid
+from datetime import datetime
+from flask import Flask
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from benchmarks.runner import benchmark
+from auth import generate_token, verify_token
+from models import (User, Category, Question, PracticeRecord, WrongAnswer, Favorite,
+                    UploadRecord, ProcessingLog)
+from utils.crypto import CryptoManager
+from utils.token_revocation import RevocationSet, revocation_set
+
+API_KEY = 'sk-abcdefghijklmnopqrstuvwxyz0123456789ABCDEFGH'
+PASSWORD = 'correct horse battery staple'
+
+_app = Flask(__name__)
+_app.config['SECRET_KEY'] = 'benchmark-secret-key-0123456789abcdef'
+
+
+@benchmark('auth.generate_token', 'JWT签发')
+def bench_generate_token():
+    # auth 依赖 current_app，基准测试期间保持应用上下文
+    _app.app_context().push()
+    return lambda: generate_token(42)
+
+
+@benchmark('auth.verify_token', 'JWT校验（含吊销检查）')
+def bench_verify_token():
+    _app.app_context().push()
+    revocation_set.sync_interval = None  # 不连接数据库
+    token = generate_token(42)
+    return lambda: verify_token(token)
+
+
+@benchmark('auth.is_revoked', '吊销集合查询（10万个已吊销令牌，未命中）')
+def bench_is_revoked():
+    revoked = RevocationSet(sync_interval=None)
+    expires_at = datetime(2100, 1, 1)
+    for _ in range(100000):
+        revoked.add(uuid.uuid4().hex, expires_at)
+    jti = uuid.uuid4().hex
+    return lambda: revoked.is_revoked(jti)
+
+
+@benchmark('crypto.encrypt_api_key', 'API密钥加密')
+def bench_encrypt_api_key():
+    manager = CryptoManager('benchmark')
+    return lambda: manager.encrypt_api_key(API_KEY, 42)
+
+
+@benchmark('crypto.decrypt_api_key', 'API密钥解密')
+def bench_decrypt_api_key():
+    manager = CryptoManager('benchmark')
+    encrypted = manager.encrypt_api_key(API_KEY, 42)
+    return lambda: manager.decrypt_api_key(encrypted, 42)
+
+
+@benchmark('crypto.mask_api_key', 'API密钥遮蔽')
+def bench_mask_api_key():
+    manager = CryptoManager('benchmark')
+    return lambda: manager.mask_api_key(API_KEY)
+
+
+@benchmark('password.generate_hash', 'werkzeug 密码哈希（默认参数）')
+def bench_generate_password_hash():
+    return lambda: generate_password_hash(PASSWORD)
+
+
+@benchmark('password.check_hash', 'werkzeug 密码校验（默认参数）')
+def bench_check_password_hash():
+    password_hash = generate_password_hash(PASSWORD)
+    return lambda: check_password_hash(password_hash, PASSWORD)
+
+
+def _model_instances():
+    """构造不依赖数据库的模型实例"""
+    now = datetime.utcnow()
+    return {
+        'User': User(id=1, username='student', email='s@example.com', nickname='同学', role='user',
+                     is_active=True, created_at=now, updated_at=now),
+        'Category': Category(id=1, name='数学', description='数学相关题目', sort_order=1, is_default=False,
+                             created_at=now, updated_at=now),
+        'Question': Question(id=1, category_id=1, user_id=1, type='multiple_choice',
+                             content='下列函数中，在定义域内单调递增的是（ ）',
+                             options=json.dumps(['A. y=x^2', 'B. y=2^x', 'C. y=log2(x)', 'D. y=1/x'],
+                                                ensure_ascii=False),
+                             answer=json.dumps(['B', 'C']), explanation='指数函数与对数函数的单调性。' * 5,
+                             difficulty=3, source_file='paper.pdf', tags=json.dumps(['函数', '单调性'],
+                                                                                  ensure_ascii=False),
+                             is_active=True, created_at=now, updated_at=now),
+        'PracticeRecord': PracticeRecord(id=1, user_id=1, question_id=1, session_id='s-1',
+                                         user_answer=json.dumps(['B', 'C']), is_correct=True,
+                                         duration_seconds=30, practice_mode='practice', practiced_at=now),
+        'WrongAnswer': WrongAnswer(id=1, user_id=1, question_id=1, error_count=2, last_error_at=now,
+                                   is_mastered=False, added_at=now),
+        'Favorite': Favorite(id=1, user_id=1, question_id=1, notes='重点', added_at=now),
+        'UploadRecord': UploadRecord(id=1, user_id=1, original_filename='试卷.pdf', stored_filename='abc.pdf',
+                                     file_path='/uploads/abc.pdf', file_size=1024, file_type='pdf',
+                                     status='completed', extracted_count=20, saved_count=18,
+                                     uploaded_at=now, processed_at=now, max_chunk_size=3000),
+        'ProcessingLog': ProcessingLog(id=1, upload_record_id=1, step_name='AI提取', step_type='extraction',
+                                       status='completed', message='提取完成', ai_reasoning='分析过程' * 200,
+                                       duration_ms=1200, created_at=now),
+    }
+
+
+def _register_to_dict(model_name):
+    @benchmark(f'to_dict.{model_name}', f'{model_name}.to_dict()')
+    def bench():
+        instance = _model_instances()[model_name]
+        return instance.to_dict
+
+
+for _model_name in ('User', 'Category', 'Question', 'PracticeRecord', 'WrongAnswer', 'Favorite',
+                    'UploadRecord', 'ProcessingLog'):
+    _register_to_dict(_model_name)
+
+
+@benchmark('user.get_api_config', 'User.get_api_config()（含解密与遮蔽）')
+def bench_get_api_config():
+    user = _model_instances()['User']
+    user.set_api_key(API_KEY)
+    return user.get_api_config
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行热路径基准测试并与基线对比
+
+用法（在backend目录下）：
+    python -m benchmarks.run                       # 运行全部基准测试
+    python -m benchmarks.run --filter 'crypto.*'   # 只运行匹配的测试
+    python -m benchmarks.run --save main           # 保存为基线 baselines/main.json
+    python -m benchmarks.run --compare main        # 与基线对比，吞吐回退超过阈值时返回非零退出码
+"""
+
+import argparse
+import sys
+
+from benchmarks import bench_hot_paths  # noqa: F401  注册基准测试
+from benchmarks.runner import run_benchmarks, save_baseline, load_baseline, format_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='热路径微基准测试')
+    parser.add_argument('--filter', default='*', help='按名称过滤（支持通配符）')
+    parser.add_argument('--rounds', type=int, default=5, help='每项测试的轮数')
+    parser.add_argument('--min-time', type=float, default=0.2, help='每轮最短耗时（秒）')
+    parser.add_argument('--save', metavar='LABEL', help='把结果保存为基线')
+    parser.add_argument('--compare', metavar='LABEL', help='与指定基线对比')
+    parser.add_argument('--threshold', type=float, default=0.10, help='判定回退的吞吐下降比例')
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    results = run_benchmarks(args.filter, rounds=args.rounds, min_time=args.min_time)
+    report, regressed = format_report(results, baseline, args.threshold)
+    print(report)
+
+    if args.save:
+        print(f"✅ 基线已保存: {save_baseline(results, args.save)}")
+    if regressed:
+        print("❌ 存在超过阈值的性能回退")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import fnmatch
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+
+BASELINE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# 已注册的基准测试：名称 -> (准备函数, 说明)
+_registry = {}
+
+
+def benchmark(name, description=''):
+    """装饰器：注册一个基准测试
+
+    被装饰的函数负责准备数据并返回一个无参可调用对象，计时只覆盖该可调用对象。
+    """
+    def decorator(setup):
+        _registry[name] = (setup, description)
+        return setup
+    return decorator
+
+
+def _calibrate(func, min_time):
+    """找到一轮耗时不少于 min_time 的循环次数"""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1_000_000:
+            return number
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+
+
+def _measure_allocations(func, calls):
+    """用 tracemalloc 统计单次调用的峰值内存和分配块数"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        peak = 0
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            func()
+            _, call_peak = tracemalloc.get_traced_memory()
+            peak = max(peak, call_peak - base)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    return peak, blocks / calls
+
+
+def run_benchmarks(pattern='*', rounds=5, min_time=0.2, allocation_calls=20):
+    """运行匹配的基准测试
+
+    Returns:
+        dict: 名称 -> {'ops_per_sec', 'mean_us', 'peak_bytes', 'retained_blocks', ...}
+    """
+    results = {}
+    for name in sorted(_registry):
+        if not fnmatch.fnmatch(name, pattern):
+            continue
+        setup, description = _registry[name]
+        func = setup()
+        func()  # 预热
+        number = _calibrate(func, min_time)
+
+        timings = []
+        for _ in range(rounds):
+            gc.collect()
+            started = time.perf_counter()
+            for _ in range(number):
+                func()
+            timings.append((time.perf_counter() - started) / number)
+
+        best = min(timings)
+        peak, blocks = _measure_allocations(func, min(allocation_calls, number))
+        results[name] = {
+            'description': description,
+            'ops_per_sec': 1.0 / best,
+            'mean_us': sum(timings) / len(timings) * 1e6,
+            'best_us': best * 1e6,
+            'peak_bytes': peak,
+            'retained_blocks': blocks,
+            'loops': number,
+            'rounds': rounds,
+        }
+    return results
+
+
+def save_baseline(results, label):
+    """保存基线结果"""
+    os.makedirs(BASELINE_FOLDER, exist_ok=True)
+    path = os.path.join(BASELINE_FOLDER, f'{label}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'label': label,
+            'created_at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.platform(),
+            'results': results,
+        }, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_baseline(label):
+    """读取基线结果"""
+    with open(os.path.join(BASELINE_FOLDER, f'{label}.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def format_report(results, baseline=None, threshold=0.10):
+    """生成对比报告
+
+    Args:
+        results: 本次运行结果
+        baseline: load_baseline() 的返回值，可选
+        threshold: 吞吐下降超过该比例时标记为回退
+
+    Returns:
+        tuple: (报告文本, 是否存在回退)
+    """
+    base_results = baseline['results'] if baseline else {}
+    lines = [f"{'基准测试':36s} {'ops/秒':>12s} {'均值(us)':>11s} {'峰值内存':>10s} {'残留块':>8s} {'对比基线':>10s}"]
+    regressed = False
+    for name, result in results.items():
+        compare = ''
+        base = base_results.get(name)
+        if base:
+            change = result['ops_per_sec'] / base['ops_per_sec'] - 1
+            compare = f'{change:+.1%}'
+            if change < -threshold:
+                compare += ' ⚠'
+                regressed = True
+        lines.append(f"{name:36s} {result['ops_per_sec']:12,.0f} {result['mean_us']:11.2f} "
+                     f"{result['peak_bytes']:>9,d}B {result['retained_blocks']:8.1f} {compare:>10s}")
+    if baseline:
+        lines.append(f"基线: {baseline['label']}（{baseline['created_at']}，Python {baseline['python']}）")
+    return '\n'.join(lines), regressed
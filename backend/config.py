@@ -9,20 +9,141 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///shuashuati.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # 只读副本配置：DATABASE_REPLICA_URLS 为逗号分隔的副本地址，GET/HEAD 请求读副本，写入走主库
+    SQLALCHEMY_BINDS = {
+        f'replica_{index}': url.strip()
+        for index, url in enumerate((os.environ.get('DATABASE_REPLICA_URLS') or '').split(','))
+        if url.strip()
+    }
+    DB_REPLICA_BINDS = sorted(SQLALCHEMY_BINDS)
+    DB_REPLICA_MAX_LAG_SECONDS = float(os.environ.get('DB_REPLICA_MAX_LAG_SECONDS', 5))  # 超过则回退主库
+    DB_REPLICA_CHECK_SECONDS = float(os.environ.get('DB_REPLICA_CHECK_SECONDS', 2))  # 后台线程的心跳检测间隔
+    DB_READ_STICKY_SECONDS = float(os.environ.get('DB_READ_STICKY_SECONDS', 10))  # 写入后读主库的时长
+    
     # 文件上传配置
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+    BLOB_FOLDER = os.path.join(UPLOAD_FOLDER, 'blobs')  # 内容寻址存储（按SHA-256分片）
+    UPLOAD_TEMP_FOLDER = os.path.join(UPLOAD_FOLDER, 'tmp')  # 写入中的临时文件
+    # 旧版 .doc 是二进制格式，无法直接提取文本，需另存为 .docx 后上传
+    ALLOWED_EXTENSIONS = {'txt', 'pdf', 'docx', 'png', 'jpg', 'jpeg', 'gif'}
+    
+    # 断点续传配置：分块大小需小于 MAX_CONTENT_LENGTH，未完成的会话超时后清理
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024))
+    UPLOAD_MAX_FILE_SIZE = int(os.environ.get('UPLOAD_MAX_FILE_SIZE', 1024 * 1024 * 1024))  # 1GB
+    UPLOAD_SESSION_TTL_HOURS = int(os.environ.get('UPLOAD_SESSION_TTL_HOURS', 24))
+    
+    # OCR配置：扫描件逐页分发到进程池识别，结果按页面图片哈希缓存
+    TESSERACT_CMD = os.environ.get('TESSERACT_CMD', 'tesseract')
+    OCR_LANG = os.environ.get('OCR_LANG', 'chi_sim+eng')
+    OCR_WORKERS = int(os.environ.get('OCR_WORKERS', 0)) or None  # 默认等于CPU核数
+    OCR_PAGE_TIMEOUT = int(os.environ.get('OCR_PAGE_TIMEOUT', 120))  # 单页超时（秒）
+    OCR_CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, 'ocr_cache')
+    
+    # 大模型接口配置：用户未设置 api_base_url 时使用 SILICONFLOW_API_URL，同一地址的连接在进程内复用
+    LLM_DEFAULT_BASE_URL = os.environ.get('SILICONFLOW_API_URL', 'https://api.siliconflow.cn/v1')
+    LLM_CONNECT_TIMEOUT = float(os.environ.get('LLM_CONNECT_TIMEOUT', 10))
+    LLM_READ_TIMEOUT = float(os.environ.get('LLM_READ_TIMEOUT', 60))  # 流式响应两段数据之间的最长间隔
+    LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 3))
+    LLM_RETRY_BACKOFF = float(os.environ.get('LLM_RETRY_BACKOFF', 0.5))  # 退避基数（秒），实际等待时间随机抖动
+    LLM_POOL_SIZE = int(os.environ.get('LLM_POOL_SIZE', 10))  # 每个接口地址保持的最大连接数
+    # 按token预算装箱文本块：输入 + 提示词 + 输出上限（用户的 max_tokens）不超过模型上下文，
+    # 且按输出/输入比例估算，模型输出的题目JSON不会超过 max_tokens 被截断
+    LLM_CONTEXT_TOKENS = int(os.environ.get('LLM_CONTEXT_TOKENS', 8192))
+    LLM_OUTPUT_RATIO = float(os.environ.get('LLM_OUTPUT_RATIO', 1.5))  # 输出token / 输入文本token
+    # 上传完成后自动在后台解析：OCR、装箱和大模型提取流水线执行，提取出的题目逐题入库
+    UPLOAD_AUTO_PROCESS = os.environ.get('UPLOAD_AUTO_PROCESS', 'true').lower() == 'true'
+    UPLOAD_PROCESSING_WORKERS = int(os.environ.get('UPLOAD_PROCESSING_WORKERS', 2))  # 同时解析的文件数
+    
+    # 离线题包配置
+    PACK_FOLDER = os.path.join(UPLOAD_FOLDER, 'packs')
+    PACK_COMPRESSION_LEVEL = int(os.environ.get('PACK_COMPRESSION_LEVEL', 9))
     
     # Session配置
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
     
+    # 令牌吊销配置：各 worker 从 revoked_tokens 表同步登出记录的间隔（秒）
+    TOKEN_REVOCATION_SYNC_SECONDS = int(os.environ.get('TOKEN_REVOCATION_SYNC_SECONDS', 5))
+    
+    # 密码哈希配置：修改算法或强度后，用户下次登录时自动重新哈希
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) or None  # 默认等于CPU核数
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16))  # 排队上限，超出返回503
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+    
+    # 限流配置：memory:// 为单进程内存存储，多 worker 部署时使用 redis://host:6379/0
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_STORAGE_URL = os.environ.get('RATE_LIMIT_STORAGE_URL', 'memory://')
+    RATE_LIMIT_TRUST_PROXY = os.environ.get('RATE_LIMIT_TRUST_PROXY', 'false').lower() == 'true'
+    
+    # 缓存配置：memory:// 只使用进程内LRU，多 worker 部署时可使用 redis://host:6379/1 共享缓存（练习会话需要共享层）
+    CACHE_STORAGE_URL = os.environ.get('CACHE_STORAGE_URL', 'memory://')
+    CACHE_LOCAL_MAX_ENTRIES = int(os.environ.get('CACHE_LOCAL_MAX_ENTRIES', 10000))  # 未配置共享层时练习会话也保存在这里
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 300))  # 秒
+    CACHE_LOCK_TIMEOUT = float(os.environ.get('CACHE_LOCK_TIMEOUT', 5.0))  # 回源锁的最长持有时间（秒）
+    
+    # 练习会话配置：题目队列和进度保存在缓存层，缓存中没有时（被淘汰、未共享缓存的其他 worker）从数据库恢复；过期后需重新开始
+    PRACTICE_SESSION_TTL_HOURS = float(os.environ.get('PRACTICE_SESSION_TTL_HOURS', 6))
+    PRACTICE_SESSION_MAX_QUESTIONS = int(os.environ.get('PRACTICE_SESSION_MAX_QUESTIONS', 200))
+    
+    # 组卷配置：题目索引保存在各进程内存中，题目表有变更时最多每隔 PAPER_INDEX_REFRESH_SECONDS 秒重建
+    PAPER_MAX_QUESTIONS = int(os.environ.get('PAPER_MAX_QUESTIONS', 200))
+    PAPER_DIFFICULTY_TOLERANCE = float(os.environ.get('PAPER_DIFFICULTY_TOLERANCE', 0.25))  # 平均难度允许的偏差
+    PAPER_INDEX_REFRESH_SECONDS = float(os.environ.get('PAPER_INDEX_REFRESH_SECONDS', 30))
+    
+    # 条件请求配置（ETag / If-None-Match）
+    ETAG_ENABLED = os.environ.get('ETAG_ENABLED', 'true').lower() == 'true'
+    
+    # 响应压缩配置（br/zstd 需要安装可选依赖，未安装时自动跳过）
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_ALGORITHMS = ['br', 'zstd', 'gzip']  # 服务端偏好顺序
+    COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # 小于该字节数不压缩
+    
+    # 增量同步配置：只返回若干秒前的变更，避免并发事务提交顺序导致漏同步
+    SYNC_SETTLE_SECONDS = int(os.environ.get('SYNC_SETTLE_SECONDS', 2))
+    
+    # 题库导入导出配置：导入直接读取请求流，不受 MAX_CONTENT_LENGTH 限制
+    QUESTION_EXPORT_CHUNK_SIZE = int(os.environ.get('QUESTION_EXPORT_CHUNK_SIZE', 1000))
+    QUESTION_IMPORT_BATCH_SIZE = int(os.environ.get('QUESTION_IMPORT_BATCH_SIZE', 1000))
+    QUESTION_IMPORT_MAX_BYTES = int(os.environ.get('QUESTION_IMPORT_MAX_BYTES', 2 * 1024 * 1024 * 1024))  # 2GB
+    # 题目批量操作：每块一个事务；匹配的题目超过 QUESTION_BULK_SYNC_LIMIT 时转为后台任务
+    QUESTION_BULK_CHUNK_SIZE = int(os.environ.get('QUESTION_BULK_CHUNK_SIZE', 500))
+    QUESTION_BULK_SYNC_LIMIT = int(os.environ.get('QUESTION_BULK_SYNC_LIMIT', 5000))
+    # 执行中的后台任务超过该时长没有心跳时视为已中断（进程重启或退出），标记为失败
+    QUESTION_BULK_STALE_SECONDS = int(os.environ.get('QUESTION_BULK_STALE_SECONDS', 600))
+    
+    # 练习记录归档配置：早于该天数（向前取整到月初）的记录移入 practice_archives
+    PRACTICE_ARCHIVE_DAYS = int(os.environ.get('PRACTICE_ARCHIVE_DAYS', 180))
+    PRACTICE_ARCHIVE_BATCH_SIZE = int(os.environ.get('PRACTICE_ARCHIVE_BATCH_SIZE', 20000))  # 每个事务归档的记录数
+    PRACTICE_ARCHIVE_COMPRESSION_LEVEL = int(os.environ.get('PRACTICE_ARCHIVE_COMPRESSION_LEVEL', 9))
+    
+    # 难度校准配置（scripts/calibrate_difficulty.py）：作答数达到下限的题目才按校准结果修改难度等级
+    CALIBRATION_CHUNK_SIZE = int(os.environ.get('CALIBRATION_CHUNK_SIZE', 200000))  # 每次读取的练习记录数
+    CALIBRATION_MIN_ATTEMPTS = int(os.environ.get('CALIBRATION_MIN_ATTEMPTS', 20))
+    CALIBRATION_MIN_DURATION_SECONDS = float(os.environ.get('CALIBRATION_MIN_DURATION_SECONDS', 1))  # 用时更短的作答不参与
+    CALIBRATION_STEP = float(os.environ.get('CALIBRATION_STEP', 0.4))  # 初始步长
+    CALIBRATION_STEP_DECAY = float(os.environ.get('CALIBRATION_STEP_DECAY', 0.05))  # 步长随作答数衰减的速度
+    CALIBRATION_LEVEL_WIDTH = float(os.environ.get('CALIBRATION_LEVEL_WIDTH', 1.0))  # 相邻难度等级的参数差（logit）
+    CALIBRATION_FULL_EPOCHS = int(os.environ.get('CALIBRATION_FULL_EPOCHS', 3))  # 全量拟合遍历练习记录的轮数
+    
+    # 监控指标配置（/api/metrics）
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 1.0))  # 采集耗时和SQL统计的请求比例
+    METRICS_SLOW_QUERY_MS = int(os.environ.get('METRICS_SLOW_QUERY_MS', 200))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # 抓取需携带 Bearer 令牌；未设置时只在开发和测试环境开放
+    
 class DevelopmentConfig(Config):
     """开发环境配置"""
     DEBUG = True
+    COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 1))  # 开发环境优先压缩速度
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:100000')
     
 class ProductionConfig(Config):
     """生产环境配置"""
     DEBUG = False
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 512))
+    METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 0.1))
     
 # 配置字典
 config = {
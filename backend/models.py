@@ -1,10 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 import json
 from utils.crypto import crypto_manager
+from utils.password_hasher import password_hasher
+from utils.db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     """用户模型"""
@@ -25,16 +26,20 @@ class User(db.Model):
     max_tokens = db.Column(db.Integer, default=1000)
     temperature = db.Column(db.Float, default=0.7)
     
+    # 难度校准估计的能力值（logit，见 services/difficulty_calibration.py）
+    ability = db.Column(db.Float, nullable=True)
+    ability_attempts = db.Column(db.Integer, default=0)  # 参与校准的作答数
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def set_password(self, password):
         """设置密码"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """检查密码"""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
     
     def set_api_key(self, api_key):
         """安全设置API密钥"""
@@ -77,6 +82,7 @@ class User(db.Model):
             'nickname': self.nickname,
             'role': self.role,
             'is_active': self.is_active,
+            'ability': self.ability,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -169,6 +175,9 @@ class Question(db.Model):
     answer = db.Column(db.Text, nullable=False)  # 正确答案(JSON格式)
     explanation = db.Column(db.Text, nullable=True)  # 题目解析
     difficulty = db.Column(db.Integer, default=1)  # 难度等级 1-5
+    initial_difficulty = db.Column(db.Integer, nullable=True)  # 提取或导入时的难度等级，全量校准从它开始
+    difficulty_score = db.Column(db.Float, nullable=True)  # 校准后的难度（IRT难度参数，logit）
+    difficulty_attempts = db.Column(db.Integer, default=0)  # 参与校准的作答数
     source_file = db.Column(db.String(255), nullable=True)  # 来源文件名
     tags = db.Column(db.Text, nullable=True)  # 题目标签(JSON格式)
     is_active = db.Column(db.Boolean, default=True)  # 是否启用
@@ -191,6 +200,7 @@ class Question(db.Model):
             'answer': json.loads(self.answer) if self.answer else None,
             'explanation': self.explanation,
             'difficulty': self.difficulty,
+            'difficulty_score': self.difficulty_score,
             'source_file': self.source_file,
             'tags': json.loads(self.tags) if self.tags else None,
             'is_active': self.is_active,
@@ -216,6 +226,13 @@ class PracticeRecord(db.Model):
     user = db.relationship('User', backref='practice_records')
     question = db.relationship('Question', backref='practice_records')
     
+    __table_args__ = (
+        db.Index('ix_practice_records_user_time', 'user_id', 'practiced_at'),
+        db.Index('ix_practice_records_practiced_at', 'practiced_at'),  # 归档任务按时间扫描
+        # 同一练习会话中每道题只记录一次，多个 worker 同时接受同一题的作答时由数据库拒绝重复
+        db.UniqueConstraint('session_id', 'question_id', name='uq_practice_records_session_question'),
+    )
+    
     def to_dict(self):
         """转换为字典"""
         return {
@@ -230,6 +247,17 @@ class PracticeRecord(db.Model):
             'practiced_at': self.practiced_at.isoformat() if self.practiced_at else None
         }
 
+class PracticeSession(db.Model):
+    """练习会话 - 题目队列和进度保存在缓存层，缓存中的会话丢失（被淘汰、由其他 worker 进程创建）时据此恢复"""
+    __tablename__ = 'practice_sessions'
+    
+    id = db.Column(db.String(32), primary_key=True)  # 会话ID
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    mode = db.Column(db.String(20), nullable=False)  # random, sequential, wrong, paper
+    question_ids = db.Column(db.Text, nullable=False)  # 题目ID列表(JSON格式)，顺序即作答顺序
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
 class WrongAnswer(db.Model):
     """错题本模型"""
     __tablename__ = 'wrong_answers'
@@ -242,6 +270,11 @@ class WrongAnswer(db.Model):
     is_mastered = db.Column(db.Boolean, default=False)  # 是否已掌握
     added_at = db.Column(db.DateTime, default=datetime.utcnow)  # 加入错题本时间
     
+    __table_args__ = (
+        # 每个用户的每道题只有一条错题记录，并发答错同一题时由数据库拒绝重复插入
+        db.UniqueConstraint('user_id', 'question_id', name='uq_wrong_answers_user_question'),
+    )
+    
     # 关系
     user = db.relationship('User', backref='wrong_answers')
     question = db.relationship('Question', backref='wrong_answers')
@@ -311,6 +344,16 @@ class UploadRecord(db.Model):
     enable_split = db.Column(db.Boolean, default=False)  # 是否启用文件分割
     max_chunk_size = db.Column(db.Integer, default=3000)  # 最大分块大小
     
+    # 内容寻址存储
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # 文件内容SHA-256
+    reused_from_id = db.Column(db.Integer, db.ForeignKey('upload_records.id'), nullable=True)  # 复用的已完成上传
+    
+    # 大模型用量：预估值在调用前按本地估算累计，实际值来自接口返回的 usage
+    llm_calls = db.Column(db.Integer, default=0)  # 调用次数
+    estimated_tokens = db.Column(db.Integer, default=0)  # 预估输入token数
+    prompt_tokens = db.Column(db.Integer, default=0)  # 实际输入token数
+    completion_tokens = db.Column(db.Integer, default=0)  # 实际输出token数
+    
     # 关系
     user = db.relationship('User', backref='upload_records')
     
@@ -338,5 +381,228 @@ class UploadRecord(db.Model):
             'include_answers': self.include_answers,
             'include_explanations': self.include_explanations,
             'enable_split': self.enable_split,
-            'max_chunk_size': self.max_chunk_size
+            'max_chunk_size': self.max_chunk_size,
+            'content_hash': self.content_hash,
+            'reused_from_id': self.reused_from_id,
+            'llm_calls': self.llm_calls,
+            'estimated_tokens': self.estimated_tokens,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens
+        }
+
+class TableVersion(db.Model):
+    """数据表版本计数器 - 每次写入对应表时递增，用于ETag和缓存失效"""
+    __tablename__ = 'table_versions'
+    
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'table_name': self.table_name,
+            'version': self.version,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class QuestionChange(db.Model):
+    """题目变更日志 - 自增ID即为单调递增的变更版本号，用于增量同步"""
+    __tablename__ = 'question_changes'
+    
+    id = db.Column(db.Integer, primary_key=True)  # 变更版本号
+    question_id = db.Column(db.Integer, nullable=False, index=True)  # 不加外键，题目删除后仍保留墓碑
+    category_id = db.Column(db.Integer, nullable=True)
+    operation = db.Column(db.String(10), nullable=False)  # upsert, delete
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_question_changes_category_version', 'category_id', 'id'),
+    )
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'version': self.id,
+            'question_id': self.question_id,
+            'category_id': self.category_id,
+            'operation': self.operation,
+            'changed_at': self.changed_at.isoformat() if self.changed_at else None
+        }
+
+class RevokedToken(db.Model):
+    """已吊销的JWT令牌（登出），令牌过期后可清理"""
+    __tablename__ = 'revoked_tokens'
+    
+    jti = db.Column(db.String(64), primary_key=True)  # 令牌唯一ID
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # 令牌原本的过期时间
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'jti': self.jti,
+            'user_id': self.user_id,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'revoked_at': self.revoked_at.isoformat() if self.revoked_at else None
+        }
+
+class PracticeArchive(db.Model):
+    """练习记录冷数据归档 - 每行是某用户某月的一批记录（列式、压缩），附带汇总值"""
+    __tablename__ = 'practice_archives'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    month = db.Column(db.String(7), nullable=False)  # YYYY-MM
+    record_count = db.Column(db.Integer, nullable=False)
+    correct_count = db.Column(db.Integer, nullable=False)
+    total_duration = db.Column(db.Integer, nullable=False, default=0)  # 作答用时合计（秒）
+    first_practiced_at = db.Column(db.DateTime, nullable=False)
+    last_practiced_at = db.Column(db.DateTime, nullable=False)
+    codec = db.Column(db.SmallInteger, nullable=False)  # 压缩算法，见 services/practice_pack.py
+    raw_size = db.Column(db.Integer, nullable=False)  # 解压后字节数
+    data = db.Column(db.LargeBinary, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_practice_archives_user_month', 'user_id', 'month'),
+    )
+    
+    def to_dict(self):
+        """转换为字典（不含归档数据本身）"""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'month': self.month,
+            'record_count': self.record_count,
+            'correct_count': self.correct_count,
+            'total_duration': self.total_duration,
+            'first_practiced_at': self.first_practiced_at.isoformat() if self.first_practiced_at else None,
+            'last_practiced_at': self.last_practiced_at.isoformat() if self.last_practiced_at else None,
+            'raw_size': self.raw_size,
+            'compressed_size': len(self.data) if self.data else 0,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None
+        }
+
+class StoredBlob(db.Model):
+    """内容寻址存储的文件 - 按SHA-256去重，引用计数归零时删除文件"""
+    __tablename__ = 'stored_blobs'
+    
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_referenced_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'sha256': self.sha256,
+            'size': self.size,
+            'ref_count': self.ref_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_referenced_at': self.last_referenced_at.isoformat() if self.last_referenced_at else None
+        }
+
+class UploadSession(db.Model):
+    """断点续传的上传会话 - 分块追加写入临时文件，完成后生成 UploadRecord"""
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(db.String(32), primary_key=True)  # 上传ID
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    mime_type = db.Column(db.String(100), nullable=True)
+    total_size = db.Column(db.BigInteger, nullable=False)  # 文件总字节数
+    received_size = db.Column(db.BigInteger, nullable=False, default=0)  # 已确认写入的字节数（续传偏移量）
+    checksum = db.Column(db.String(64), nullable=True)  # 客户端声明的SHA-256
+    settings = db.Column(db.Text, nullable=True)  # 解析配置(JSON格式)
+    temp_path = db.Column(db.String(500), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'upload_id': self.id,
+            'filename': self.original_filename,
+            'total_size': self.total_size,
+            'offset': self.received_size,
+            'checksum': self.checksum,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
+class ReplicationHeartbeat(db.Model):
+    """复制心跳 - 主库定期更新，从副本读回的时间差即为复制延迟"""
+    __tablename__ = 'replication_heartbeats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    beat_at = db.Column(db.DateTime, nullable=False)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'beat_at': self.beat_at.isoformat() if self.beat_at else None
+        }
+
+class CalibrationRun(db.Model):
+    """难度校准运行记录 - 增量运行从上次成功运行处理到的练习记录ID之后继续"""
+    __tablename__ = 'calibration_runs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    mode = db.Column(db.String(20), nullable=False)  # full, incremental
+    last_record_id = db.Column(db.Integer, nullable=False, default=0)  # 已处理到的 practice_records.id
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    question_count = db.Column(db.Integer, nullable=False, default=0)  # 参数有更新的题目数
+    user_count = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'mode': self.mode,
+            'last_record_id': self.last_record_id,
+            'record_count': self.record_count,
+            'question_count': self.question_count,
+            'user_count': self.user_count,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class QuestionBulkJob(db.Model):
+    """题目批量操作任务 - 涉及的题目较多时在后台分块执行，进度和结果记录在这里"""
+    __tablename__ = 'question_bulk_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)  # 任务ID
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    operation = db.Column(db.String(20), nullable=False)  # move, deactivate, activate, retag, delete
+    params = db.Column(db.Text, nullable=False)  # 筛选条件和操作参数(JSON格式)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    total = db.Column(db.Integer, nullable=False, default=0)  # 开始时匹配的题目数
+    processed = db.Column(db.Integer, nullable=False, default=0)  # 已处理的题目数
+    result = db.Column(db.Text, nullable=True)  # 各项影响行数(JSON格式)
+    error_message = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # 执行中每提交一块更新一次，长时间不更新说明进程已退出
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'job_id': self.id,
+            'operation': self.operation,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'result': json.loads(self.result) if self.result else None,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
         }
\ No newline at end of file
@@ -1,12 +1,17 @@
 from flask import Blueprint, request, jsonify
 from models import User, db
-from auth import generate_token, hash_password, verify_password, token_required
+from auth import (generate_token, decode_token, get_request_token, hash_password, verify_password,
+                  password_needs_rehash, token_required)
+from utils.password_hasher import PasswordHasherBusy
+from utils.rate_limit import rate_limit
+from utils.token_revocation import revoke_token
 from datetime import datetime
 import re
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limit('5/minute', key_by='ip')
 def register():
     """用户注册"""
     try:
@@ -66,11 +71,15 @@ def register():
             }
         }), 201
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'注册失败: {str(e)}'}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('10/minute', key_by='ip')
 def login():
     """用户登录"""
     try:
@@ -90,6 +99,10 @@ def login():
         if not user or not verify_password(user.password_hash, password):
             return jsonify({'error': '用户名或密码错误'}), 401
         
+        # 哈希算法或强度配置变化后，登录时透明地重新哈希
+        if password_needs_rehash(user.password_hash):
+            user.password_hash = hash_password(password)
+        
         # 更新最后登录时间
         user.updated_at = datetime.utcnow()
         db.session.commit()
@@ -105,6 +118,9 @@ def login():
             }
         }), 200
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         return jsonify({'error': f'登录失败: {str(e)}'}), 500
 
@@ -191,6 +207,9 @@ def change_password(current_user):
         
         return jsonify({'message': '密码修改成功'}), 200
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'密码修改失败: {str(e)}'}), 500
@@ -200,8 +219,11 @@ def change_password(current_user):
 def logout(current_user):
     """用户登出"""
     try:
-        # 在实际应用中，这里可以将token加入黑名单
-        # 或者在数据库中记录登出时间
+        # 吊销当前令牌，7天有效期内不能再使用
+        payload = decode_token(get_request_token())
+        if payload and payload.get('jti'):
+            revoke_token(payload['jti'], current_user.id, datetime.utcfromtimestamp(payload['exp']))
+        
         return jsonify({
             'code': 200,
             'message': '登出成功'
@@ -287,6 +309,7 @@ def update_api_config(current_user):
 
 @auth_bp.route('/test-api', methods=['POST'])
 @token_required
+@rate_limit('5/minute', key_by='user', scope='ai')
 def test_api_connection(current_user):
     """测试API连接"""
     try:
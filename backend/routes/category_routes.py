@@ -1,33 +1,38 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file
 from models import Category, Question, db
 from auth import token_required, admin_required
+from utils.etag import etag_cached
+from services.practice_pack import get_or_build_pack
+from services.reference_data import get_category_list, get_category_dict
 from datetime import datetime
 
 category_bp = Blueprint('categories', __name__, url_prefix='/api/categories')
 
 @category_bp.route('', methods=['GET'])
 @token_required
+@etag_cached('categories', 'questions')
 def get_categories(current_user):
     """获取分类列表"""
     try:
         # 获取查询参数
         include_count = request.args.get('include_count', 'false').lower() == 'true'
         
-        categories = Category.query.order_by(Category.sort_order.asc(), Category.created_at.asc()).all()
+        categories = get_category_list()
         
-        result = []
-        for category in categories:
-            category_dict = category.to_dict()
-            
-            # 如果需要包含题目数量
-            if include_count:
-                question_count = Question.query.filter(
-                    Question.category_id == category.id,
-                    Question.is_active == True
-                ).count()
-                category_dict['question_count'] = question_count
-            
-            result.append(category_dict)
+        # 如果需要包含题目数量，一次分组查询统计所有分类
+        question_counts = {}
+        if include_count:
+            question_counts = dict(
+                db.session.query(Question.category_id, db.func.count(Question.id))
+                .filter(Question.is_active == True)
+                .group_by(Question.category_id)
+                .all()
+            )
+        
+        result = categories
+        if include_count:
+            # 缓存中的字典是共享的，复制后再添加题目数量
+            result = [dict(category, question_count=question_counts.get(category['id'], 0)) for category in categories]
         
         return jsonify({
             'categories': result
@@ -38,10 +43,11 @@ def get_categories(current_user):
 
 @category_bp.route('/<int:category_id>', methods=['GET'])
 @token_required
+@etag_cached('categories', 'questions')
 def get_category(current_user, category_id):
     """获取单个分类详情"""
     try:
-        category = Category.query.get(category_id)
+        category = get_category_dict(category_id)
         if not category:
             return jsonify({'error': '分类不存在'}), 404
         
@@ -51,8 +57,7 @@ def get_category(current_user, category_id):
             Question.is_active == True
         ).count()
         
-        category_dict = category.to_dict()
-        category_dict['question_count'] = question_count
+        category_dict = dict(category, question_count=question_count)
         
         return jsonify({
             'category': category_dict
@@ -61,6 +66,31 @@ def get_category(current_user, category_id):
     except Exception as e:
         return jsonify({'error': f'获取分类详情失败: {str(e)}'}), 500
 
+@category_bp.route('/<int:category_id>/pack', methods=['GET'])
+@token_required
+def download_category_pack(current_user, category_id):
+    """下载分类的离线练习题包（支持Range断点续传）"""
+    try:
+        category = Category.query.get(category_id)
+        if not category:
+            return jsonify({'error': '分类不存在'}), 404
+        
+        path, version = get_or_build_pack(category)
+        
+        response = send_file(
+            path,
+            mimetype='application/octet-stream',
+            as_attachment=True,
+            download_name=f'category_{category_id}.sstp',
+            conditional=True,
+            etag=f'pack-{category_id}-{version}'
+        )
+        response.headers['X-Pack-Version'] = version
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': f'生成离线题包失败: {str(e)}'}), 500
+
 @category_bp.route('', methods=['POST'])
 @token_required
 @admin_required
@@ -207,12 +237,17 @@ def reorder_categories(current_user):
         if not isinstance(category_orders, list):
             return jsonify({'error': '分类排序数据格式错误'}), 400
         
-        # 批量更新排序
         for item in category_orders:
             if not isinstance(item, dict) or 'id' not in item or 'sort_order' not in item:
                 return jsonify({'error': '分类排序数据格式错误'}), 400
-            
-            category = Category.query.get(item['id'])
+        
+        # 一次查询取出所有涉及的分类后批量更新排序
+        categories = {
+            category.id: category
+            for category in Category.query.filter(Category.id.in_([item['id'] for item in category_orders])).all()
+        }
+        for item in category_orders:
+            category = categories.get(item['id'])
             if category:
                 category.sort_order = item['sort_order']
                 category.updated_at = datetime.utcnow()
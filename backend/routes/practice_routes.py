@@ -0,0 +1,229 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+from models import db
+from auth import token_required
+from services.practice_archive import iter_practice_history, history_row_to_dict, get_practice_summary
+from services.practice_session import (
+    PracticeSessionError, create_session, get_session, get_current_session, session_view, submit_answer, end_session
+)
+from services.paper_generator import PaperConstraintError, generate_paper
+from datetime import datetime, timezone
+import json
+
+practice_bp = Blueprint('practice', __name__, url_prefix='/api/practice')
+
+def _parse_time_arg(name):
+    """解析ISO格式的时间查询参数，未提供时返回None
+
+    数据库中的时间都是不带时区的UTC时间，带时区偏移的参数（如 +08:00）先换算为UTC。
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def _session_error(error):
+    return jsonify({'error': str(error)}), error.status_code
+
+@practice_bp.route('/sessions', methods=['POST'])
+@token_required
+def start_session(current_user):
+    """开始练习会话：一次性筛选并预加载题目队列
+
+    请求体（均可选）:
+        mode: random（默认）、sequential 或 wrong（错题练习）
+        category_id, type, difficulty: 筛选条件
+        exclude_correct: 是否排除已答对过的题目
+        count: 题目数量（默认20）
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            state = create_session(
+                current_user.id,
+                mode=data.get('mode', 'random'),
+                category_id=data.get('category_id'),
+                question_type=data.get('type'),
+                difficulty=data.get('difficulty'),
+                exclude_correct=bool(data.get('exclude_correct', False)),
+                count=data.get('count')
+            )
+        except PracticeSessionError as e:
+            return _session_error(e)
+        except (TypeError, ValueError):
+            return jsonify({'error': '题目数量无效'}), 400
+        
+        return jsonify({
+            'session': session_view(state)
+        }), 201
+        
+    except Exception as e:
+        return jsonify({'error': f'创建练习会话失败: {str(e)}'}), 500
+
+@practice_bp.route('/papers', methods=['POST'])
+@token_required
+def create_paper(current_user):
+    """按条件组卷，并以试卷题目创建练习会话
+
+    请求体:
+        count: 题目数（必填）
+        category_ids: 分类ID列表（可选，默认不限）
+        type_ratios: 题型比例，如 {"multiple_choice": 0.3}（可选）
+        difficulty: 目标平均难度 1-5（可选）
+        tolerance: 平均难度允许的偏差（可选）
+        exclude_days: 排除最近若干天练过的题目（可选）
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            count = int(data.get('count') or 0)
+            category_ids = [int(category_id) for category_id in data.get('category_ids') or []]
+            type_ratios = {str(name): float(ratio) for name, ratio in (data.get('type_ratios') or {}).items()}
+            difficulty = float(data['difficulty']) if data.get('difficulty') is not None else None
+            tolerance = float(data['tolerance']) if data.get('tolerance') is not None else None
+            exclude_days = float(data.get('exclude_days') or 0)
+        except (TypeError, ValueError, AttributeError):
+            return jsonify({'error': '组卷参数格式错误'}), 400
+        
+        max_count = current_app.config.get('PAPER_MAX_QUESTIONS', 200)
+        if not 1 <= count <= max_count:
+            return jsonify({'error': f'题目数必须在1到{max_count}之间'}), 400
+        if difficulty is not None and not 1 <= difficulty <= 5:
+            return jsonify({'error': '平均难度必须在1到5之间'}), 400
+        
+        try:
+            paper = generate_paper(current_user.id, count, category_ids=category_ids, type_ratios=type_ratios,
+                                   difficulty=difficulty, tolerance=tolerance, exclude_days=exclude_days)
+        except PaperConstraintError as e:
+            return jsonify({'error': str(e), 'details': e.details}), e.status_code
+        
+        state = create_session(current_user.id, mode='paper', question_ids=paper['question_ids'])
+        
+        return jsonify({
+            'paper': paper,
+            'session': session_view(state)
+        }), 201
+        
+    except PracticeSessionError as e:
+        return _session_error(e)
+    except Exception as e:
+        return jsonify({'error': f'组卷失败: {str(e)}'}), 500
+
+@practice_bp.route('/sessions/current', methods=['GET'])
+@token_required
+def get_current(current_user):
+    """获取未完成的练习会话（重新连接后从当前题目继续）"""
+    try:
+        state = get_current_session(current_user.id)
+        if state is None:
+            return jsonify({'error': '没有进行中的练习会话'}), 404
+        
+        return jsonify({
+            'session': session_view(state)
+        }), 200
+        
+    except PracticeSessionError as e:
+        return _session_error(e)
+    except Exception as e:
+        return jsonify({'error': f'获取练习会话失败: {str(e)}'}), 500
+
+@practice_bp.route('/sessions/<session_id>', methods=['GET'])
+@token_required
+def get_practice_session(current_user, session_id):
+    """获取练习会话进度和当前题目"""
+    try:
+        return jsonify({
+            'session': session_view(get_session(session_id, current_user.id))
+        }), 200
+        
+    except PracticeSessionError as e:
+        return _session_error(e)
+    except Exception as e:
+        return jsonify({'error': f'获取练习会话失败: {str(e)}'}), 500
+
+@practice_bp.route('/sessions/<session_id>/answer', methods=['POST'])
+@token_required
+def answer_question(current_user, session_id):
+    """提交当前题目的作答，返回判分结果和下一题
+
+    请求体:
+        index: 题目序号（必须等于会话当前进度）
+        answer: 用户作答
+        duration_seconds: 作答用时（可选）
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        if 'answer' not in data or not isinstance(data.get('index'), int):
+            return jsonify({'error': '请提供题目序号和作答'}), 400
+        
+        try:
+            state = get_session(session_id, current_user.id)
+            result = submit_answer(state, data['index'], data['answer'], data.get('duration_seconds'))
+        except PracticeSessionError as e:
+            return _session_error(e)
+        
+        return jsonify(result), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'提交作答失败: {str(e)}'}), 500
+
+@practice_bp.route('/sessions/<session_id>', methods=['DELETE'])
+@token_required
+def delete_session(current_user, session_id):
+    """结束练习会话（已提交的作答记录保留）"""
+    try:
+        try:
+            end_session(get_session(session_id, current_user.id))
+        except PracticeSessionError as e:
+            return _session_error(e)
+        
+        return jsonify({'message': '练习会话已结束'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'结束练习会话失败: {str(e)}'}), 500
+
+@practice_bp.route('/summary', methods=['GET'])
+@token_required
+def get_summary(current_user):
+    """获取练习汇总（包含已归档的历史记录）"""
+    try:
+        return jsonify({
+            'summary': get_practice_summary(current_user.id)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'获取练习汇总失败: {str(e)}'}), 500
+
+@practice_bp.route('/history/export', methods=['GET'])
+@token_required
+def export_history(current_user):
+    """导出练习历史（JSON Lines，热数据与归档数据按时间顺序合并输出）
+
+    查询参数:
+        since: 起始时间（ISO格式，可选）
+        until: 截止时间（ISO格式，不含，可选）
+    """
+    try:
+        since = _parse_time_arg('since')
+        until = _parse_time_arg('until')
+    except ValueError:
+        return jsonify({'error': '时间格式无效'}), 400
+    
+    try:
+        rows = iter_practice_history(current_user.id, since, until)
+        
+        def generate():
+            for row in rows:
+                yield json.dumps(history_row_to_dict(row), ensure_ascii=False) + '\n'
+        
+        filename = f'practice_history_{current_user.id}_{datetime.utcnow():%Y%m%d}.jsonl'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers={
+            'Content-Disposition': f'attachment; filename={filename}'
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'导出练习历史失败: {str(e)}'}), 500
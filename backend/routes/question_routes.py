@@ -0,0 +1,156 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+from werkzeug.wsgi import get_input_stream
+from auth import token_required, admin_required
+from services.question_io import (iter_question_rows, iter_jsonl, iter_csv, iter_jsonl_records,
+                                  iter_csv_records, import_questions, QuestionImportError)
+from services.question_bulk import (QuestionBulkError, prepare_bulk_operation, count_bulk_targets,
+                                    run_bulk_operation, start_bulk_job, fail_if_stale)
+from models import db, QuestionBulkJob
+from datetime import datetime
+
+question_bp = Blueprint('questions', __name__, url_prefix='/api/questions')
+
+EXPORT_FORMATS = {
+    'jsonl': (iter_jsonl, 'application/x-ndjson; charset=utf-8'),
+    'csv': (iter_csv, 'text/csv; charset=utf-8')
+}
+
+@question_bp.route('/export', methods=['GET'])
+@token_required
+def export_questions(current_user):
+    """流式导出题库（JSON Lines 或 CSV）
+
+    管理员导出全部题目，普通用户只导出自己创建的题目。
+
+    查询参数:
+        format: jsonl（默认）或 csv
+        category_id: 只导出某个分类（可选）
+        include_inactive: 是否包含已停用的题目
+    """
+    export_format = request.args.get('format', 'jsonl').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': '不支持的导出格式'}), 400
+    
+    try:
+        rows = iter_question_rows(
+            category_id=request.args.get('category_id', type=int),
+            user_id=None if current_user.role == 'admin' else current_user.id,
+            include_inactive=request.args.get('include_inactive', 'false').lower() == 'true',
+            chunk_size=current_app.config.get('QUESTION_EXPORT_CHUNK_SIZE', 1000)
+        )
+        encoder, mimetype = EXPORT_FORMATS[export_format]
+        
+        def generate():
+            for chunk in encoder(rows):
+                yield chunk.encode('utf-8')
+        
+        filename = f'questions_{datetime.utcnow():%Y%m%d%H%M%S}.{export_format}'
+        return Response(stream_with_context(generate()), content_type=mimetype, headers={
+            'Content-Disposition': f'attachment; filename={filename}'
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'导出题库失败: {str(e)}'}), 500
+
+@question_bp.route('/import', methods=['POST'])
+@token_required
+@admin_required
+def import_question_bank(current_user):
+    """流式导入题库：请求体为 JSON Lines 或 CSV 原始内容，逐行解析、分批写入
+
+    查询参数:
+        format: jsonl（默认）或 csv
+        category_id: 数据中的分类不存在时使用的默认分类（可选）
+    """
+    import_format = request.args.get('format', 'jsonl').lower()
+    if import_format not in ('jsonl', 'csv'):
+        return jsonify({'error': '不支持的导入格式'}), 400
+    
+    try:
+        # 直接读取原始请求流，不受 MAX_CONTENT_LENGTH 限制，上限由 QUESTION_IMPORT_MAX_BYTES 控制
+        stream = get_input_stream(request.environ,
+                                  max_content_length=current_app.config.get('QUESTION_IMPORT_MAX_BYTES'))
+        parser = iter_csv_records if import_format == 'csv' else iter_jsonl_records
+        stats = import_questions(
+            parser(stream),
+            current_user.id,
+            default_category_id=request.args.get('category_id', type=int),
+            batch_size=current_app.config.get('QUESTION_IMPORT_BATCH_SIZE', 1000)
+        )
+        
+        return jsonify({
+            'message': f"导入完成：成功 {stats['imported']} 道，跳过 {stats['skipped']} 道",
+            'result': stats
+        }), 200
+        
+    except QuestionImportError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'导入题库失败: {str(e)}'}), 500
+
+
+@question_bp.route('/bulk', methods=['POST'])
+@token_required
+@admin_required
+def bulk_update_questions(current_user):
+    """批量操作题目：按ID列表或筛选条件分块执行集合式更新/删除
+
+    涉及的题目较多时转为后台任务，返回202和任务ID，通过 /bulk/jobs/<job_id> 查询进度。
+
+    请求体:
+        operation: move、deactivate、activate、retag 或 delete
+        ids: 题目ID列表（与 filter 二选一）
+        filter: 筛选条件，支持 category_ids、type、difficulty、is_active、user_id、source_file
+        category_id: move 的目标分类
+        tags / add_tags / remove_tags: retag 的标签（整体替换或增删）
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            spec = prepare_bulk_operation(
+                data.get('operation'),
+                ids=data.get('ids'),
+                filters=data.get('filter'),
+                options={name: data[name] for name in ('category_id', 'tags', 'add_tags', 'remove_tags') if name in data}
+            )
+        except QuestionBulkError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        total = count_bulk_targets(spec)
+        if total > current_app.config.get('QUESTION_BULK_SYNC_LIMIT', 5000):
+            job = start_bulk_job(current_user.id, spec, total)
+            return jsonify({
+                'message': f'共 {total} 道题目，已转为后台任务',
+                'job': job.to_dict()
+            }), 202
+        
+        result = run_bulk_operation(spec)
+        
+        return jsonify({
+            'message': f"批量操作完成，处理 {result['matched']} 道题目",
+            'result': result
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'批量操作失败: {str(e)}'}), 500
+
+@question_bp.route('/bulk/jobs/<job_id>', methods=['GET'])
+@token_required
+@admin_required
+def get_bulk_job(current_user, job_id):
+    """查询批量操作任务的进度和结果"""
+    try:
+        job = db.session.get(QuestionBulkJob, job_id)
+        if not job:
+            return jsonify({'error': '任务不存在'}), 404
+        # 执行任务的进程已退出时，任务不会再有进展
+        if fail_if_stale(job):
+            db.session.commit()
+        
+        return jsonify({
+            'job': job.to_dict()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'查询批量任务失败: {str(e)}'}), 500
\ No newline at end of file
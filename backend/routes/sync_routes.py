@@ -0,0 +1,77 @@
+from flask import Blueprint, request, jsonify, current_app
+from models import Question, QuestionChange
+from auth import token_required
+from utils.change_log import OP_DELETE, current_version
+from datetime import datetime, timedelta
+
+sync_bp = Blueprint('sync', __name__, url_prefix='/api/sync')
+
+@sync_bp.route('/questions', methods=['GET'])
+@token_required
+def get_question_changes(current_user):
+    """增量同步：返回游标之后新增、修改或停用的题目
+
+    与离线题包和练习会话一致，返回所有用户创建的题目：客户端从题包初始化后持有的题目
+    都要能收到更新，停用、删除或移出分类时都要收到墓碑。
+
+    查询参数:
+        cursor: 上次同步返回的游标（首次同步传0）
+        category_id: 只同步某个分类（可选）
+        limit: 每页最多读取的变更条数
+    """
+    try:
+        cursor = request.args.get('cursor', 0, type=int)
+        category_id = request.args.get('category_id', type=int)
+        limit = min(max(request.args.get('limit', 500, type=int), 1), 2000)
+
+        if cursor < 0:
+            return jsonify({'error': '无效的同步游标'}), 400
+
+        query = QuestionChange.query.filter(QuestionChange.id > cursor)
+        if category_id is not None:
+            query = query.filter(QuestionChange.category_id == category_id)
+
+        # 留出结算窗口，避免尚未提交的较小版本号被跳过
+        settle_seconds = current_app.config.get('SYNC_SETTLE_SECONDS', 0)
+        if settle_seconds:
+            query = query.filter(QuestionChange.changed_at <= datetime.utcnow() - timedelta(seconds=settle_seconds))
+
+        changes = query.order_by(QuestionChange.id.asc()).limit(limit).all()
+
+        # 同一题目在本页中只保留最后一次变更
+        latest = {}
+        for change in changes:
+            latest[change.question_id] = change
+
+        upsert_ids = [qid for qid, change in latest.items() if change.operation != OP_DELETE]
+        questions = {}
+        if upsert_ids:
+            for question in Question.query.filter(Question.id.in_(upsert_ids)).all():
+                questions[question.id] = question
+
+        updated = []
+        tombstones = []
+        for question_id, change in latest.items():
+            question = questions.get(question_id)
+            if change.operation == OP_DELETE or question is None or not question.is_active:
+                tombstones.append({'id': question_id, 'version': change.id})
+            elif category_id is not None and question.category_id != category_id:
+                # 题目在本页之后又被移出该分类，等待后续的墓碑记录
+                continue
+            else:
+                item = question.to_dict()
+                item['version'] = change.id
+                updated.append(item)
+
+        next_cursor = changes[-1].id if changes else cursor
+
+        return jsonify({
+            'questions': updated,
+            'tombstones': tombstones,
+            'cursor': next_cursor,
+            'has_more': len(changes) == limit,
+            'latest_version': current_version()
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'获取题目变更失败: {str(e)}'}), 500
@@ -0,0 +1,240 @@
+from flask import Blueprint, request, jsonify, current_app
+from models import db, UploadRecord, ProcessingLog
+from auth import token_required
+from utils.rate_limit import rate_limit
+from services.chunked_upload import (create_session, get_session, write_chunk, complete_session,
+                                     abort_session, UploadSessionError)
+from services.upload_storage import (PARSE_SETTING_FIELDS, UploadTooLarge, file_type_error,
+                                     normalize_parse_settings, create_upload_record, delete_upload_record)
+from services.upload_processing import start_upload_processing
+
+upload_bp = Blueprint('upload', __name__, url_prefix='/api/upload')
+
+def _session_error(e):
+    """上传会话错误响应，带上服务端已确认的偏移量便于客户端续传"""
+    body = {'error': str(e)}
+    headers = {}
+    if e.offset is not None:
+        body['offset'] = e.offset
+        headers['Upload-Offset'] = str(e.offset)
+    return jsonify(body), e.status_code, headers
+
+REUSED_MESSAGE = '上传完成，该文件已解析过，题目已在题库中'
+
+@upload_bp.route('', methods=['POST'])
+@token_required
+@rate_limit('5/minute', key_by='user', scope='ai')
+def upload_file(current_user):
+    """上传文件（multipart/form-data，文件字段为 file，其余表单字段为解析配置）
+
+    文件按内容寻址存储，保存后在后台开始解析，通过 /status 轮询进度；
+    同一用户以相同配置重复上传已解析完成的文件时不再重复解析。大文件请使用 /sessions 断点续传。
+    """
+    try:
+        file = request.files.get('file')
+        if file is None or not file.filename:
+            return jsonify({'error': '请选择要上传的文件'}), 400
+        error = file_type_error(file.filename)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        data = request.form.to_dict()
+        if len(request.form.getlist('question_types')) > 1:
+            data['question_types'] = request.form.getlist('question_types')
+        try:
+            settings = normalize_parse_settings(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        record, reused = create_upload_record(
+            current_user.id,
+            file.stream,
+            file.filename,
+            settings=settings,
+            mime_type=file.mimetype,
+            max_size=current_app.config.get('MAX_CONTENT_LENGTH')
+        )
+        start_upload_processing(record)
+        
+        data = record.to_dict()
+        data['file_id'] = record.id
+        return jsonify({
+            'success': True,
+            'message': REUSED_MESSAGE if reused else '上传成功',
+            'data': data,
+            'reused': reused
+        }), 201
+        
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'上传文件失败: {str(e)}'}), 500
+
+@upload_bp.route('/<int:upload_id>', methods=['DELETE'])
+@token_required
+def delete_upload(current_user, upload_id):
+    """删除上传记录和处理日志（已保存到题库的题目保留），最后一个引用释放时删除文件"""
+    try:
+        record = UploadRecord.query.filter_by(id=upload_id, user_id=current_user.id).first()
+        if not record:
+            return jsonify({'error': '上传记录不存在'}), 404
+        if record.status == 'processing':
+            return jsonify({'error': '文件正在处理中，请稍后再删除'}), 409
+        
+        delete_upload_record(record)
+        
+        return jsonify({
+            'success': True,
+            'message': '删除成功'
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'删除上传记录失败: {str(e)}'}), 500
+
+@upload_bp.route('/sessions', methods=['POST'])
+@token_required
+@rate_limit('5/minute', key_by='user', scope='ai')
+def create_upload_session(current_user):
+    """创建断点续传会话
+
+    请求体:
+        filename: 原始文件名
+        size: 文件总字节数
+        sha256: 文件SHA-256（可选，完成时校验）
+        category_id/parse_mode/...: 解析配置（可选）
+    """
+    try:
+        data = request.get_json() or {}
+        settings = {field: data[field] for field in PARSE_SETTING_FIELDS + ('category_id',) if field in data}
+        session = create_session(
+            current_user.id,
+            data.get('filename'),
+            data.get('size'),
+            checksum=data.get('sha256'),
+            mime_type=data.get('mime_type'),
+            settings=settings
+        )
+        
+        result = session.to_dict()
+        result['chunk_size'] = current_app.config.get('UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024)
+        return jsonify({
+            'message': '上传会话已创建',
+            'session': result
+        }), 201
+        
+    except UploadSessionError as e:
+        return _session_error(e)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'创建上传会话失败: {str(e)}'}), 500
+
+@upload_bp.route('/sessions/<upload_id>', methods=['GET'])
+@token_required
+def get_upload_session(current_user, upload_id):
+    """查询上传进度（断线重连后从返回的 offset 继续上传）"""
+    try:
+        session = get_session(upload_id, current_user.id)
+        return jsonify({
+            'session': session.to_dict()
+        }), 200, {'Upload-Offset': str(session.received_size)}
+        
+    except UploadSessionError as e:
+        return _session_error(e)
+    except Exception as e:
+        return jsonify({'error': f'查询上传会话失败: {str(e)}'}), 500
+
+@upload_bp.route('/sessions/<upload_id>', methods=['PUT'])
+@token_required
+def upload_chunk(current_user, upload_id):
+    """上传一个分块：请求体为原始字节，查询参数 offset 为分块在文件中的起始位置"""
+    try:
+        session = get_session(upload_id, current_user.id)
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            return jsonify({'error': '缺少 offset 参数'}), 400
+        
+        new_offset = write_chunk(session, offset, request.stream, request.content_length)
+        return jsonify({
+            'offset': new_offset,
+            'total_size': session.total_size
+        }), 200, {'Upload-Offset': str(new_offset)}
+        
+    except UploadSessionError as e:
+        return _session_error(e)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'上传分块失败: {str(e)}'}), 500
+
+@upload_bp.route('/sessions/<upload_id>/complete', methods=['POST'])
+@token_required
+@rate_limit('5/minute', key_by='user', scope='ai')
+def complete_upload_session(current_user, upload_id):
+    """完成上传：校验文件完整性，创建上传记录并开始后台解析（通过 /status 轮询进度）"""
+    try:
+        session = get_session(upload_id, current_user.id)
+        record, reused = complete_session(session)
+        start_upload_processing(record)
+        
+        return jsonify({
+            'message': REUSED_MESSAGE if reused else '上传完成',
+            'data': record.to_dict(),
+            'reused': reused
+        }), 201
+        
+    except UploadSessionError as e:
+        return _session_error(e)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'完成上传失败: {str(e)}'}), 500
+
+@upload_bp.route('/sessions/<upload_id>', methods=['DELETE'])
+@token_required
+def abort_upload_session(current_user, upload_id):
+    """取消上传"""
+    try:
+        abort_session(get_session(upload_id, current_user.id))
+        return jsonify({
+            'message': '上传已取消'
+        }), 200
+        
+    except UploadSessionError as e:
+        return _session_error(e)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'取消上传失败: {str(e)}'}), 500
+
+@upload_bp.route('/status/<int:upload_id>', methods=['GET'])
+@token_required
+def get_upload_status(current_user, upload_id):
+    """查询文件处理状态
+
+    查询参数 after_log_id 为上次拿到的最后一条日志ID，只返回之后新增的日志，
+    轮询时可以逐题看到AI已经提取出的题目。
+    """
+    try:
+        record = UploadRecord.query.filter_by(id=upload_id, user_id=current_user.id).first()
+        if not record:
+            return jsonify({'error': '上传记录不存在'}), 404
+        
+        after_log_id = request.args.get('after_log_id', 0, type=int)
+        logs = ProcessingLog.query.filter(
+            ProcessingLog.upload_record_id == record.id,
+            ProcessingLog.id > after_log_id
+        ).order_by(ProcessingLog.id).limit(200).all()
+        
+        progress = {'uploaded': 0, 'processing': 50, 'completed': 100, 'failed': 100}.get(record.status, 0)
+        data = record.to_dict()
+        data.update({
+            'progress': progress,
+            'logs': [log.to_dict() for log in logs],
+            'last_log_id': logs[-1].id if logs else after_log_id
+        })
+        return jsonify({
+            'success': True,
+            'data': data
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'查询处理状态失败: {str(e)}'}), 500
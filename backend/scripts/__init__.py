@@ -0,0 +1 @@
+# 运维与数据脚本
\ No newline at end of file
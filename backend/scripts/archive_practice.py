@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+练习记录归档脚本
+
+把早于保留期限的 practice_records 按（用户，月份）压缩后移入 practice_archives，
+保持热表较小。建议每天或每周通过定时任务运行一次，重复运行是安全的。
+
+用法（在backend目录下）：
+    python -m scripts.archive_practice --days 180
+    python -m scripts.archive_practice --dry-run
+"""
+
+import argparse
+import time
+from flask import Flask
+
+from config import config
+from models import db
+from services.practice_archive import archive_cutoff, archive_practice_records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='归档过期的练习记录')
+    parser.add_argument('--config', default='development', help='配置名称')
+    parser.add_argument('--database', help='数据库连接串，默认使用配置中的数据库')
+    parser.add_argument('--days', type=int, help='热表保留天数，默认使用 PRACTICE_ARCHIVE_DAYS')
+    parser.add_argument('--batch-size', type=int, help='每个事务归档的记录数')
+    parser.add_argument('--dry-run', action='store_true', help='只统计，不写入')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.from_object(config[args.config])
+    if args.database:
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        cutoff = archive_cutoff(days=args.days)
+        print(f"📦 归档 {cutoff:%Y-%m-%d} 之前的练习记录{'（试运行）' if args.dry_run else ''}")
+        stats = archive_practice_records(cutoff, batch_size=args.batch_size, dry_run=args.dry_run)
+        print(f"✅ 月份: {stats['months']}，归档批次: {stats['archives']}，记录: {stats['records']}，"
+              f"压缩后 {stats['bytes'] / 1024:.1f} KB")
+        print(f"🎉 完成，用时 {time.perf_counter() - started:.1f} 秒")
+
+
+if __name__ == '__main__':
+    main()
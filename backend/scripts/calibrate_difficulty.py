@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+题目难度校准脚本
+
+用练习记录拟合 Rasch（1PL IRT）模型，把校准后的题目难度和用户能力批量写回数据库。
+默认只处理上次运行之后新增的练习记录，建议每天通过定时任务运行一次；
+第一次运行或指定 --full 时包含已归档的记录，从头重新拟合。需要安装 numpy。
+
+用法（在backend目录下）：
+    python -m scripts.calibrate_difficulty
+    python -m scripts.calibrate_difficulty --full --epochs 5
+    python -m scripts.calibrate_difficulty --dry-run
+"""
+
+import argparse
+import time
+from flask import Flask
+
+from config import config
+from models import db
+from services.difficulty_calibration import calibrate_difficulty
+
+
+def main():
+    parser = argparse.ArgumentParser(description='根据练习记录校准题目难度')
+    parser.add_argument('--config', default='development', help='配置名称')
+    parser.add_argument('--database', help='数据库连接串，默认使用配置中的数据库')
+    parser.add_argument('--full', action='store_true', help='忽略已有校准结果，使用全部记录重新拟合')
+    parser.add_argument('--epochs', type=int, help='遍历练习记录的轮数，默认全量3轮、增量1轮')
+    parser.add_argument('--chunk-size', type=int, help='每次读取的练习记录数')
+    parser.add_argument('--dry-run', action='store_true', help='只统计，不写入')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.from_object(config[args.config])
+    if args.database:
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        stats = calibrate_difficulty(full=args.full, chunk_size=args.chunk_size, epochs=args.epochs,
+                                     dry_run=args.dry_run)
+        mode = '全量' if stats['mode'] == 'full' else '增量'
+        print(f"📐 {mode}校准，练习记录ID {stats['after_id']} ~ {stats['until_id']}"
+              f"{'（试运行）' if args.dry_run else ''}")
+        print(f"✅ 使用记录: {stats['records']}，跳过: {stats['skipped']}，题目: {stats['questions']}，"
+              f"用户: {stats['users']}，难度等级变化: {stats['level_changes']}")
+        print(f"🎉 完成，用时 {time.perf_counter() - started:.1f} 秒")
+
+
+if __name__ == '__main__':
+    main()
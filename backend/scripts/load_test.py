@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API压测脚本
+
+模拟多名学生并发执行：登录 → 上传一个小文件 → 反复（开始练习会话 → 逐题作答 → 轮询上传状态），
+统计每个接口的吞吐量和 p50/p95/p99 延迟。需要先用 seed_data.py 生成数据并启动后端。
+
+登录接口按IP限流（10次/分钟），从一台机器压测超过10名虚拟学生时，请以 RATE_LIMIT_ENABLED=False
+启动后端，或用 --login-interval 错开登录（如 6 秒）。登录失败的学生不参与压测，会在报告中单独列出。
+
+用法（在backend目录下）：
+    python -m scripts.load_test --base-url http://localhost:5000 --users 50 --duration 60
+"""
+
+import argparse
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# 压测场景中的接口
+ENDPOINTS = {
+    'login': ('POST', '/api/auth/login'),
+    'categories': ('GET', '/api/categories?include_count=true'),
+    'upload': ('POST', '/api/upload'),
+    'start_session': ('POST', '/api/practice/sessions'),
+    'answer': ('POST', '/api/practice/sessions/{session_id}/answer'),
+    'upload_status': ('GET', '/api/upload/status/{file_id}'),
+}
+
+# 上传的文件不触发AI解析，只用于轮询状态
+UPLOAD_CONTENT = '1. 1+1=?\nA. 1\nB. 2\n答案：B\n'.encode('utf-8')
+
+
+class Stats:
+    """线程安全的请求统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name, seconds, ok):
+        with self._lock:
+            self.latencies[name].append(seconds)
+            if not ok:
+                self.errors[name] += 1
+
+
+def percentile(sorted_values, fraction):
+    """最近秩法计算分位数"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class VirtualStudent:
+    """一个虚拟学生的会话"""
+
+    def __init__(self, base_url, username, password, stats, rng, session_size):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.stats = stats
+        self.rng = rng
+        self.session_size = session_size
+        self.http = requests.Session()
+        self.category_ids = []
+        self.file_id = None
+
+    def call(self, name, json_body=None, files=None, data=None, **path_args):
+        """调用场景中的一个接口并记录耗时"""
+        method, path = ENDPOINTS[name]
+        url = self.base_url + path.format(**path_args)
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, url, json=json_body, files=files, data=data, timeout=30)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        self.stats.record(name, time.perf_counter() - started, ok)
+        if ok:
+            try:
+                return response.json()
+            except ValueError:
+                return None
+        return None
+
+    def login(self):
+        data = self.call('login', {'username': self.username, 'password': self.password})
+        token = ((data or {}).get('data') or {}).get('token')
+        if token:
+            self.http.headers['Authorization'] = f'Bearer {token}'
+        return bool(token)
+
+    def setup(self):
+        """读取有题目的分类并上传一个文件（同一用户重复上传相同内容时复用已有记录）"""
+        data = self.call('categories') or {}
+        self.category_ids = [item['id'] for item in data.get('categories', []) if item.get('question_count')]
+        data = self.call('upload', files={'file': ('load_test.txt', UPLOAD_CONTENT)},
+                         data={'parse_mode': 'manual'}) or {}
+        self.file_id = (data.get('data') or {}).get('file_id')
+
+    def guess(self, question):
+        """按题型随机作答"""
+        kind = question.get('type')
+        if kind == 'multiple_choice':
+            return sorted(self.rng.sample('ABCD', self.rng.randint(1, 3)))
+        if kind == 'true_false':
+            return self.rng.random() < 0.5
+        if kind == 'fill_blank':
+            return [self.rng.choice(['函数', '方程', '概率'])]
+        return self.rng.choice('ABCD')
+
+    def iteration(self):
+        """执行一轮完整的练习场景：开始会话并答完所有题目"""
+        body = {'mode': 'random', 'count': self.session_size}
+        if self.category_ids:
+            body['category_id'] = self.rng.choice(self.category_ids)
+        session = (self.call('start_session', body) or {}).get('session')
+        while session and not session['finished'] and session.get('question'):
+            data = self.call('answer', {
+                'index': session['cursor'],
+                'answer': self.guess(session['question']),
+                'duration_seconds': self.rng.randint(5, 60),
+            }, session_id=session['session_id']) or {}
+            session = data.get('session')
+        if self.file_id:
+            self.call('upload_status', file_id=self.file_id)
+
+
+def run_student(args, index, stats, deadline):
+    """运行一名虚拟学生，返回是否登录成功"""
+    rng = random.Random(args.seed + index)
+    student = VirtualStudent(args.base_url, f'{args.user_prefix}{index % args.user_pool}',
+                             args.password, stats, rng, args.session_size)
+    if args.login_interval:
+        time.sleep(index * args.login_interval)
+    if not student.login():
+        return False
+    student.setup()
+    while time.monotonic() < deadline:
+        student.iteration()
+        if args.think_time:
+            time.sleep(rng.uniform(0, args.think_time))
+    return True
+
+
+def print_report(stats, elapsed):
+    print(f"\n压测时长: {elapsed:.1f} 秒")
+    print(f"{'接口':16s} {'请求数':>8s} {'错误':>6s} {'吞吐/秒':>9s} {'p50(ms)':>9s} {'p95(ms)':>9s} {'p99(ms)':>9s}")
+    total = 0
+    for name in ENDPOINTS:
+        values = sorted(stats.latencies.get(name, []))
+        if not values:
+            continue
+        total += len(values)
+        print(f"{name:16s} {len(values):8d} {stats.errors[name]:6d} {len(values) / elapsed:9.1f} "
+              f"{percentile(values, 0.50) * 1000:9.1f} {percentile(values, 0.95) * 1000:9.1f} "
+              f"{percentile(values, 0.99) * 1000:9.1f}")
+    print(f"总吞吐: {total / elapsed:.1f} 请求/秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='刷刷题API压测')
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--users', type=int, default=20, help='并发虚拟学生数')
+    parser.add_argument('--duration', type=float, default=30, help='压测时长（秒）')
+    parser.add_argument('--think-time', type=float, default=0.0, help='每轮之间的最大随机等待（秒）')
+    parser.add_argument('--user-prefix', default='seed1_', help='seed_data.py 生成的用户名前缀')
+    parser.add_argument('--user-pool', type=int, default=200, help='可用的合成用户数量')
+    parser.add_argument('--password', default='password123')
+    parser.add_argument('--session-size', type=int, default=10, help='每个练习会话的题目数')
+    parser.add_argument('--login-interval', type=float, default=0.0,
+                        help='相邻虚拟学生登录的间隔（秒），用于避开登录接口的IP限流')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    stats = Stats()
+    started = time.monotonic()
+    deadline = started + args.duration
+    print(f"🚀 {args.users} 个虚拟学生压测 {args.base_url}，持续 {args.duration} 秒")
+    # 登录错开时，最后一名学生也要跑满压测时长
+    deadline += args.login_interval * (args.users - 1)
+    with ThreadPoolExecutor(max_workers=args.users) as executor:
+        futures = [executor.submit(run_student, args, index, stats, deadline) for index in range(args.users)]
+    failed_logins = 0
+    crashed = 0
+    for future in futures:
+        try:
+            if not future.result():
+                failed_logins += 1
+        except Exception as e:
+            crashed += 1
+            print(f"❌ 虚拟学生异常退出: {e!r}")
+    print_report(stats, time.monotonic() - started)
+    if failed_logins:
+        print(f"⚠️  {failed_logins}/{args.users} 名虚拟学生登录失败，未参与压测"
+              f"（登录接口按IP限流，见脚本说明）")
+    if crashed:
+        print(f"⚠️  {crashed}/{args.users} 名虚拟学生异常退出")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上传文件迁移脚本
+
+把旧版本平铺在 UPLOAD_FOLDER 下的上传文件迁移到内容寻址存储（blobs/ab/cd/<sha256>），
+相同内容只保留一份并建立引用计数。已迁移的记录会被跳过，可以重复运行。
+
+用法（在backend目录下）：
+    python -m scripts.migrate_upload_storage
+    python -m scripts.migrate_upload_storage --dry-run
+"""
+
+import argparse
+import os
+import shutil
+import uuid
+from flask import Flask
+
+from config import config
+from models import db, UploadRecord
+from services.upload_storage import get_temp_folder, hash_file, store_blob
+
+
+def migrate(dry_run=False):
+    records = UploadRecord.query.filter(UploadRecord.content_hash.is_(None)).order_by(UploadRecord.id).all()
+    migrated = missing = saved_bytes = 0
+    seen = set()
+    for record in records:
+        if not record.file_path or not os.path.exists(record.file_path):
+            missing += 1
+            continue
+
+        sha256 = hash_file(record.file_path)
+        if sha256 in seen:
+            saved_bytes += record.file_size or 0
+        seen.add(sha256)
+        migrated += 1
+        if dry_run:
+            continue
+
+        # 先复制到临时文件再放入存储，复制完成前原文件保持不变
+        temp_path = os.path.join(get_temp_folder(), f'{uuid.uuid4().hex}.part')
+        shutil.copyfile(record.file_path, temp_path)
+        old_path = record.file_path
+        record.file_path = store_blob(temp_path, sha256, os.path.getsize(temp_path))
+        record.content_hash = sha256
+        record.stored_filename = sha256
+        db.session.commit()
+        os.remove(old_path)
+
+    print(f"✅ 迁移: {migrated}，文件缺失: {missing}，去重节省 {saved_bytes / 1024 / 1024:.1f} MB"
+          f"{'（试运行）' if dry_run else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='迁移上传文件到内容寻址存储')
+    parser.add_argument('--config', default='development', help='配置名称')
+    parser.add_argument('--database', help='数据库连接串，默认使用配置中的数据库')
+    parser.add_argument('--dry-run', action='store_true', help='只统计，不迁移')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.from_object(config[args.config])
+    if args.database:
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        migrate(args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成数据生成脚本
+
+通过 models.py 中的真实数据表批量写入用户、分类、各题型题目，以及带有
+热度偏斜的练习记录、错题和收藏，用于在本地复现生产规模的数据量。
+
+用法（在backend目录下）：
+    python -m scripts.seed_data --users 1000 --categories 30 --questions 100000 \\
+        --practice-per-user 200 --database sqlite:///load_test.db
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from flask import Flask, current_app
+from sqlalchemy import func, literal, select
+from werkzeug.security import generate_password_hash
+
+from config import config
+from models import (db, User, Category, Question, PracticeRecord, WrongAnswer, Favorite,
+                    QuestionChange)
+from utils.etag import bump_table_version
+
+DEFAULT_TYPE_MIX = 'single_choice=40,multiple_choice=25,true_false=20,fill_blank=15'
+SEED_PASSWORD = 'password123'
+BATCH_SIZE = 5000
+
+SUBJECT_WORDS = ['函数', '导数', '极限', '方程', '概率', '向量', '数列', '集合', '细胞', '电路',
+                 '化学键', '氧化还原', '朝代', '经纬度', '语法', '修辞', '古诗', '牛顿定律']
+
+
+def parse_type_mix(text):
+    """解析题型比例，如 'single_choice=40,true_false=60'"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def zipf_sampler(rng, size, exponent):
+    """按 Zipf 分布抽取 [0, size) 中的下标，模拟少数活跃用户/热门题目"""
+    weights = [1.0 / (rank ** exponent) for rank in range(1, size + 1)]
+    cumulative = list(itertools.accumulate(weights))
+    total = cumulative[-1]
+    return lambda: bisect.bisect_left(cumulative, rng.random() * total)
+
+
+def insert_batches(model, rows):
+    """分批插入，返回插入的行数"""
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            db.session.execute(model.__table__.insert(), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(model.__table__.insert(), batch)
+        count += len(batch)
+    db.session.commit()
+    return count
+
+
+def make_question(rng, kind, category_id, user_id, now):
+    """生成一道指定题型的题目数据"""
+    topic = ''.join(rng.sample(SUBJECT_WORDS, 3))
+    options = None
+    if kind == 'single_choice':
+        options = [f'{letter}. {rng.choice(SUBJECT_WORDS)}' for letter in 'ABCD']
+        answer = rng.choice('ABCD')
+    elif kind == 'multiple_choice':
+        options = [f'{letter}. {rng.choice(SUBJECT_WORDS)}' for letter in 'ABCDE']
+        answer = sorted(rng.sample('ABCDE', rng.randint(2, 4)))
+    elif kind == 'true_false':
+        answer = rng.random() < 0.5
+    else:
+        answer = [rng.choice(SUBJECT_WORDS) for _ in range(rng.randint(1, 3))]
+    created = now - timedelta(days=rng.randint(0, 365))
+    difficulty = min(5, max(1, int(rng.gauss(3, 1))))
+    return {
+        'category_id': category_id,
+        'user_id': user_id,
+        'type': kind,
+        'content': f'关于{topic}的说法，下列哪一项是正确的？',
+        'options': json.dumps(options, ensure_ascii=False) if options else None,
+        'answer': json.dumps(answer, ensure_ascii=False),
+        'explanation': f'本题考查{topic}的基本概念。' * rng.randint(1, 4),
+        'difficulty': difficulty,
+        'initial_difficulty': difficulty,
+        'source_file': f'seed_{rng.randint(1, 500)}.pdf',
+        'tags': json.dumps(rng.sample(SUBJECT_WORDS, 2), ensure_ascii=False),
+        'is_active': rng.random() > 0.02,
+        'created_at': created,
+        'updated_at': created,
+    }
+
+
+def seed(args):
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+
+    # 用户：所有合成用户共用同一个密码哈希，避免逐个计算慢哈希
+    password_hash = generate_password_hash(SEED_PASSWORD, current_app.config['PASSWORD_HASH_METHOD'])
+    prefix = f'seed{args.seed}_'
+    insert_batches(User, ({
+        'username': f'{prefix}{i}',
+        'email': f'{prefix}{i}@example.com',
+        'password_hash': password_hash,
+        'role': 'admin' if i == 0 else 'user',
+        'is_active': True,
+        'created_at': now,
+        'updated_at': now,
+    } for i in range(args.users)))
+    user_ids = [user_id for (user_id,) in
+                db.session.query(User.id).filter(User.username.startswith(prefix, autoescape=True))]
+    print(f"✅ 用户: {args.users}（密码均为 {SEED_PASSWORD}，管理员 {prefix}0）")
+
+    # 分类
+    insert_batches(Category, ({
+        'name': f'{prefix}分类{i}',
+        'description': '合成数据分类',
+        'sort_order': 100 + i,
+        'is_default': False,
+        'created_at': now,
+        'updated_at': now,
+    } for i in range(args.categories)))
+    category_ids = [category_id for (category_id,) in
+                    db.session.query(Category.id).filter(Category.name.startswith(f'{prefix}分类', autoescape=True))]
+    print(f"✅ 分类: {args.categories}")
+
+    # 题目：分类大小同样呈偏斜分布
+    type_mix = parse_type_mix(args.type_mix)
+    kinds, weights = list(type_mix), list(type_mix.values())
+    pick_category = zipf_sampler(rng, len(category_ids), 0.8)
+    first_question_id = (db.session.query(func.max(Question.id)).scalar() or 0) + 1
+    insert_batches(Question, (
+        make_question(rng, rng.choices(kinds, weights)[0], category_ids[pick_category()],
+                      rng.choice(user_ids), now)
+        for _ in range(args.questions)
+    ))
+    difficulties = dict(db.session.query(Question.id, Question.difficulty).filter(
+        Question.id >= first_question_id).all())
+    question_ids = sorted(difficulties)
+    print(f"✅ 题目: {args.questions}（{args.type_mix}）")
+
+    # 练习记录：活跃用户和热门题目都服从 Zipf 分布
+    pick_user = zipf_sampler(rng, len(user_ids), args.skew)
+    pick_question = zipf_sampler(rng, len(question_ids), args.skew)
+    total_practice = args.users * args.practice_per_user
+    wrong = {}
+    # (用户, 日期) -> (当天第几次练习, 本次已练习的题目)；同一会话内不能重复作答同一题
+    bursts = {}
+
+    def session_id(user_id, question_id, practiced_at):
+        key = (user_id, practiced_at.date())
+        number, answered = bursts.get(key, (0, set()))
+        if question_id in answered:
+            number, answered = number + 1, set()
+        answered.add(question_id)
+        bursts[key] = (number, answered)
+        return f'seed-{user_id}-{practiced_at:%Y%m%d}-{number}'
+
+    def practice_rows():
+        for _ in range(total_practice):
+            user_id = user_ids[pick_user()]
+            question_id = question_ids[pick_question()]
+            correct_rate = 0.9 - 0.12 * (difficulties[question_id] - 1)
+            is_correct = rng.random() < correct_rate
+            practiced_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+            if not is_correct:
+                key = (user_id, question_id)
+                count, last = wrong.get(key, (0, practiced_at))
+                wrong[key] = (count + 1, max(last, practiced_at))
+            yield {
+                'user_id': user_id,
+                'question_id': question_id,
+                'session_id': session_id(user_id, question_id, practiced_at),
+                'user_answer': json.dumps('A' if is_correct else 'B'),
+                'is_correct': is_correct,
+                'duration_seconds': max(3, int(rng.lognormvariate(3, 0.6))),
+                'practice_mode': 'practice' if rng.random() < 0.8 else 'review',
+                'practiced_at': practiced_at,
+            }
+
+    insert_batches(PracticeRecord, practice_rows())
+    print(f"✅ 练习记录: {total_practice}")
+
+    insert_batches(WrongAnswer, ({
+        'user_id': user_id,
+        'question_id': question_id,
+        'error_count': count,
+        'last_error_at': last,
+        'is_mastered': rng.random() < 0.3,
+        'added_at': last,
+    } for (user_id, question_id), (count, last) in wrong.items()))
+    print(f"✅ 错题: {len(wrong)}")
+
+    favorites = set()
+    for _ in range(int(total_practice * args.favorite_ratio)):
+        favorites.add((user_ids[pick_user()], question_ids[pick_question()]))
+    insert_batches(Favorite, ({
+        'user_id': user_id,
+        'question_id': question_id,
+        'notes': None,
+        'added_at': now,
+    } for user_id, question_id in favorites))
+    print(f"✅ 收藏: {len(favorites)}")
+
+    # 批量插入绕过了 ORM 事件，手动登记变更日志和表版本
+    db.session.execute(QuestionChange.__table__.insert().from_select(
+        ['question_id', 'category_id', 'operation', 'changed_at'],
+        select(Question.id, Question.category_id, literal('upsert'), literal(now))
+        .where(Question.id >= first_question_id, Question.is_active == True)
+        .order_by(Question.id)
+    ))
+    bump_table_version('categories', 'questions')
+    db.session.commit()
+
+    print(f"🎉 完成，用时 {time.perf_counter() - started:.1f} 秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成合成测试数据')
+    parser.add_argument('--config', default='development', help='配置名称')
+    parser.add_argument('--database', help='数据库连接串，默认使用配置中的数据库')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--questions', type=int, default=20000)
+    parser.add_argument('--type-mix', default=DEFAULT_TYPE_MIX, help='题型比例')
+    parser.add_argument('--practice-per-user', type=int, default=100, help='人均练习记录数')
+    parser.add_argument('--favorite-ratio', type=float, default=0.02, help='收藏数占练习记录数的比例')
+    parser.add_argument('--skew', type=float, default=1.1, help='用户活跃度与题目热度的Zipf指数')
+    parser.add_argument('--seed', type=int, default=1, help='随机种子（同时作为用户名前缀）')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.from_object(config[args.config])
+    if args.database:
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        seed(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+# 服务模块
\ No newline at end of file
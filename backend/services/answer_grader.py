@@ -0,0 +1,246 @@
+import json
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# 判断题的真值/假值写法（均为归一化之后的形式）
+TRUE_VALUES = frozenset(['true', 't', '1', 'yes', 'y', '对', '正确', '是', '√', '✓', 'v'])
+FALSE_VALUES = frozenset(['false', 'f', '0', 'no', 'n', '错', '错误', '否', '×', '✗', 'x'])
+
+# 选择题答案中可能出现的分隔符
+_CHOICE_SEPARATORS = re.compile(r'[\s,，、;；/|]+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(value):
+    """归一化作答文本
+
+    NFKC 会把全角字母、数字和标点折叠为半角，再统一大小写并压缩空白，
+    使 "ＡＢＣ"、" abc " 与 "abc" 视为同一答案。
+    """
+    if value is None:
+        return ''
+    text = unicodedata.normalize('NFKC', str(value))
+    return _WHITESPACE.sub(' ', text).strip().casefold()
+
+
+def _load(raw):
+    """解析JSON文本，非JSON时按原始字符串处理"""
+    if isinstance(raw, str):
+        try:
+            return json.loads(raw)
+        except (TypeError, ValueError):
+            return raw
+    return raw
+
+
+def _choice_letters(value):
+    """把选择题答案解析为选项字母集合"""
+    value = _load(value)
+    if value is None:
+        return frozenset()
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = value
+    else:
+        text = normalize_text(value)
+        items = _CHOICE_SEPARATORS.split(text)
+        # "ABD" 这类连写形式拆成单个字母
+        if len(items) == 1 and items[0].isalpha() and items[0].isascii():
+            items = list(items[0])
+    return frozenset(normalize_text(item).rstrip('.') for item in items if normalize_text(item))
+
+
+def _boolean(value):
+    """把判断题答案解析为布尔值，无法识别时返回None"""
+    value = _load(value)
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (list, tuple)) and len(value) == 1:
+        return _boolean(value[0])
+    text = normalize_text(value)
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    return None
+
+
+class ChoiceMatcher:
+    """选择题匹配器：单选/多选均以选项集合比较"""
+    __slots__ = ('expected',)
+
+    def __init__(self, answer):
+        self.expected = _choice_letters(answer)
+
+    def match(self, user_answer):
+        return bool(self.expected) and _choice_letters(user_answer) == self.expected
+
+
+class BooleanMatcher:
+    """判断题匹配器"""
+    __slots__ = ('expected',)
+
+    def __init__(self, answer):
+        self.expected = _boolean(answer)
+
+    def match(self, user_answer):
+        return self.expected is not None and _boolean(user_answer) is self.expected
+
+
+class BlankMatcher:
+    """填空题匹配器
+
+    每个空对应一组可接受的归一化答案。答案格式支持：
+    "北京"、["北京", "上海"]（两个空）、[["北京", "北平"], "上海"]（第一空有两种写法），
+    单个空内也可以用 "|" 分隔多种写法。
+    """
+    __slots__ = ('blanks',)
+
+    def __init__(self, answer):
+        answer = _load(answer)
+        if not isinstance(answer, (list, tuple)):
+            answer = [answer]
+        self.blanks = tuple(self._alternatives(blank) for blank in answer)
+
+    @staticmethod
+    def _alternatives(blank):
+        if isinstance(blank, (list, tuple)):
+            candidates = blank
+        else:
+            candidates = str(blank).split('|') if blank is not None else []
+        return frozenset(normalize_text(item) for item in candidates if normalize_text(item))
+
+    def match(self, user_answer):
+        user_answer = _load(user_answer)
+        if not isinstance(user_answer, (list, tuple)):
+            user_answer = [user_answer]
+        if len(user_answer) != len(self.blanks) or not self.blanks:
+            return False
+        return all(normalize_text(given) in accepted
+                   for given, accepted in zip(user_answer, self.blanks))
+
+
+class TextMatcher:
+    """其他题型：归一化后整体比较"""
+    __slots__ = ('expected',)
+
+    def __init__(self, answer):
+        self.expected = normalize_text(json.dumps(_load(answer), ensure_ascii=False, sort_keys=True))
+
+    def match(self, user_answer):
+        given = normalize_text(json.dumps(_load(user_answer), ensure_ascii=False, sort_keys=True))
+        return bool(self.expected) and given == self.expected
+
+
+MATCHERS = {
+    'single_choice': ChoiceMatcher,
+    'multiple_choice': ChoiceMatcher,
+    'true_false': BooleanMatcher,
+    'fill_blank': BlankMatcher,
+}
+
+
+def compile_answer(question_type, answer):
+    """把题目的标准答案编译为匹配器"""
+    matcher_cls = MATCHERS.get(question_type, TextMatcher)
+    return matcher_cls(answer)
+
+
+class AnswerGrader:
+    """判分器 - 按 (题目ID, 更新时间) 缓存编译后的匹配器"""
+
+    def __init__(self, max_entries=20000):
+        """初始化判分器
+
+        Args:
+            max_entries: 最多缓存的匹配器数量，超出后按LRU淘汰
+        """
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_matcher(self, question):
+        """获取题目的匹配器，题目更新后自动重新编译"""
+        key = (question.id, question.updated_at)
+        with self._lock:
+            matcher = self._cache.get(key)
+            if matcher is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return matcher
+            self.misses += 1
+
+        matcher = compile_answer(question.type, question.answer)
+        with self._lock:
+            self._cache[key] = matcher
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return matcher
+
+    def grade(self, question, user_answer):
+        """判定单个作答是否正确
+
+        Args:
+            question: Question 模型对象（需要 id/type/answer/updated_at）
+            user_answer: 用户作答，可以是JSON文本或已解析的值
+
+        Returns:
+            bool: 是否答对
+        """
+        return self.get_matcher(question).match(user_answer)
+
+    def grade_batch(self, questions, user_answers):
+        """批量判分
+
+        同一题目在批次中只查找一次匹配器，相同的(题目, 作答文本)只判定一次，
+        适合整卷提交或重新判分。
+
+        Args:
+            questions: Question 对象列表
+            user_answers: 与 questions 一一对应的作答列表
+
+        Returns:
+            list: 每个作答是否正确
+        """
+        if len(questions) != len(user_answers):
+            raise ValueError('题目数量与作答数量不一致')
+
+        matchers = {}
+        verdicts = {}
+        results = []
+        for question, user_answer in zip(questions, user_answers):
+            key = (question.id, question.updated_at)
+            matcher = matchers.get(key)
+            if matcher is None:
+                matcher = matchers[key] = self.get_matcher(question)
+
+            if isinstance(user_answer, str):
+                verdict_key = (key, user_answer)
+                verdict = verdicts.get(verdict_key)
+                if verdict is None:
+                    verdict = verdicts[verdict_key] = matcher.match(user_answer)
+            else:
+                verdict = matcher.match(user_answer)
+            results.append(verdict)
+        return results
+
+    def invalidate(self, question_id):
+        """移除某道题目的所有缓存匹配器"""
+        with self._lock:
+            for key in [key for key in self._cache if key[0] == question_id]:
+                del self._cache[key]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# 全局判分器实例
+answer_grader = AnswerGrader()
@@ -0,0 +1,221 @@
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, UploadSession
+from services.upload_storage import (file_type_error, normalize_parse_settings, get_temp_folder, hash_file,
+                                     store_blob, register_stored_upload, release_blob)
+
+# 写入分块时每次从请求流读取的字节数
+READ_SIZE = 256 * 1024
+
+# 两次清理过期会话之间的最短间隔（秒）
+CLEANUP_INTERVAL = 600
+
+_next_cleanup = 0.0
+
+
+class UploadSessionError(ValueError):
+    """上传会话请求无效"""
+
+    def __init__(self, message, status_code=400, offset=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+
+def create_session(user_id, filename, total_size, checksum=None, mime_type=None, settings=None):
+    """创建上传会话
+
+    Args:
+        settings: 请求中的解析配置，创建时即转换为上传记录的列值（如题型列表转为逗号分隔），
+            完成上传时直接用于创建上传记录
+    """
+    if not filename:
+        raise UploadSessionError('不支持的文件类型')
+    error = file_type_error(filename)
+    if error:
+        raise UploadSessionError(error)
+    if not isinstance(total_size, int) or total_size <= 0:
+        raise UploadSessionError('文件大小无效')
+    if total_size > current_app.config.get('UPLOAD_MAX_FILE_SIZE', 1024 * 1024 * 1024):
+        raise UploadSessionError('文件过大', 413)
+    if checksum is not None and (len(checksum) != 64 or any(c not in '0123456789abcdef' for c in checksum.lower())):
+        raise UploadSessionError('校验值必须是SHA-256十六进制字符串')
+    try:
+        settings = normalize_parse_settings(settings or {})
+    except ValueError as e:
+        raise UploadSessionError(str(e))
+
+    cleanup_expired_sessions()
+
+    upload_id = uuid.uuid4().hex
+    temp_path = os.path.join(get_temp_folder(), f'{upload_id}.upload')
+    open(temp_path, 'wb').close()
+
+    ttl_hours = current_app.config.get('UPLOAD_SESSION_TTL_HOURS', 24)
+    session = UploadSession(
+        id=upload_id,
+        user_id=user_id,
+        original_filename=filename,
+        mime_type=mime_type,
+        total_size=total_size,
+        received_size=0,
+        checksum=checksum.lower() if checksum else None,
+        settings=json.dumps(settings) if settings else None,
+        temp_path=temp_path,
+        expires_at=datetime.utcnow() + timedelta(hours=ttl_hours)
+    )
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+def get_session(upload_id, user_id):
+    session = db.session.get(UploadSession, upload_id)
+    if session is None or session.user_id != user_id:
+        raise UploadSessionError('上传会话不存在或已过期', 404)
+    if session.expires_at < datetime.utcnow():
+        _discard(session)
+        raise UploadSessionError('上传会话不存在或已过期', 404)
+    return session
+
+
+def write_chunk(session, offset, stream, length):
+    """在指定偏移量写入一个分块，直接从请求流写到临时文件
+
+    偏移量必须等于服务端已确认的字节数。写入前把文件截断到已确认的位置，
+    丢弃上次中断时写了一半、尚未确认的数据；确认使用条件更新，
+    并发重传同一分块时只有一个请求成功，另一个收到409和最新偏移量。
+
+    Returns:
+        int: 新的偏移量
+    """
+    if offset != session.received_size:
+        raise UploadSessionError('偏移量与服务端不一致', 409, session.received_size)
+    if length is None:
+        raise UploadSessionError('缺少 Content-Length', 411)
+    if length <= 0 or offset + length > session.total_size:
+        raise UploadSessionError('分块超出文件大小', 416, session.received_size)
+
+    written = 0
+    with open(session.temp_path, 'r+b') as f:
+        f.seek(offset)
+        f.truncate()
+        while written < length:
+            data = stream.read(min(READ_SIZE, length - written))
+            if not data:
+                break
+            f.write(data)
+            written += len(data)
+        f.flush()
+        os.fsync(f.fileno())
+    if written != length:
+        # 客户端中途断开，未确认的数据会在下次写入时被截断
+        raise UploadSessionError('分块数据不完整', 400, session.received_size)
+
+    table = UploadSession.__table__
+    result = db.session.execute(table.update().where(
+        table.c.id == session.id, table.c.received_size == offset
+    ).values(received_size=offset + length, updated_at=datetime.utcnow()))
+    db.session.commit()
+    db.session.refresh(session)
+    if result.rowcount == 0:
+        raise UploadSessionError('分块已被其他请求写入', 409, session.received_size)
+    return session.received_size
+
+
+def complete_session(session):
+    """校验完整性，放入内容寻址存储并创建上传记录
+
+    Returns:
+        tuple: (UploadRecord, 是否复用了已有结果)
+    """
+    if session.received_size != session.total_size:
+        raise UploadSessionError('文件尚未上传完整', 409, session.received_size)
+    actual_size = os.path.getsize(session.temp_path)
+    if actual_size != session.total_size:
+        # 并发写入被中断的请求截断了文件：回退到实际写入的位置继续上传
+        session.received_size = min(actual_size, session.total_size)
+        db.session.commit()
+        raise UploadSessionError('临时文件不完整，请从返回的偏移量继续上传', 409, session.received_size)
+
+    sha256 = hash_file(session.temp_path)
+    if session.checksum and session.checksum != sha256:
+        _discard(session)
+        raise UploadSessionError('文件校验失败，请重新上传', 422)
+
+    settings = json.loads(session.settings) if session.settings else None
+    user_id = session.user_id
+    filename = session.original_filename
+    mime_type = session.mime_type
+    size = session.total_size
+    temp_path = session.temp_path
+
+    db.session.delete(session)
+    db.session.commit()
+
+    path = store_blob(temp_path, sha256, size)
+    try:
+        return register_stored_upload(user_id, sha256, size, path, filename, settings, mime_type)
+    except BaseException:
+        db.session.rollback()
+        release_blob(sha256)
+        raise
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _discard(session):
+    temp_path = session.temp_path
+    db.session.delete(session)
+    db.session.commit()
+    _remove_quietly(temp_path)
+
+
+def abort_session(session):
+    """取消上传，删除临时文件"""
+    _discard(session)
+
+
+def cleanup_expired_sessions(force=False):
+    """删除过期会话及其临时文件，以及没有会话对应的遗留临时文件
+
+    创建会话时顺带调用，进程内每 CLEANUP_INTERVAL 秒最多执行一次。
+
+    Returns:
+        int: 删除的会话数
+    """
+    global _next_cleanup
+    if not force and time.monotonic() < _next_cleanup:
+        return 0
+    _next_cleanup = time.monotonic() + CLEANUP_INTERVAL
+
+    now = datetime.utcnow()
+    expired = UploadSession.query.filter(UploadSession.expires_at < now).all()
+    for session in expired:
+        _remove_quietly(session.temp_path)
+        db.session.delete(session)
+    db.session.commit()
+
+    # 进程崩溃等原因遗留的临时文件：超过会话有效期仍未被引用的直接删除
+    folder = get_temp_folder()
+    max_age = current_app.config.get('UPLOAD_SESSION_TTL_HOURS', 24) * 3600
+    active = {os.path.basename(path) for (path,) in db.session.query(UploadSession.temp_path).all()}
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name in active:
+            continue
+        try:
+            if time.time() - os.path.getmtime(path) > max_age:
+                os.remove(path)
+        except OSError:
+            pass
+    return len(expired)
@@ -0,0 +1,309 @@
+import itertools
+from datetime import datetime
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, func, bindparam
+from models import db, User, Question, PracticeRecord, PracticeArchive, CalibrationRun
+from services.practice_archive import decode_archive
+from utils.change_log import record_question_changes, OP_UPSERT
+from utils.etag import bump_table_version
+
+# 难度等级 3 对应难度参数 0
+MIDDLE_LEVEL = 3
+
+# 写回时每条 executemany 语句的行数
+WRITE_CHUNK_SIZE = 1000
+
+# 一次解码的归档数
+ARCHIVE_BATCH_SIZE = 50
+
+
+def score_to_level(scores, level_width):
+    """难度参数（logit）换算为 1-5 的难度等级"""
+    return np.clip(np.rint(MIDDLE_LEVEL + scores / level_width), 1, 5).astype(np.int64)
+
+
+def _iter_chunks(query, id_column, chunk_size, after_id=0):
+    """按主键分页执行查询，每块返回按列组织的元组（第一列须为主键）"""
+    while True:
+        rows = db.session.execute(query.where(id_column > after_id).order_by(id_column).limit(chunk_size)).all()
+        if not rows:
+            return
+        after_id = rows[-1][0]
+        yield tuple(zip(*rows))
+        if len(rows) < chunk_size:
+            return
+
+
+def _record_arrays(user_ids, question_ids, is_correct, durations):
+    # duration_seconds 为空时转换为 NaN
+    return (np.asarray(user_ids, dtype=np.int64), np.asarray(question_ids, dtype=np.int64),
+            np.asarray(is_correct, dtype=np.float64), np.array(durations, dtype=np.float64))
+
+
+def iter_record_chunks(after_id=0, until_id=None, chunk_size=200000):
+    """按ID顺序分块读取练习记录
+
+    Yields:
+        tuple: (user_ids, question_ids, is_correct, durations) 四个等长的 NumPy 数组
+    """
+    query = select(PracticeRecord.id, PracticeRecord.user_id, PracticeRecord.question_id,
+                   PracticeRecord.is_correct, PracticeRecord.duration_seconds)
+    if until_id is not None:
+        query = query.where(PracticeRecord.id <= until_id)
+    for columns in _iter_chunks(query, PracticeRecord.id, chunk_size, after_id):
+        yield _record_arrays(*columns[1:])
+
+
+def iter_archived_chunks(chunk_size=200000):
+    """解码已归档的练习记录，凑满 chunk_size 条输出一块（格式同 iter_record_chunks）"""
+    buffers = ([], [], [], [])
+    after_id = 0
+    while True:
+        archives = PracticeArchive.query.filter(PracticeArchive.id > after_id).order_by(
+            PracticeArchive.id.asc()
+        ).limit(ARCHIVE_BATCH_SIZE).all()
+        if not archives:
+            break
+        after_id = archives[-1].id
+        for archive in archives:
+            for row in decode_archive(archive):
+                buffers[0].append(row['user_id'])
+                buffers[1].append(row['question_id'])
+                buffers[2].append(row['is_correct'])
+                buffers[3].append(row['duration_seconds'])
+            if len(buffers[0]) >= chunk_size:
+                yield _record_arrays(*buffers)
+                buffers = ([], [], [], [])
+        db.session.expunge_all()
+    if buffers[0]:
+        yield _record_arrays(*buffers)
+
+
+class DifficultyCalibrator:
+    """Elo 形式的 Rasch（1PL IRT）模型：P(答对) = sigmoid(能力 - 难度)
+
+    参数数组直接以用户ID、题目ID为下标。每块记录向量化地计算残差，按用户和题目汇总后一次更新；
+    步长随累计作答数衰减（step / (1 + decay * n)），一块内同一对象的多次作答按步长之和合并，
+    块再大也不会过冲，结果与逐条更新的 Elo 近似。
+    """
+
+    def __init__(self, step=0.4, decay=0.05, level_width=1.0):
+        """初始化校准器
+
+        Args:
+            step: 初始步长
+            decay: 步长随作答数衰减的速度
+            level_width: 相邻难度等级之间的难度参数差（logit）
+        """
+        self.step = step
+        self.decay = decay
+        self.level_width = level_width
+
+    def load_state(self, fresh=False, chunk_size=200000):
+        """读取题目难度和用户能力的当前值
+
+        Args:
+            fresh: 为 True 时忽略已有校准结果，题目从提取时的难度等级、用户从 0 重新开始
+        """
+        size = (db.session.query(func.max(Question.id)).scalar() or 0) + 1
+        self.difficulty = np.zeros(size)
+        self.question_attempts = np.zeros(size, dtype=np.int64)
+        self.question_steps = np.zeros(size)  # 决定步长的累计作答数（多轮拟合时继续累加）
+        self.levels = np.zeros(size, dtype=np.int64)
+        self.question_exists = np.zeros(size, dtype=bool)
+        # difficulty 会被校准结果覆盖，全量运行的起点取提取时的等级（早于该列的题目没有记录，退回当前等级）
+        query = select(Question.id, Question.difficulty, func.coalesce(Question.initial_difficulty, Question.difficulty),
+                       Question.difficulty_score, Question.difficulty_attempts)
+        for ids, levels, initial_levels, scores, attempts in _iter_chunks(query, Question.id, chunk_size):
+            ids = np.asarray(ids, dtype=np.int64)
+            levels = np.nan_to_num(np.array(levels, dtype=np.float64), nan=MIDDLE_LEVEL).astype(np.int64)
+            self.levels[ids] = levels
+            self.question_exists[ids] = True
+            if fresh:
+                initial_levels = np.nan_to_num(np.array(initial_levels, dtype=np.float64), nan=MIDDLE_LEVEL)
+                self.difficulty[ids] = (initial_levels - MIDDLE_LEVEL) * self.level_width
+            else:
+                prior = (levels - MIDDLE_LEVEL) * self.level_width
+                scores = np.array(scores, dtype=np.float64)
+                self.difficulty[ids] = np.where(np.isnan(scores), prior, scores)
+                self.question_attempts[ids] = np.nan_to_num(np.array(attempts, dtype=np.float64))
+        self.question_steps[:] = self.question_attempts
+
+        size = (db.session.query(func.max(User.id)).scalar() or 0) + 1
+        self.ability = np.zeros(size)
+        self.user_attempts = np.zeros(size, dtype=np.int64)
+        self.user_steps = np.zeros(size)
+        self.user_exists = np.zeros(size, dtype=bool)
+        query = select(User.id, User.ability, User.ability_attempts)
+        for ids, abilities, attempts in _iter_chunks(query, User.id, chunk_size):
+            ids = np.asarray(ids, dtype=np.int64)
+            self.user_exists[ids] = True
+            if not fresh:
+                self.ability[ids] = np.nan_to_num(np.array(abilities, dtype=np.float64))
+                self.user_attempts[ids] = np.nan_to_num(np.array(attempts, dtype=np.float64))
+        self.user_steps[:] = self.user_attempts
+
+    def _deltas(self, residual, index, steps):
+        """汇总一块内每个对象的残差，返回 (对象下标, 参数增量)，并累加步长计数"""
+        unique, inverse = np.unique(index, return_inverse=True)
+        counts = np.bincount(inverse)
+        mean_residual = np.bincount(inverse, weights=residual) / counts
+        # 第 n+1 到 n+c 次作答的步长之和：∫ step / (1 + decay * x) dx
+        gain = self.step / self.decay * np.log1p(self.decay * counts / (1 + self.decay * steps[unique]))
+        steps[unique] += counts
+        return unique, counts, gain * mean_residual
+
+    def update(self, user_ids, question_ids, is_correct, count_attempts=True):
+        """用一块作答记录更新参数，返回实际使用的记录数
+
+        Args:
+            count_attempts: 是否计入作答数（多轮拟合时只有第一轮计入）
+        """
+        mask = (user_ids < len(self.ability)) & (question_ids < len(self.difficulty))
+        if not mask.all():
+            # 已删除且ID超出当前最大ID的用户或题目
+            user_ids, question_ids, is_correct = user_ids[mask], question_ids[mask], is_correct[mask]
+        if not len(user_ids):
+            return 0
+
+        predicted = 1.0 / (1.0 + np.exp(self.difficulty[question_ids] - self.ability[user_ids]))
+        residual = is_correct - predicted
+
+        users, user_counts, user_deltas = self._deltas(residual, user_ids, self.user_steps)
+        questions, question_counts, question_deltas = self._deltas(residual, question_ids, self.question_steps)
+        self.ability[users] += user_deltas
+        self.difficulty[questions] -= question_deltas
+        if count_attempts:
+            self.user_attempts[users] += user_counts
+            self.question_attempts[questions] += question_counts
+        return len(user_ids)
+
+    def calibrated_levels(self, min_attempts):
+        """作答数达到 min_attempts 的题目按校准结果换算难度等级，其余保持原等级"""
+        return np.where(self.question_attempts >= min_attempts,
+                        score_to_level(self.difficulty, self.level_width), self.levels)
+
+
+def _bulk_update(statement, params):
+    for start in range(0, len(params), WRITE_CHUNK_SIZE):
+        db.session.execute(statement, params[start:start + WRITE_CHUNK_SIZE])
+
+
+def save_calibration(calibrator, question_ids, user_ids, min_attempts):
+    """把指定题目和用户的参数批量写回数据库（不提交）
+
+    Returns:
+        list: 难度等级发生变化的题目ID
+    """
+    levels = calibrator.calibrated_levels(min_attempts)
+    changed_ids = question_ids[levels[question_ids] != calibrator.levels[question_ids]]
+
+    table = Question.__table__
+    # 显式保留 updated_at：校准不是内容修改，不应使判分缓存等按更新时间失效
+    statement = table.update().where(table.c.id == bindparam('_id')).values(
+        difficulty=bindparam('_level'),
+        difficulty_score=bindparam('_score'),
+        difficulty_attempts=bindparam('_attempts'),
+        updated_at=table.c.updated_at
+    )
+    _bulk_update(statement, [
+        {'_id': question_id, '_level': level, '_score': score, '_attempts': attempts}
+        for question_id, level, score, attempts in zip(
+            question_ids.tolist(), levels[question_ids].tolist(),
+            calibrator.difficulty[question_ids].tolist(), calibrator.question_attempts[question_ids].tolist()
+        )
+    ])
+
+    table = User.__table__
+    statement = table.update().where(table.c.id == bindparam('_id')).values(
+        ability=bindparam('_ability'),
+        ability_attempts=bindparam('_attempts'),
+        updated_at=table.c.updated_at
+    )
+    _bulk_update(statement, [
+        {'_id': user_id, '_ability': ability, '_attempts': attempts}
+        for user_id, ability, attempts in zip(
+            user_ids.tolist(), calibrator.ability[user_ids].tolist(), calibrator.user_attempts[user_ids].tolist()
+        )
+    ])
+
+    changed_ids = changed_ids.tolist()
+    if changed_ids:
+        # 难度等级写入了离线题包和同步数据，需要让客户端重新获取
+        for start in range(0, len(changed_ids), WRITE_CHUNK_SIZE):
+            record_question_changes(changed_ids[start:start + WRITE_CHUNK_SIZE], OP_UPSERT)
+        bump_table_version('questions')
+    return changed_ids
+
+
+def calibrate_difficulty(full=False, chunk_size=None, epochs=None, dry_run=False):
+    """根据练习记录校准题目难度和用户能力
+
+    增量运行只处理上次成功运行之后新增的练习记录，在已有参数基础上继续更新；
+    全量运行（或第一次运行）从提取时的难度等级重新拟合，包含已归档的记录，默认遍历多轮。
+    参数和运行记录在同一事务中提交，中途失败不会重复计入。不要同时运行多个实例。
+
+    Returns:
+        dict: 校准统计
+    """
+    config = current_app.config
+    chunk_size = chunk_size or config.get('CALIBRATION_CHUNK_SIZE', 200000)
+    min_attempts = config.get('CALIBRATION_MIN_ATTEMPTS', 20)
+    min_duration = config.get('CALIBRATION_MIN_DURATION_SECONDS', 1)
+    started_at = datetime.utcnow()
+
+    last_run = CalibrationRun.query.order_by(CalibrationRun.id.desc()).first()
+    full = full or last_run is None
+    after_id = 0 if full else last_run.last_record_id
+    until_id = db.session.query(func.max(PracticeRecord.id)).scalar() or 0
+    stats = {'mode': 'full' if full else 'incremental', 'after_id': after_id, 'until_id': until_id,
+             'records': 0, 'skipped': 0, 'questions': 0, 'users': 0, 'level_changes': 0}
+    if not full and until_id <= after_id:
+        return stats
+
+    calibrator = DifficultyCalibrator(
+        step=config.get('CALIBRATION_STEP', 0.4),
+        decay=config.get('CALIBRATION_STEP_DECAY', 0.05),
+        level_width=config.get('CALIBRATION_LEVEL_WIDTH', 1.0)
+    )
+    calibrator.load_state(fresh=full, chunk_size=chunk_size)
+    question_seen = np.zeros(len(calibrator.difficulty), dtype=bool)
+    user_seen = np.zeros(len(calibrator.ability), dtype=bool)
+
+    epochs = epochs or (config.get('CALIBRATION_FULL_EPOCHS', 3) if full else 1)
+    for epoch in range(epochs):
+        chunks = iter_record_chunks(after_id, until_id, chunk_size)
+        if full:
+            chunks = itertools.chain(iter_archived_chunks(chunk_size), chunks)
+        for user_ids, question_ids, is_correct, durations in chunks:
+            # 用时过短的作答多为误触或随手点选，不参与校准
+            keep = ~(durations < min_duration)
+            used = calibrator.update(user_ids[keep], question_ids[keep], is_correct[keep], count_attempts=epoch == 0)
+            if epoch == 0:
+                stats['records'] += used
+                stats['skipped'] += len(user_ids) - used
+                question_seen[question_ids[keep][question_ids[keep] < len(question_seen)]] = True
+                user_seen[user_ids[keep][user_ids[keep] < len(user_seen)]] = True
+
+    # 全量运行时所有题目和用户都已重置，需要全部写回
+    question_ids = np.flatnonzero(calibrator.question_exists & (question_seen | full))
+    user_ids = np.flatnonzero(calibrator.user_exists & (user_seen | full))
+    stats['questions'] = len(question_ids)
+    stats['users'] = len(user_ids)
+    if dry_run:
+        levels = calibrator.calibrated_levels(min_attempts)
+        stats['level_changes'] = int((levels[question_ids] != calibrator.levels[question_ids]).sum())
+        return stats
+
+    stats['level_changes'] = len(save_calibration(calibrator, question_ids, user_ids, min_attempts))
+    db.session.add(CalibrationRun(
+        mode=stats['mode'],
+        last_record_id=until_id,
+        record_count=stats['records'],
+        question_count=stats['questions'],
+        user_count=stats['users'],
+        started_at=started_at
+    ))
+    db.session.commit()
+    return stats
@@ -0,0 +1,188 @@
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+# 可重试的HTTP状态码（限流和网关类错误）
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+# 单次退避等待的上限（秒）
+MAX_BACKOFF = 8.0
+
+
+class LLMError(RuntimeError):
+    """大模型接口调用失败"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def chat_completions_url(base_url):
+    """兼容两种配置写法：https://host/v1 与 https://host/v1/chat/completions"""
+    base_url = base_url.rstrip('/')
+    if base_url.endswith('/chat/completions'):
+        return base_url
+    return f'{base_url}/chat/completions'
+
+
+def iter_sse_data(lines):
+    """解析 Server-Sent Events，逐条返回 data 字段（多行 data 按规范用换行拼接）"""
+    data = []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line:
+            if data:
+                yield '\n'.join(data)
+                data = []
+            continue
+        if line.startswith(':'):
+            continue
+        field, _, value = line.partition(':')
+        if field == 'data':
+            data.append(value[1:] if value.startswith(' ') else value)
+    if data:
+        yield '\n'.join(data)
+
+
+class LLMClient:
+    """OpenAI 兼容接口的流式客户端
+
+    每个接口地址（scheme://host:port）共用一个 requests.Session，保持长连接，
+    避免每次调用都重新建立 TCP/TLS 连接。只在收到响应数据之前重试，
+    已经开始输出后中断直接报错，避免重复输出题目。
+    """
+
+    def __init__(self, connect_timeout=10, read_timeout=60, max_retries=3, backoff=0.5, pool_size=10):
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.configure(connect_timeout, read_timeout, max_retries, backoff, pool_size)
+
+    def configure(self, connect_timeout=10, read_timeout=60, max_retries=3, backoff=0.5, pool_size=10):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.close()
+
+    def _session(self, url):
+        parts = urlsplit(url)
+        key = f'{parts.scheme}://{parts.netloc}'
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount(key, adapter)
+                    self._sessions[key] = session
+        return session
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions = {}
+        for session in sessions:
+            session.close()
+
+    def _sleep_before_retry(self, attempt, retry_after=None):
+        # 全抖动指数退避：多个请求同时失败时错开重试时间
+        delay = random.uniform(0, min(MAX_BACKOFF, self.backoff * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), MAX_BACKOFF * 4))
+            except ValueError:
+                pass
+        time.sleep(delay)
+
+    def _open(self, url, headers, body):
+        """发起请求，连接失败和可重试状态码按退避策略重试"""
+        session = self._session(url)
+        attempt = 0
+        while True:
+            try:
+                response = session.post(url, headers=headers, data=body, stream=True, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise LLMError(f'连接大模型接口失败: {e}')
+                self._sleep_before_retry(attempt)
+                attempt += 1
+                continue
+
+            if response.status_code < 400:
+                return response
+            retry_after = response.headers.get('Retry-After')
+            detail = response.text[:500]
+            response.close()
+            if response.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                raise LLMError(f'大模型接口返回错误 {response.status_code}: {detail}', response.status_code)
+            self._sleep_before_retry(attempt, retry_after)
+            attempt += 1
+
+    def stream_chat(self, base_url, api_key, model, messages, usage=None, **options):
+        """流式调用 chat/completions
+
+        Args:
+            usage: 传入字典时请求接口在流末尾返回用量，并写入 prompt_tokens / completion_tokens
+
+        Yields:
+            str: 模型输出的增量文本
+        """
+        url = chat_completions_url(base_url)
+        headers = {
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+        }
+        payload = dict(options, model=model, messages=messages, stream=True)
+        if usage is not None:
+            payload['stream_options'] = {'include_usage': True}
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+        response = self._open(url, headers, body)
+        try:
+            # chunk_size=None：数据一到就处理，不等凑满缓冲区。
+            # 收到 [DONE] 后继续读到响应结束，完整读完的连接才会放回连接池复用
+            done = False
+            for data in iter_sse_data(response.iter_lines(chunk_size=None)):
+                if done or data == '[DONE]':
+                    done = True
+                    continue
+                event = json.loads(data)
+                if event.get('error'):
+                    raise LLMError(f"大模型接口返回错误: {event['error']}")
+                if usage is not None and event.get('usage'):
+                    usage.update(event['usage'])
+                for choice in event.get('choices') or ():
+                    content = (choice.get('delta') or {}).get('content')
+                    if content:
+                        yield content
+        except requests.RequestException as e:
+            raise LLMError(f'大模型响应中断: {e}')
+        finally:
+            # 提前结束（调用方停止迭代或出错）时关闭连接，不把读了一半的连接放回连接池
+            response.close()
+
+    def chat(self, base_url, api_key, model, messages, usage=None, **options):
+        """非流式调用的便捷写法，返回完整输出文本"""
+        return ''.join(self.stream_chat(base_url, api_key, model, messages, usage=usage, **options))
+
+
+# 全局大模型客户端实例
+llm_client = LLMClient()
+
+
+def init_llm_client(app):
+    """按应用配置初始化大模型客户端"""
+    llm_client.configure(
+        connect_timeout=app.config.get('LLM_CONNECT_TIMEOUT', 10),
+        read_timeout=app.config.get('LLM_READ_TIMEOUT', 60),
+        max_retries=app.config.get('LLM_MAX_RETRIES', 3),
+        backoff=app.config.get('LLM_RETRY_BACKOFF', 0.5),
+        pool_size=app.config.get('LLM_POOL_SIZE', 10)
+    )
@@ -0,0 +1,266 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from models import db, ProcessingLog
+from services.text_chunker import iter_chunks, iter_packed_chunks
+
+IMAGE_TYPES = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tif', 'tiff', 'webp'}
+
+# 页面文字层少于该字符数时视为扫描页，需要OCR
+MIN_TEXT_LAYER_CHARS = 20
+
+# 宽度小于该像素的扫描图先放大，提高小字号的识别率
+MIN_OCR_WIDTH = 1200
+
+
+def ocr_image(image_bytes, tesseract_cmd='tesseract', lang='chi_sim+eng', timeout=120):
+    """识别单页图片（在进程池的子进程中执行）
+
+    先用 Pillow 统一转为灰度PNG（PDF中的JPX/CMYK等格式 tesseract 不一定能直接读取），
+    再通过标准输入输出调用 tesseract。
+
+    Returns:
+        tuple: (识别出的文本, 耗时毫秒)
+    """
+    from PIL import Image
+
+    started = time.perf_counter()
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image = image.convert('L')
+        if image.width < MIN_OCR_WIDTH:
+            scale = MIN_OCR_WIDTH / image.width
+            image = image.resize((MIN_OCR_WIDTH, int(image.height * scale)), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+
+    # 每页只用一个线程，并行度由进程池控制，避免 OpenMP 线程与进程数叠加抢占CPU
+    env = dict(os.environ, OMP_THREAD_LIMIT='1')
+    result = subprocess.run([tesseract_cmd, 'stdin', 'stdout', '-l', lang], input=buffer.getvalue(),
+                            capture_output=True, timeout=timeout, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode('utf-8', errors='replace').strip() or 'tesseract 执行失败')
+    return result.stdout.decode('utf-8', errors='replace'), int((time.perf_counter() - started) * 1000)
+
+
+class OcrPool:
+    """OCR进程池
+
+    使用 spawn 方式创建子进程，避免在多线程的Web进程中 fork；
+    多进程部署时每个进程在首次使用时创建自己的进程池。
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, max_workers=None):
+        with self._lock:
+            self.max_workers = max_workers or os.cpu_count() or 2
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def submit(self, func, *args):
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+                self._executor_pid = os.getpid()
+            return self._executor.submit(func, *args)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+# 全局OCR进程池实例
+ocr_pool = OcrPool()
+
+
+def init_ocr(app):
+    """按应用配置初始化OCR进程池"""
+    ocr_pool.configure(app.config.get('OCR_WORKERS'))
+
+
+def _cache_path(digest):
+    folder = current_app.config.get('OCR_CACHE_FOLDER') or os.path.join(current_app.config['UPLOAD_FOLDER'], 'ocr_cache')
+    return os.path.join(folder, digest[:2], f'{digest}.txt')
+
+
+def _read_cache(digest):
+    try:
+        with open(_cache_path(digest), encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_cache(digest, text):
+    path = _cache_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+def iter_page_sources(file_path, file_type):
+    """按页读取文件
+
+    Yields:
+        tuple: (页码, 'text' 或 'image', 文本或图片字节)
+    """
+    file_type = (file_type or os.path.splitext(file_path)[1].lstrip('.')).lower()
+    if file_type in IMAGE_TYPES:
+        with open(file_path, 'rb') as f:
+            yield 1, 'image', f.read()
+        return
+    if file_type == 'txt':
+        with open(file_path, encoding='utf-8', errors='replace') as f:
+            yield 1, 'text', f.read()
+        return
+    if file_type == 'docx':
+        from docx import Document
+
+        # Word 没有分页信息，按段落逐行拼成一页文本，空段落保留为段落间的空行
+        yield 1, 'text', '\n'.join(paragraph.text for paragraph in Document(file_path).paragraphs)
+        return
+    if file_type != 'pdf':
+        raise ValueError(f'不支持OCR的文件类型: {file_type}')
+
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(file_path)
+    for page_number, page in enumerate(reader.pages, 1):
+        text = page.extract_text() or ''
+        if len(text.strip()) >= MIN_TEXT_LAYER_CHARS:
+            yield page_number, 'text', text
+            continue
+        # 扫描页通常只有一张整页图片，取最大的一张识别
+        images = page.images
+        if not images:
+            yield page_number, 'text', text
+            continue
+        yield page_number, 'image', max(images, key=lambda image: len(image.data)).data
+
+
+def _log_page(upload_record_id, page):
+    if upload_record_id is None:
+        return
+    if page['error']:
+        status, message = 'failed', f"第{page['page']}页识别失败: {page['error']}"
+    else:
+        source = {'ocr': 'OCR识别', 'cache': '缓存命中', 'text': '文字层提取'}[page['source']]
+        status, message = 'completed', f"第{page['page']}页{source}，{len(page['text'])}字"
+    db.session.add(ProcessingLog(
+        upload_record_id=upload_record_id,
+        step_name=f"OCR 第{page['page']}页",
+        step_type='ocr',
+        status=status,
+        message=message,
+        output_data=page['text'][:200] if page['text'] else None,
+        duration_ms=page['duration_ms']
+    ))
+    db.session.commit()
+
+
+def iter_ocr_pages(file_path, file_type=None, upload_record_id=None):
+    """逐页识别文件，按页码顺序输出每页结果
+
+    扫描页分发到进程池并行识别，同时在途的页数限制为进程数的两倍以控制内存；
+    第 N 页完成后立即输出，不等待后续页面。相同图片的识别结果按内容哈希缓存。
+
+    Yields:
+        dict: {'page', 'text', 'source', 'duration_ms', 'error'}
+    """
+    config = current_app.config
+    tesseract_cmd = config.get('TESSERACT_CMD', 'tesseract')
+    lang = config.get('OCR_LANG', 'chi_sim+eng')
+    timeout = config.get('OCR_PAGE_TIMEOUT', 120)
+    max_in_flight = ocr_pool.max_workers * 2
+
+    pending = deque()
+
+    def finish(item):
+        page_number, source, payload, digest = item
+        page = {'page': page_number, 'text': '', 'source': source, 'duration_ms': 0, 'error': None}
+        if source == 'ocr':
+            try:
+                page['text'], page['duration_ms'] = payload.result(timeout=timeout + 30)
+                _write_cache(digest, page['text'])
+            except Exception as e:
+                page['error'] = str(e) or e.__class__.__name__
+        else:
+            page['text'] = payload
+        _log_page(upload_record_id, page)
+        return page
+
+    for page_number, kind, payload in iter_page_sources(file_path, file_type):
+        if kind == 'text':
+            pending.append((page_number, 'text', payload, None))
+        else:
+            digest = hashlib.sha256(lang.encode() + b'\0' + payload).hexdigest()
+            cached = _read_cache(digest)
+            if cached is not None:
+                pending.append((page_number, 'cache', cached, digest))
+            else:
+                future = ocr_pool.submit(ocr_image, payload, tesseract_cmd, lang, timeout)
+                pending.append((page_number, 'ocr', future, digest))
+
+        # 已完成的队首页面立即输出；在途页面过多时等待队首完成
+        while pending and (len(pending) >= max_in_flight or pending[0][1] != 'ocr' or pending[0][2].done()):
+            yield finish(pending.popleft())
+
+    while pending:
+        yield finish(pending.popleft())
+
+
+def ocr_upload_chunks(upload_record, token_budget=None):
+    """上传文件的OCR阶段：逐页识别并边识别边切块，供后续AI提取阶段消费
+
+    Args:
+        token_budget: 每块的token上限（见 question_extractor.chunk_token_budget），
+            指定时按token装箱，否则按 upload_record.max_chunk_size 字符切分
+
+    Yields:
+        str 或 tuple: 文本块；按token装箱时为 (文本块, 估算token数)
+    """
+    started = time.perf_counter()
+    stats = {'pages': 0, 'ocr': 0, 'cache': 0, 'failed': 0}
+
+    def page_texts():
+        for page in iter_ocr_pages(upload_record.file_path, upload_record.file_type, upload_record.id):
+            stats['pages'] += 1
+            if page['error']:
+                stats['failed'] += 1
+            elif page['source'] in ('ocr', 'cache'):
+                stats[page['source']] += 1
+            yield page['text']
+
+    if token_budget:
+        chunks = iter_packed_chunks(page_texts(), token_budget)
+    else:
+        chunks = iter_chunks(page_texts(), upload_record.max_chunk_size or 3000)
+    for chunk in chunks:
+        yield chunk
+
+    db.session.add(ProcessingLog(
+        upload_record_id=upload_record.id,
+        step_name='OCR识别',
+        step_type='ocr',
+        status='completed' if stats['failed'] < stats['pages'] else 'failed',
+        message=f"共{stats['pages']}页，OCR {stats['ocr']}页，缓存命中 {stats['cache']}页，失败 {stats['failed']}页",
+        duration_ms=int((time.perf_counter() - started) * 1000)
+    ))
+    db.session.commit()
@@ -0,0 +1,390 @@
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+from models import db, Question, PracticeRecord
+from services.question_io import QUESTION_TYPES
+from utils.etag import get_table_versions
+
+LEVELS = np.arange(1, 6)
+
+# 抽样池不超过所需数量的该倍数时直接展开后抽样，否则按位置随机拒绝抽样
+DENSE_SAMPLE_FACTOR = 4
+
+# 平均难度的局部搜索最多调整次数
+MAX_LOCAL_SEARCH_MOVES = 1000
+
+# 组卷时题型的排列顺序，未列出的题型排在最后
+TYPE_ORDER = {name: index for index, name in enumerate(QUESTION_TYPES)}
+
+
+class PaperConstraintError(ValueError):
+    """组卷条件无法满足"""
+
+    def __init__(self, message, details=None, status_code=409):
+        super().__init__(message)
+        self.details = details or {}
+        self.status_code = status_code
+
+
+class QuestionIndex:
+    """启用题目的内存索引：(分类ID, 题型, 难度等级) -> 按ID排序的题目ID数组"""
+
+    def __init__(self, ids, category_ids, types, levels, version=None):
+        self.version = version
+        self.type_names = sorted(set(types), key=lambda name: (TYPE_ORDER.get(name, len(TYPE_ORDER)), name))
+        type_codes = {name: code for code, name in enumerate(self.type_names)}
+
+        # 按ID排序的逐题属性，用于把待排除的题目ID映射回所在单元
+        self.ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(self.ids, kind='stable')
+        self.ids = self.ids[order]
+        self.category_ids = np.asarray(category_ids, dtype=np.int64)[order]
+        self.type_codes = np.array([type_codes[name] for name in types], dtype=np.int64)[order]
+        self.levels = np.clip(np.nan_to_num(np.array(levels, dtype=np.float64), nan=1), 1, 5).astype(np.int64)[order]
+
+        self.cells = {}
+        if len(self.ids):
+            cell_order = np.lexsort((self.ids, self.levels, self.type_codes, self.category_ids))
+            keys = np.stack([self.category_ids, self.type_codes, self.levels])[:, cell_order]
+            starts = np.flatnonzero(np.r_[True, (np.diff(keys, axis=1) != 0).any(axis=0)])
+            for start, end in zip(starts, np.r_[starts[1:], len(cell_order)]):
+                category_id, type_code, level = keys[:, start].tolist()
+                self.cells[(category_id, type_code, level)] = self.ids[cell_order[start:end]]
+        self.category_set = set(self.category_ids.tolist())
+
+    @classmethod
+    def build(cls, version=None, chunk_size=100000):
+        """分块读取全部启用题目的 (ID, 分类, 题型, 难度) 建立索引"""
+        # 直接使用表对象查询，省去ORM逐行处理的开销
+        table = Question.__table__
+        ids, category_ids, types, levels = [], [], [], []
+        after_id = 0
+        while True:
+            rows = db.session.execute(
+                select(table.c.id, table.c.category_id, table.c.type, table.c.difficulty)
+                .where(table.c.is_active == True, table.c.id > after_id)
+                .order_by(table.c.id).limit(chunk_size)
+            ).all()
+            if rows:
+                columns = list(zip(*rows))
+                ids.extend(columns[0])
+                category_ids.extend(columns[1])
+                types.extend(columns[2])
+                levels.extend(columns[3])
+            if len(rows) < chunk_size:
+                break
+            after_id = rows[-1][0]
+        return cls(ids, category_ids, types, levels, version=version)
+
+    def lookup(self, question_ids):
+        """题目ID所在的单元，返回 (分类, 题型编号, 难度) 三个数组；不在索引中的ID被丢弃"""
+        question_ids = np.asarray(question_ids, dtype=np.int64)
+        if not len(self.ids):
+            question_ids = question_ids[:0]
+        positions = np.minimum(np.searchsorted(self.ids, question_ids), max(len(self.ids) - 1, 0))
+        positions = positions[self.ids[positions] == question_ids] if len(question_ids) else positions
+        return self.category_ids[positions], self.type_codes[positions], self.levels[positions]
+
+    def sample(self, rng, count, category_id=None, type_name=None, level=None, excluded=()):
+        """按筛选条件不重复地随机抽取最多 count 道题目，不展开全部匹配的题目ID"""
+        arrays = [array for (cell_category, type_code, cell_level), array in self.cells.items()
+                  if (category_id is None or cell_category == category_id)
+                  and (type_name is None or self.type_names[type_code] == type_name)
+                  and (level is None or cell_level == level)]
+        if not arrays:
+            return []
+        return _sample_cells(rng, arrays, count, set(excluded))
+
+
+class QuestionIndexCache:
+    """进程内的题目索引，题目表版本号变化后（最多每 refresh_seconds 秒检查一次）重新构建"""
+
+    def __init__(self, refresh_seconds=30):
+        self.refresh_seconds = refresh_seconds
+        self._index = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        index = self._index
+        if index is not None and time.monotonic() < self._next_check:
+            return index
+        with self._lock:
+            if self._index is not None and time.monotonic() < self._next_check:
+                return self._index
+            version = get_table_versions(['questions'])['questions']
+            if self._index is None or self._index.version != version:
+                self._index = QuestionIndex.build(version)
+            self._next_check = time.monotonic() + self.refresh_seconds
+            return self._index
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+
+# 全局题目索引
+question_index = QuestionIndexCache()
+
+
+def init_question_index(app):
+    """配置题目索引的刷新间隔（索引在第一次组卷时构建）"""
+    question_index.refresh_seconds = app.config.get('PAPER_INDEX_REFRESH_SECONDS', 30)
+    question_index.invalidate()
+
+
+def _split_counts(count, ratios):
+    """按比例分配题目数（最大余数法）"""
+    quotas = [ratio * count for ratio in ratios]
+    counts = [math.floor(quota) for quota in quotas]
+    by_remainder = sorted(range(len(ratios)), key=lambda index: quotas[index] - counts[index], reverse=True)
+    for index in by_remainder[:count - sum(counts)]:
+        counts[index] += 1
+    return counts
+
+
+def _plan_groups(index, count, type_ratios):
+    """把题目数分配到题型组：每个指定比例的题型一组，其余题型合为一组"""
+    type_ratios = type_ratios or {}
+    for name, ratio in type_ratios.items():
+        if name not in QUESTION_TYPES:
+            raise PaperConstraintError(f'不支持的题型: {name}', status_code=400)
+        if not 0 <= ratio <= 1:
+            raise PaperConstraintError('题型比例必须在0到1之间', status_code=400)
+    rest = 1 - sum(type_ratios.values())
+    if rest < -1e-9:
+        raise PaperConstraintError('题型比例之和不能超过1', status_code=400)
+
+    codes = {name: code for code, name in enumerate(index.type_names)}
+    groups = [[codes[name]] if name in codes else [] for name in type_ratios]
+    ratios = list(type_ratios.values())
+    names = list(type_ratios)
+    if rest > 1e-9:
+        groups.append([code for name, code in codes.items() if name not in type_ratios])
+        ratios.append(rest)
+        names.append(None)
+    return names, groups, _split_counts(count, ratios)
+
+
+def _recent_question_ids(user_id, days):
+    since = datetime.utcnow() - timedelta(days=days)
+    return db.session.scalars(
+        select(PracticeRecord.question_id).where(
+            PracticeRecord.user_id == user_id, PracticeRecord.practiced_at >= since
+        ).distinct()
+    ).all()
+
+
+def _allocate_levels(rng, available, counts, target, spread):
+    """为每个题型组分配各难度等级的题目数
+
+    先按剩余题目应有的平均难度逐题贪心选择等级（在有剩余题目的等级中按与期望难度的距离加权随机），
+    再做局部搜索：在组内把一道题换到相邻等级，直到总难度最接近目标。
+
+    Args:
+        available: (组数, 5) 各组各等级的可用题目数
+        counts: 各组题目数
+        target: 目标平均难度，为 None 时按可用数量随机分配
+
+    Returns:
+        np.ndarray: (组数, 5) 分配结果
+    """
+    allocation = np.zeros_like(available)
+    if target is None:
+        for group, count in enumerate(counts):
+            if count:
+                allocation[group] = rng.multivariate_hypergeometric(available[group], count)
+        return allocation
+
+    total = sum(counts)
+    target_sum = target * total
+    placed_sum = 0
+    placed = 0
+    remaining = available.copy()
+    # 可选等级最少的组先分配
+    for group in sorted(range(len(counts)), key=lambda group: (remaining[group] > 0).sum()):
+        for _ in range(counts[group]):
+            # 先分配的组被迫取了极端等级时，剩余题目的期望难度可能远超 1-5，权重会全部下溢为 0
+            desired = min(5, max(1, (target_sum - placed_sum) / (total - placed)))
+            # 可用数量只决定能否选择，不参与加权，避免题量多的等级压倒难度目标
+            weights = (remaining[group] > 0) * np.exp(-((LEVELS - desired) / spread) ** 2)
+            level = rng.choice(5, p=weights / weights.sum())
+            allocation[group, level] += 1
+            remaining[group, level] -= 1
+            placed_sum += level + 1
+            placed += 1
+
+    error = placed_sum - target_sum
+    for _ in range(MAX_LOCAL_SEARCH_MOVES):
+        if abs(error) < 0.5:
+            break
+        step = -1 if error > 0 else 1
+        best = None
+        for group in range(len(counts)):
+            for level in range(5):
+                to_level = level + step
+                if allocation[group, level] and 0 <= to_level < 5 and remaining[group, to_level]:
+                    # 优先从数量多的等级移出，保持分布
+                    score = allocation[group, level] + remaining[group, to_level] * 1e-9
+                    if best is None or score > best[0]:
+                        best = (score, group, level, to_level)
+        if best is None:
+            break
+        _, group, level, to_level = best
+        allocation[group, level] -= 1
+        allocation[group, to_level] += 1
+        remaining[group, level] += 1
+        remaining[group, to_level] -= 1
+        error += step
+    return allocation
+
+
+def _sample_cells(rng, arrays, count, excluded):
+    """从若干题目ID数组的并集中不重复地抽取 count 道不在 excluded 中的题目"""
+    sizes = np.array([len(array) for array in arrays])
+    total = int(sizes.sum())
+    if total <= DENSE_SAMPLE_FACTOR * (count + len(excluded)):
+        pool = np.concatenate(arrays)
+        if excluded:
+            pool = pool[~np.isin(pool, np.fromiter(excluded, dtype=np.int64, count=len(excluded)))]
+        return rng.choice(pool, min(count, len(pool)), replace=False).tolist()
+
+    ends = np.cumsum(sizes)
+    chosen = []
+    seen = set()
+    while len(chosen) < count:
+        for position in rng.integers(0, total, size=2 * (count - len(chosen)) + 8).tolist():
+            if position in seen:
+                continue
+            seen.add(position)
+            cell = int(np.searchsorted(ends, position, side='right'))
+            question_id = int(arrays[cell][position - (ends[cell] - sizes[cell])])
+            if question_id in excluded:
+                continue
+            chosen.append(question_id)
+            if len(chosen) == count:
+                break
+    return chosen
+
+
+def _cell_arrays(index, category_ids, group, level):
+    arrays = []
+    for category_id in category_ids:
+        for type_code in group:
+            array = index.cells.get((category_id, type_code, level))
+            if array is not None:
+                arrays.append(array)
+    return arrays
+
+
+def generate_paper(user_id, count, category_ids=None, type_ratios=None, difficulty=None, tolerance=None,
+                   exclude_days=0, seed=None):
+    """按条件组卷
+
+    Args:
+        user_id: 答卷用户ID（用于排除近期练过的题目）
+        count: 题目数
+        category_ids: 题目所属分类，为空时不限
+        type_ratios: 题型比例，如 {'multiple_choice': 0.3}，其余题目从未指定的题型中抽取
+        difficulty: 目标平均难度（1-5），为 None 时不限
+        tolerance: 平均难度允许的偏差
+        exclude_days: 排除该用户最近若干天练过的题目
+        seed: 随机种子（测试用）
+
+    Returns:
+        dict: question_ids（按题型、难度排序）和组卷统计
+
+    Raises:
+        PaperConstraintError: 题库中没有足够的题目满足条件
+    """
+    config = current_app.config
+    tolerance = config.get('PAPER_DIFFICULTY_TOLERANCE', 0.25) if tolerance is None else tolerance
+    rng = np.random.default_rng(seed)
+    index = question_index.get()
+
+    category_ids = sorted(set(category_ids) & index.category_set) if category_ids else sorted(index.category_set)
+    names, groups, counts = _plan_groups(index, count, type_ratios)
+
+    # 各题型组各难度等级的可用题目数
+    group_of_type = {type_code: group for group, type_codes in enumerate(groups) for type_code in type_codes}
+    available = np.zeros((len(groups), 5), dtype=np.int64)
+    for group, type_codes in enumerate(groups):
+        for level in LEVELS:
+            available[group, level - 1] = sum(len(array) for array in _cell_arrays(index, category_ids, type_codes, level))
+
+    excluded = set()
+    if exclude_days and user_id is not None:
+        recent = _recent_question_ids(user_id, exclude_days)
+        excluded = set(recent)
+        recent_categories, recent_types, recent_levels = index.lookup(sorted(recent))
+        for category_id, type_code, level in zip(recent_categories.tolist(), recent_types.tolist(),
+                                                 recent_levels.tolist()):
+            group = group_of_type.get(type_code)
+            if group is not None and category_id in category_ids:
+                available[group, level - 1] -= 1
+
+    shortfall = {
+        name or 'other': {'required': required, 'available': int(available[group].sum())}
+        for group, (name, required) in enumerate(zip(names, counts))
+        if available[group].sum() < required
+    }
+    if shortfall:
+        raise PaperConstraintError('符合条件的题目不足', {'shortfall': shortfall})
+
+    allocation = _allocate_levels(rng, available, counts, difficulty, spread=1.0)
+    average = float((allocation * LEVELS).sum() / count)
+    if difficulty is not None and abs(average - difficulty) > tolerance + 1e-9:
+        raise PaperConstraintError('无法满足平均难度要求', {
+            'target': difficulty,
+            'closest_average': round(average, 2)
+        })
+
+    chosen = {}  # (题型组, 难度) -> 题目ID列表
+    taken = set(excluded)
+    for group, type_codes in enumerate(groups):
+        for level in LEVELS.tolist():
+            needed = int(allocation[group, level - 1])
+            if needed:
+                chosen[(group, level)] = _sample_cells(rng, _cell_arrays(index, category_ids, type_codes, level),
+                                                       needed, taken)
+                taken.update(chosen[(group, level)])
+
+    # 索引可能稍旧：已停用或删除的题目换成同一单元中的其他题目
+    for _ in range(3):
+        question_ids = [question_id for ids in chosen.values() for question_id in ids]
+        active = set(db.session.scalars(
+            select(Question.id).where(Question.id.in_(question_ids), Question.is_active == True)
+        ).all())
+        if len(active) == len(question_ids):
+            break
+        question_index.invalidate()
+        for (group, level), ids in chosen.items():
+            kept = [question_id for question_id in ids if question_id in active]
+            if len(kept) < len(ids):
+                try:
+                    kept += _sample_cells(rng, _cell_arrays(index, category_ids, groups[group], level),
+                                          len(ids) - len(kept), taken)
+                except ValueError:
+                    raise PaperConstraintError('符合条件的题目不足')
+                taken.update(kept)
+                chosen[(group, level)] = kept
+    else:
+        raise PaperConstraintError('题库正在更新，请稍后重试')
+
+    # 按题型、难度、题目ID排序
+    question_ids = [question_id for ids in chosen.values() for question_id in ids]
+    _, type_codes, levels = index.lookup(question_ids)
+    ordered = sorted(zip(type_codes.tolist(), levels.tolist(), question_ids))
+    type_counts = {}
+    for type_code, _, _ in ordered:
+        type_counts[index.type_names[type_code]] = type_counts.get(index.type_names[type_code], 0) + 1
+    return {
+        'question_ids': [question_id for _, _, question_id in ordered],
+        'type_counts': type_counts,
+        'average_difficulty': round(average, 2),
+        'excluded_recent': len(excluded)
+    }
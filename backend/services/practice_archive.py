@@ -0,0 +1,289 @@
+import heapq
+import itertools
+import json
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+import msgpack
+from models import db, PracticeRecord, PracticeArchive
+from services.practice_pack import compress_payload, decompress_payload
+
+ARCHIVE_FORMAT_VERSION = 1
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# 归档时一次删除的记录ID数（SQLite 单条语句的参数个数有限）
+DELETE_CHUNK_SIZE = 500
+
+
+def month_key(moment):
+    """月份键，如 '2024-03'"""
+    return f'{moment.year:04d}-{moment.month:02d}'
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_month(moment):
+    return datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+
+
+def archive_cutoff(now=None, days=None):
+    """归档分界点：早于该时间的记录会被归档
+
+    向前取整到月初，保证每个月份要么整体在热表，要么整体在归档中。
+    """
+    now = now or datetime.utcnow()
+    if days is None:
+        days = current_app.config.get('PRACTICE_ARCHIVE_DAYS', 180)
+    return month_start(now - timedelta(days=days))
+
+
+def encode_records(records):
+    """把同一用户的一批练习记录编码为列式、压缩后的归档数据
+
+    user_answer 保留原始JSON文本，练习模式使用字典编码，时间转为微秒时间戳并做差分。
+
+    Returns:
+        tuple: (压缩算法编号, 原始字节数, 压缩数据)
+    """
+    modes = sorted({record.practice_mode or 'practice' for record in records})
+    mode_index = {name: index for index, name in enumerate(modes)}
+
+    # 归档的记录都早于分界点，practiced_at 不会为空
+    timestamps = [(record.practiced_at - _EPOCH) // _MICROSECOND for record in records]
+    deltas = [timestamp - previous for previous, timestamp in zip([0] + timestamps, timestamps)]
+
+    document = {
+        'format': ARCHIVE_FORMAT_VERSION,
+        'modes': modes,
+        'columns': {
+            'id': [record.id for record in records],
+            'question_id': [record.question_id for record in records],
+            'session_id': [record.session_id for record in records],
+            'user_answer': [record.user_answer for record in records],
+            'is_correct': [bool(record.is_correct) for record in records],
+            'duration_seconds': [record.duration_seconds for record in records],
+            'practice_mode': [mode_index[record.practice_mode or 'practice'] for record in records],
+            'practiced_at': deltas,
+        }
+    }
+    raw = msgpack.packb(document, use_bin_type=True)
+    codec, data = compress_payload(raw, current_app.config.get('PRACTICE_ARCHIVE_COMPRESSION_LEVEL', 9))
+    return codec, len(raw), data
+
+
+def decode_archive(archive):
+    """解码归档，返回与 PracticeRecord 字段一致的行（practiced_at 为 datetime）"""
+    raw = decompress_payload(archive.codec, archive.data, archive.raw_size)
+    document = msgpack.unpackb(raw, raw=False)
+    if document.get('format') != ARCHIVE_FORMAT_VERSION:
+        raise ValueError('不支持的归档格式')
+
+    columns = document['columns']
+    modes = document['modes']
+    timestamp = 0
+    rows = []
+    for index, record_id in enumerate(columns['id']):
+        timestamp += columns['practiced_at'][index]
+        rows.append({
+            'id': record_id,
+            'user_id': archive.user_id,
+            'question_id': columns['question_id'][index],
+            'session_id': columns['session_id'][index],
+            'user_answer': columns['user_answer'][index],
+            'is_correct': columns['is_correct'][index],
+            'duration_seconds': columns['duration_seconds'][index],
+            'practice_mode': modes[columns['practice_mode'][index]],
+            'practiced_at': _EPOCH + timestamp * _MICROSECOND,
+        })
+    return rows
+
+
+def _build_archive(user_id, month, records):
+    codec, raw_size, data = encode_records(records)
+    return PracticeArchive(
+        user_id=user_id,
+        month=month,
+        record_count=len(records),
+        correct_count=sum(1 for record in records if record.is_correct),
+        total_duration=sum(record.duration_seconds or 0 for record in records),
+        first_practiced_at=records[0].practiced_at,
+        last_practiced_at=records[-1].practiced_at,
+        codec=codec,
+        raw_size=raw_size,
+        data=data
+    )
+
+
+def archive_practice_records(cutoff=None, batch_size=None, dry_run=False):
+    """把早于分界点的练习记录按（用户，月份）移入 practice_archives
+
+    每批归档的写入和热表删除在同一事务中提交，中途失败不会丢失或重复记录。
+    同一（用户，月份）可以有多批归档（如迟到的离线记录），读取时会合并。
+
+    Returns:
+        dict: 归档统计
+    """
+    cutoff = cutoff or archive_cutoff()
+    batch_size = batch_size or current_app.config.get('PRACTICE_ARCHIVE_BATCH_SIZE', 20000)
+    stats = {'cutoff': cutoff.isoformat(), 'months': 0, 'archives': 0, 'records': 0, 'bytes': 0}
+
+    oldest = db.session.query(func.min(PracticeRecord.practiced_at)).filter(
+        PracticeRecord.practiced_at < cutoff
+    ).scalar()
+    if oldest is None:
+        return stats
+
+    month = month_start(oldest)
+    while month < cutoff:
+        month_end = min(next_month(month), cutoff)
+        user_ids = [row[0] for row in db.session.query(PracticeRecord.user_id).filter(
+            PracticeRecord.practiced_at >= month,
+            PracticeRecord.practiced_at < month_end
+        ).distinct().order_by(PracticeRecord.user_id).all()]
+
+        pending = 0
+        for user_id in user_ids:
+            records = PracticeRecord.query.filter(
+                PracticeRecord.user_id == user_id,
+                PracticeRecord.practiced_at >= month,
+                PracticeRecord.practiced_at < month_end
+            ).order_by(PracticeRecord.practiced_at.asc(), PracticeRecord.id.asc()).all()
+            if not records:
+                continue
+
+            archive = _build_archive(user_id, month_key(month), records)
+            stats['archives'] += 1
+            stats['records'] += len(records)
+            stats['bytes'] += len(archive.data)
+            if dry_run:
+                db.session.expunge_all()
+                continue
+
+            db.session.add(archive)
+            ids = [record.id for record in records]
+            for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+                PracticeRecord.query.filter(
+                    PracticeRecord.id.in_(ids[start:start + DELETE_CHUNK_SIZE])
+                ).delete(synchronize_session=False)
+
+            pending += len(records)
+            if pending >= batch_size:
+                db.session.commit()
+                db.session.expunge_all()
+                pending = 0
+
+        if not dry_run:
+            db.session.commit()
+            db.session.expunge_all()
+        stats['months'] += 1
+        month = next_month(month)
+    return stats
+
+
+def _record_row(record):
+    return {
+        'id': record.id,
+        'user_id': record.user_id,
+        'question_id': record.question_id,
+        'session_id': record.session_id,
+        'user_answer': record.user_answer,
+        'is_correct': record.is_correct,
+        'duration_seconds': record.duration_seconds,
+        'practice_mode': record.practice_mode,
+        'practiced_at': record.practiced_at,
+    }
+
+
+def history_row_to_dict(row):
+    """把历史记录行转换为与 PracticeRecord.to_dict() 一致的字典"""
+    item = dict(row)
+    item['user_answer'] = json.loads(row['user_answer']) if row['user_answer'] else None
+    item['practiced_at'] = row['practiced_at'].isoformat() if row['practiced_at'] else None
+    return item
+
+
+def _iter_archived(user_id, since=None, until=None):
+    """按时间顺序读取归档记录，一次只解码一个月份"""
+    query = PracticeArchive.query.filter(PracticeArchive.user_id == user_id)
+    if since is not None:
+        query = query.filter(PracticeArchive.last_practiced_at >= since)
+    if until is not None:
+        query = query.filter(PracticeArchive.first_practiced_at < until)
+    # 流式读取归档行，避免一次把所有月份的数据读进内存
+    archives = query.order_by(PracticeArchive.month.asc(), PracticeArchive.id.asc()).yield_per(8)
+
+    month_rows = []
+    current_month = None
+    for archive in itertools.chain(archives, [None]):
+        if archive is None or archive.month != current_month:
+            month_rows.sort(key=lambda row: (row['practiced_at'], row['id']))
+            for row in month_rows:
+                if (since is None or row['practiced_at'] >= since) and (until is None or row['practiced_at'] < until):
+                    yield row
+            month_rows = []
+        if archive is not None:
+            current_month = archive.month
+            month_rows.extend(decode_archive(archive))
+
+
+def _iter_hot(user_id, since=None, until=None, chunk_size=1000):
+    """按时间顺序分页读取热表记录（键集分页）"""
+    last = None
+    while True:
+        query = PracticeRecord.query.filter(PracticeRecord.user_id == user_id)
+        if since is not None:
+            query = query.filter(PracticeRecord.practiced_at >= since)
+        if until is not None:
+            query = query.filter(PracticeRecord.practiced_at < until)
+        if last is not None:
+            query = query.filter(db.or_(
+                PracticeRecord.practiced_at > last[0],
+                db.and_(PracticeRecord.practiced_at == last[0], PracticeRecord.id > last[1])
+            ))
+        records = query.order_by(PracticeRecord.practiced_at.asc(), PracticeRecord.id.asc()).limit(chunk_size).all()
+        for record in records:
+            yield _record_row(record)
+        if len(records) < chunk_size:
+            return
+        last = (records[-1].practiced_at, records[-1].id)
+
+
+def iter_practice_history(user_id, since=None, until=None):
+    """按时间顺序遍历用户的全部练习记录（热表与归档透明合并）
+
+    Yields:
+        dict: 与 PracticeRecord 字段一致的行，practiced_at 为 datetime
+    """
+    return heapq.merge(
+        _iter_archived(user_id, since, until),
+        _iter_hot(user_id, since, until),
+        key=lambda row: (row['practiced_at'] or datetime.min, row['id'])
+    )
+
+
+def get_practice_summary(user_id):
+    """用户练习汇总（热表聚合 + 归档汇总列，不需要解码归档）"""
+    hot = db.session.query(
+        func.count(PracticeRecord.id),
+        func.sum(db.case((PracticeRecord.is_correct == True, 1), else_=0)),
+        func.sum(PracticeRecord.duration_seconds)
+    ).filter(PracticeRecord.user_id == user_id).one()
+    cold = db.session.query(
+        func.sum(PracticeArchive.record_count),
+        func.sum(PracticeArchive.correct_count),
+        func.sum(PracticeArchive.total_duration)
+    ).filter(PracticeArchive.user_id == user_id).one()
+
+    total = (hot[0] or 0) + (cold[0] or 0)
+    correct = (hot[1] or 0) + (cold[1] or 0)
+    return {
+        'total_count': total,
+        'correct_count': correct,
+        'accuracy': round(correct / total, 4) if total else 0,
+        'total_duration': (hot[2] or 0) + (cold[2] or 0),
+        'archived_count': cold[0] or 0
+    }
@@ -0,0 +1,160 @@
+import glob
+import json
+import os
+import struct
+import threading
+import zlib
+from flask import current_app
+from sqlalchemy import func
+import msgpack
+from models import db, Question, QuestionChange
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时使用zlib
+    zstandard = None
+
+PACK_MAGIC = b'SSTP'
+PACK_FORMAT_VERSION = 1
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+# 头部：魔数(4) + 格式版本(1) + 压缩算法(1) + 原始长度(4)
+_HEADER = struct.Struct('>4sBBI')
+
+_build_locks = {}
+_build_locks_guard = threading.Lock()
+
+
+def _json_or_none(raw):
+    return json.loads(raw) if raw else None
+
+
+def compress_payload(raw, level=9):
+    """压缩二进制数据，优先使用zstd
+
+    Returns:
+        tuple: (压缩算法编号, 压缩后的数据)
+    """
+    if zstandard is not None:
+        return CODEC_ZSTD, zstandard.ZstdCompressor(level=level).compress(raw)
+    return CODEC_ZLIB, zlib.compress(raw, min(level, 9))
+
+
+def decompress_payload(codec, body, raw_size):
+    """按压缩算法编号解压 compress_payload 的结果"""
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError('解压数据需要安装 zstandard')
+        return zstandard.ZstdDecompressor().decompress(body, max_output_size=raw_size)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(body)
+    raise ValueError('未知的压缩算法')
+
+
+def get_pack_folder():
+    """离线题包存储目录"""
+    folder = current_app.config.get('PACK_FOLDER') or os.path.join(current_app.config['UPLOAD_FOLDER'], 'packs')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def get_category_version(category):
+    """分类版本：分类内最新的题目变更版本号 + 分类本身的更新时间"""
+    change_version = db.session.query(func.max(QuestionChange.id)).filter(
+        QuestionChange.category_id == category.id
+    ).scalar() or 0
+    updated = int(category.updated_at.timestamp()) if category.updated_at else 0
+    return f'{change_version}-{updated}'
+
+
+def build_pack_bytes(category):
+    """把分类下的启用题目编码为列式、压缩后的二进制题包
+
+    JSON文本字段（options/answer/tags）预先解析为原生结构，题型使用字典编码。
+    """
+    rows = db.session.query(
+        Question.id, Question.type, Question.content, Question.options, Question.answer,
+        Question.explanation, Question.difficulty, Question.tags
+    ).filter(
+        Question.category_id == category.id,
+        Question.is_active == True
+    ).order_by(Question.id.asc()).all()
+
+    type_names = sorted({row.type for row in rows})
+    type_index = {name: index for index, name in enumerate(type_names)}
+
+    document = {
+        'format': PACK_FORMAT_VERSION,
+        'category': {'id': category.id, 'name': category.name, 'description': category.description},
+        'count': len(rows),
+        'types': type_names,
+        'columns': {
+            'id': [row.id for row in rows],
+            'type': [type_index[row.type] for row in rows],
+            'content': [row.content for row in rows],
+            'options': [_json_or_none(row.options) for row in rows],
+            'answer': [_json_or_none(row.answer) for row in rows],
+            'explanation': [row.explanation for row in rows],
+            'difficulty': [row.difficulty for row in rows],
+            'tags': [_json_or_none(row.tags) for row in rows],
+        }
+    }
+    raw = msgpack.packb(document, use_bin_type=True)
+
+    codec, body = compress_payload(raw, current_app.config.get('PACK_COMPRESSION_LEVEL', 9))
+    return _HEADER.pack(PACK_MAGIC, PACK_FORMAT_VERSION, codec, len(raw)) + body
+
+
+def read_pack(data):
+    """解码题包，返回按行展开的题目列表（供客户端参考实现与校验使用）"""
+    magic, fmt, codec, raw_size = _HEADER.unpack_from(data)
+    if magic != PACK_MAGIC or fmt != PACK_FORMAT_VERSION:
+        raise ValueError('不支持的题包格式')
+    raw = decompress_payload(codec, data[_HEADER.size:], raw_size)
+
+    document = msgpack.unpackb(raw, raw=False)
+    columns = document['columns']
+    names = list(columns)
+    questions = []
+    for values in zip(*(columns[name] for name in names)):
+        item = dict(zip(names, values))
+        item['type'] = document['types'][item['type']]
+        questions.append(item)
+    return document['category'], questions
+
+
+def get_or_build_pack(category):
+    """获取分类题包路径，当前版本不存在时生成并清理旧版本
+
+    Returns:
+        tuple: (文件路径, 版本号)
+    """
+    version = get_category_version(category)
+    folder = get_pack_folder()
+    path = os.path.join(folder, f'category_{category.id}_{version}.sstp')
+    if os.path.exists(path):
+        return path, version
+
+    with _build_locks_guard:
+        lock = _build_locks.setdefault(category.id, threading.Lock())
+
+    with lock:
+        if os.path.exists(path):
+            return path, version
+
+        data = build_pack_bytes(category)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        # 删除该分类的旧版本题包
+        for old_path in glob.glob(os.path.join(folder, f'category_{category.id}_*.sstp')):
+            if old_path != path:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+    return path, version
+
@@ -0,0 +1,339 @@
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from models import db, Question, PracticeRecord, PracticeSession, WrongAnswer
+from services.answer_grader import answer_grader
+from services.paper_generator import question_index
+from utils.cache import cache
+
+PRACTICE_MODES = ('random', 'sequential', 'wrong')
+
+# 返回给客户端的题目字段（不含答案和解析）
+PAYLOAD_COLUMNS = ('id', 'category_id', 'type', 'content', 'options', 'difficulty', 'tags')
+
+# 过期会话记录的清理间隔（秒）
+CLEANUP_INTERVAL = 600
+
+_next_cleanup = 0.0
+
+
+class PracticeSessionError(ValueError):
+    """练习会话请求无效"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _state_key(session_id):
+    return f'practice:{session_id}:state'
+
+
+def _questions_key(session_id):
+    return f'practice:{session_id}:questions'
+
+
+def _answers_key(session_id):
+    return f'practice:{session_id}:answers'
+
+
+def _current_key(user_id):
+    return f'practice:user:{user_id}:current'
+
+
+def _session_ttl():
+    return current_app.config.get('PRACTICE_SESSION_TTL_HOURS', 6) * 3600
+
+
+def select_question_ids(user_id, mode='random', category_id=None, question_type=None, difficulty=None,
+                        exclude_correct=False, count=20):
+    """按条件筛选题目ID
+
+    随机抽题使用组卷的内存题目索引，只在匹配的单元中抽样，不读取全部匹配题目；
+    与组卷相同，索引在题目表变化后最多延迟 PAPER_INDEX_REFRESH_SECONDS 秒更新。
+    顺序练习在SQL中取前 count 道；错题练习只涉及该用户的错题，直接查询。
+    """
+    correct_ids = select(PracticeRecord.question_id).where(PracticeRecord.user_id == user_id,
+                                                           PracticeRecord.is_correct == True)
+    if mode == 'random':
+        excluded = db.session.scalars(correct_ids.distinct()).all() if exclude_correct else ()
+        return question_index.get().sample(
+            np.random.default_rng(), count, category_id=int(category_id) if category_id is not None else None,
+            type_name=question_type or None, level=int(difficulty) if difficulty is not None else None,
+            excluded=excluded
+        )
+
+    query = select(Question.id).where(Question.is_active == True)
+    if category_id is not None:
+        query = query.where(Question.category_id == category_id)
+    if question_type:
+        query = query.where(Question.type == question_type)
+    if difficulty is not None:
+        query = query.where(Question.difficulty == difficulty)
+    if mode == 'wrong':
+        query = query.where(Question.id.in_(
+            select(WrongAnswer.question_id).where(WrongAnswer.user_id == user_id, WrongAnswer.is_mastered == False)
+        ))
+    if exclude_correct:
+        query = query.where(Question.id.not_in(correct_ids))
+    if mode == 'sequential':
+        return db.session.scalars(query.order_by(Question.id).limit(count)).all()
+    ids = db.session.scalars(query).all()
+    return random.sample(ids, min(count, len(ids)))
+
+
+def _load_questions(question_ids):
+    """一次查询取出题目，预先生成客户端数据和判分所需字段"""
+    rows = db.session.execute(
+        select(Question.id, Question.category_id, Question.type, Question.content, Question.options,
+               Question.difficulty, Question.tags, Question.answer, Question.explanation, Question.updated_at)
+        .where(Question.id.in_(question_ids))
+    ).all()
+    entries = {}
+    for row in rows:
+        payload = dict(zip(PAYLOAD_COLUMNS, row[:len(PAYLOAD_COLUMNS)]))
+        payload['options'] = json.loads(payload['options']) if payload['options'] else None
+        payload['tags'] = json.loads(payload['tags']) if payload['tags'] else None
+        entries[row.id] = {
+            'payload': payload,
+            'answer': row.answer,
+            'explanation': row.explanation,
+            'updated_at': row.updated_at.isoformat() if row.updated_at else None,
+        }
+    return entries
+
+
+def create_session(user_id, mode='random', category_id=None, question_type=None, difficulty=None,
+                   exclude_correct=False, count=None, question_ids=None):
+    """创建练习会话：筛选和序列化只在这里做一次，之后每题只按下标读取
+
+    Args:
+        question_ids: 指定题目及顺序（如组卷结果），此时忽略筛选条件
+
+    Returns:
+        dict: 会话状态
+    """
+    if question_ids is None:
+        if mode not in PRACTICE_MODES:
+            raise PracticeSessionError('不支持的练习模式')
+        max_count = current_app.config.get('PRACTICE_SESSION_MAX_QUESTIONS', 200)
+        count = min(max(int(count or 20), 1), max_count)
+        question_ids = select_question_ids(user_id, mode, category_id, question_type, difficulty, exclude_correct,
+                                           count)
+    if not question_ids:
+        raise PracticeSessionError('没有符合条件的题目', 404)
+    entries = _load_questions(question_ids)
+    question_ids = [question_id for question_id in question_ids if question_id in entries]
+
+    cleanup_expired_sessions()
+
+    session_id = uuid.uuid4().hex
+    ttl = _session_ttl()
+    now = datetime.utcnow()
+    db.session.add(PracticeSession(id=session_id, user_id=user_id, mode=mode, question_ids=json.dumps(question_ids),
+                                   created_at=now, expires_at=now + timedelta(seconds=ttl)))
+    db.session.commit()
+    return _cache_session(session_id, user_id, mode, question_ids, entries, [], now, ttl)
+
+
+def cleanup_expired_sessions(force=False):
+    """删除过期的会话记录（缓存中的会话按TTL自动过期）
+
+    创建会话时顺带调用，进程内每 CLEANUP_INTERVAL 秒最多执行一次。
+    """
+    global _next_cleanup
+    if not force and time.monotonic() < _next_cleanup:
+        return 0
+    _next_cleanup = time.monotonic() + CLEANUP_INTERVAL
+    deleted = PracticeSession.query.filter(PracticeSession.expires_at < datetime.utcnow()).delete()
+    db.session.commit()
+    return deleted
+
+
+def _cache_session(session_id, user_id, mode, question_ids, entries, results, created_at, ttl):
+    """把会话写入缓存层
+
+    Args:
+        results: 已作答题目的对错，按作答顺序（即题目下标）排列
+    """
+    state = {
+        'session_id': session_id,
+        'user_id': user_id,
+        'mode': mode,
+        'total': len(question_ids),
+        'cursor': len(results),
+        'answered': len(results),
+        'correct': sum(1 for is_correct in results if is_correct),
+        'created_at': created_at.isoformat(),
+        'expires_at': time.time() + ttl,
+    }
+    cache.hset_many(_questions_key(session_id), {
+        index: entries[question_id] for index, question_id in enumerate(question_ids) if question_id in entries
+    }, ttl)
+    if results:
+        cache.hset_many(_answers_key(session_id), dict(enumerate(results)), ttl)
+    cache.set(_state_key(session_id), state, ttl)
+    cache.set(_current_key(user_id), session_id, ttl)
+    return state
+
+
+def _restore_session(session_id):
+    """缓存中没有会话（条目被淘汰，或会话由未共享缓存的其他 worker 进程创建）时从数据库恢复
+
+    进度按本会话已有的练习记录计算：每个下标只作答一次，记录数就是当前位置。
+    """
+    row = db.session.get(PracticeSession, session_id)
+    now = datetime.utcnow()
+    if row is None or row.expires_at <= now:
+        return None
+    question_ids = json.loads(row.question_ids)
+    results = db.session.scalars(
+        select(PracticeRecord.is_correct).where(PracticeRecord.session_id == session_id).order_by(PracticeRecord.id)
+    ).all()
+    ttl = max(1, int((row.expires_at - now).total_seconds()))
+    return _cache_session(session_id, row.user_id, row.mode, question_ids, _load_questions(question_ids), results,
+                          row.created_at, ttl)
+
+
+def get_session(session_id, user_id):
+    state = cache.get(_state_key(session_id)) or _restore_session(session_id)
+    if state is None or state['user_id'] != user_id:
+        raise PracticeSessionError('练习会话不存在或已过期，请重新开始', 404)
+    return state
+
+
+def get_current_session(user_id):
+    """用户最近一次创建且未过期的会话（断线重连后恢复），没有时返回 None"""
+    session_id = cache.get(_current_key(user_id))
+    if session_id:
+        state = cache.get(_state_key(session_id))
+        if state is not None and state['user_id'] == user_id:
+            return state
+    session_id = db.session.scalar(
+        select(PracticeSession.id)
+        .where(PracticeSession.user_id == user_id, PracticeSession.expires_at > datetime.utcnow())
+        .order_by(PracticeSession.created_at.desc())
+        .limit(1)
+    )
+    return _restore_session(session_id) if session_id else None
+
+
+def current_question(state):
+    """会话当前应作答的题目，全部完成时返回 None"""
+    if state['cursor'] >= state['total']:
+        return None
+    entry = cache.hget(_questions_key(state['session_id']), state['cursor'])
+    if entry is None:
+        raise PracticeSessionError('练习会话不存在或已过期，请重新开始', 404)
+    return dict(entry['payload'], index=state['cursor'])
+
+
+def session_view(state):
+    """会话状态和当前题目（返回给客户端）"""
+    return {
+        'session_id': state['session_id'],
+        'mode': state['mode'],
+        'total': state['total'],
+        'cursor': state['cursor'],
+        'answered': state['answered'],
+        'correct': state['correct'],
+        'finished': state['cursor'] >= state['total'],
+        'question': current_question(state),
+    }
+
+
+def _record_wrong_answer(user_id, question_id, now):
+    table = WrongAnswer.__table__
+    increment = table.update().where(
+        table.c.user_id == user_id, table.c.question_id == question_id
+    ).values(error_count=table.c.error_count + 1, last_error_at=now, is_mastered=False)
+    if db.session.execute(increment).rowcount == 0:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert().values(
+                    user_id=user_id, question_id=question_id, error_count=1, last_error_at=now, is_mastered=False,
+                    added_at=now
+                ))
+        except IntegrityError:
+            # 同一用户在另一个会话中同时答错了这道题，对方已经创建了记录
+            db.session.execute(increment)
+
+
+def submit_answer(state, index, user_answer, duration_seconds=None):
+    """提交当前题目的作答
+
+    下标必须等于会话的当前位置；同一下标只接受一次作答（重复提交、多端同时提交时只有一次生效）。
+
+    Returns:
+        dict: 判分结果和下一题
+    """
+    session_id = state['session_id']
+    if index != state['cursor']:
+        # 缓存的进度可能落后于数据库（未共享缓存时会话在其他 worker 进程中继续作答过），以数据库为准再比较
+        state = _restore_session(session_id) or state
+        if index != state['cursor']:
+            raise PracticeSessionError('题目序号与会话进度不一致，请刷新后继续', 409)
+    entry = cache.hget(_questions_key(session_id), index)
+    if entry is None:
+        raise PracticeSessionError('练习会话不存在或已过期，请重新开始', 404)
+
+    question_id = entry['payload']['id']
+    question = SimpleNamespace(id=question_id, type=entry['payload']['type'], answer=entry['answer'],
+                               updated_at=entry['updated_at'])
+    is_correct = answer_grader.grade(question, user_answer)
+
+    ttl = max(1, int(state['expires_at'] - time.time()))
+    if not cache.hadd(_answers_key(session_id), index, is_correct, ttl):
+        raise PracticeSessionError('该题已经作答', 409)
+
+    # 缓存中的作答标记用于快速拒绝重复提交；练习记录提交失败时撤销标记，否则重试会一直得到 409
+    try:
+        now = datetime.utcnow()
+        db.session.add(PracticeRecord(
+            user_id=state['user_id'],
+            question_id=question_id,
+            session_id=session_id,
+            user_answer=json.dumps(user_answer, ensure_ascii=False),
+            is_correct=is_correct,
+            duration_seconds=duration_seconds,
+            practice_mode='review' if state['mode'] == 'wrong' else 'practice',
+            practiced_at=now
+        ))
+        if not is_correct:
+            _record_wrong_answer(state['user_id'], question_id, now)
+        db.session.commit()
+    except IntegrityError:
+        # 其他 worker 进程已经记录了这道题的作答：同步数据库中的进度
+        db.session.rollback()
+        _restore_session(session_id)
+        raise PracticeSessionError('该题已经作答', 409)
+    except Exception:
+        db.session.rollback()
+        cache.hdel(_answers_key(session_id), index)
+        raise
+
+    state = dict(state, cursor=index + 1, answered=state['answered'] + 1,
+                 correct=state['correct'] + (1 if is_correct else 0))
+    cache.set(_state_key(session_id), state, ttl)
+    return {
+        'is_correct': is_correct,
+        'correct_answer': json.loads(entry['answer']) if entry['answer'] else None,
+        'explanation': entry['explanation'],
+        'session': session_view(state),
+    }
+
+
+def end_session(state):
+    session_id = state['session_id']
+    PracticeSession.query.filter_by(id=session_id).delete()
+    db.session.commit()
+    cache.delete(_state_key(session_id), _questions_key(session_id), _answers_key(session_id))
+    if cache.get(_current_key(state['user_id'])) == session_id:
+        cache.delete(_current_key(state['user_id']))
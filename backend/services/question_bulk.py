@@ -0,0 +1,369 @@
+import json
+import threading
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, func, and_, bindparam, true
+from models import db, Question, PracticeRecord, WrongAnswer, Favorite, QuestionBulkJob
+from services.question_io import QUESTION_TYPES
+from services.reference_data import get_category_ids
+from utils.change_log import record_question_changes, OP_UPSERT, OP_DELETE
+from utils.etag import bump_table_version
+
+BULK_OPERATIONS = ('move', 'deactivate', 'activate', 'retag', 'delete')
+
+# 可用的筛选字段 -> 取值类型
+FILTER_FIELDS = {
+    'category_ids': list,
+    'type': str,
+    'difficulty': int,
+    'is_active': bool,
+    'user_id': int,
+    'source_file': str,
+}
+
+# 一次请求最多指定的题目ID数（更多时请使用筛选条件）
+MAX_IDS = 100000
+
+
+class QuestionBulkError(ValueError):
+    """批量操作请求无效"""
+
+
+def _int_list(value, message):
+    if not isinstance(value, list) or not all(isinstance(item, int) and not isinstance(item, bool) for item in value):
+        raise QuestionBulkError(message)
+    return value
+
+
+def _tag_list(value):
+    if not isinstance(value, list) or not all(isinstance(tag, str) and tag.strip() for tag in value):
+        raise QuestionBulkError('标签必须是非空字符串列表')
+    return list(dict.fromkeys(tag.strip() for tag in value))
+
+
+def prepare_bulk_operation(operation, ids=None, filters=None, options=None):
+    """校验并规范化批量操作参数
+
+    Args:
+        operation: move（移动到 options['category_id']）、deactivate、activate、
+            retag（options['tags'] 整体替换，或 add_tags / remove_tags 增删）、delete
+        ids: 题目ID列表，与 filters 二选一
+        filters: 筛选条件，见 FILTER_FIELDS
+        options: 操作参数
+
+    Returns:
+        dict: 可以JSON序列化的操作描述，用于 count_bulk_targets / run_bulk_operation
+    """
+    if operation not in BULK_OPERATIONS:
+        raise QuestionBulkError('不支持的批量操作')
+    if (ids is None) == (filters is None):
+        raise QuestionBulkError('请提供题目ID列表或筛选条件（二选一）')
+
+    if ids is not None:
+        ids = sorted(set(_int_list(ids, '题目ID列表格式错误')))
+        if not ids:
+            raise QuestionBulkError('题目ID列表不能为空')
+        if len(ids) > MAX_IDS:
+            raise QuestionBulkError(f'一次最多指定 {MAX_IDS} 道题目，请改用筛选条件')
+    else:
+        if not isinstance(filters, dict) or not filters:
+            raise QuestionBulkError('筛选条件不能为空')
+        for name, value in filters.items():
+            expected = FILTER_FIELDS.get(name)
+            if expected is None:
+                raise QuestionBulkError(f'不支持的筛选条件: {name}')
+            if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+                raise QuestionBulkError(f'筛选条件 {name} 格式错误')
+        if 'category_ids' in filters:
+            _int_list(filters['category_ids'], '筛选条件 category_ids 格式错误')
+        if 'type' in filters and filters['type'] not in QUESTION_TYPES:
+            raise QuestionBulkError('不支持的题型')
+
+    options = options or {}
+    normalized = {}
+    if operation == 'move':
+        category_id = options.get('category_id')
+        if category_id not in get_category_ids():
+            raise QuestionBulkError('目标分类不存在')
+        normalized['category_id'] = category_id
+    elif operation == 'retag':
+        if 'tags' in options:
+            normalized['tags'] = _tag_list(options['tags'])
+        else:
+            normalized['add_tags'] = _tag_list(options.get('add_tags') or [])
+            normalized['remove_tags'] = _tag_list(options.get('remove_tags') or [])
+            if not normalized['add_tags'] and not normalized['remove_tags']:
+                raise QuestionBulkError('请提供 tags、add_tags 或 remove_tags')
+    return {'operation': operation, 'ids': ids, 'filters': filters, 'options': normalized}
+
+
+def _condition(spec):
+    """筛选条件加上操作本身的条件（跳过不会发生变化的题目）"""
+    table = Question.__table__
+    conditions = []
+    for name, value in (spec['filters'] or {}).items():
+        if name == 'category_ids':
+            conditions.append(table.c.category_id.in_(value))
+        else:
+            conditions.append(table.c[name] == value)
+
+    operation = spec['operation']
+    if operation == 'move':
+        conditions.append(table.c.category_id != spec['options']['category_id'])
+    elif operation == 'deactivate':
+        conditions.append(table.c.is_active == True)
+    elif operation == 'activate':
+        conditions.append(table.c.is_active == False)
+    return and_(true(), *conditions)
+
+
+def count_bulk_targets(spec):
+    """操作涉及的题目数（按ID列表操作时为列表长度，作为上限）"""
+    if spec['ids'] is not None:
+        return len(spec['ids'])
+    return db.session.execute(select(func.count()).select_from(Question.__table__).where(_condition(spec))).scalar()
+
+
+def _iter_target_chunks(spec, chunk_size):
+    """按ID升序分块返回待处理题目的 (id, category_id, is_active, tags) 行"""
+    table = Question.__table__
+    query = select(table.c.id, table.c.category_id, table.c.is_active, table.c.tags).where(_condition(spec))
+    if spec['ids'] is not None:
+        ids = spec['ids']
+        for start in range(0, len(ids), chunk_size):
+            rows = db.session.execute(query.where(table.c.id.in_(ids[start:start + chunk_size]))).all()
+            if rows:
+                yield rows
+        return
+
+    after_id = 0
+    while True:
+        rows = db.session.execute(query.where(table.c.id > after_id).order_by(table.c.id).limit(chunk_size)).all()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1].id
+
+
+def _record_by_category(rows, operation):
+    """按题目当前分类记录变更（同步客户端据此更新或删除本地副本）"""
+    by_category = defaultdict(list)
+    for row in rows:
+        by_category[row.category_id].append(row.id)
+    for category_id, question_ids in by_category.items():
+        record_question_changes(question_ids, operation, category_id=category_id)
+
+
+def _retag(rows, options, now):
+    table = Question.__table__
+    if 'tags' in options:
+        return db.session.execute(table.update().where(table.c.id.in_([row.id for row in rows])).values(
+            tags=json.dumps(options['tags'], ensure_ascii=False) if options['tags'] else None, updated_at=now
+        )).rowcount, rows
+
+    params = []
+    changed = []
+    for row in rows:
+        tags = json.loads(row.tags) if row.tags else []
+        updated = [tag for tag in tags if tag not in options['remove_tags']]
+        updated += [tag for tag in options['add_tags'] if tag not in updated]
+        if updated != tags:
+            params.append({'_id': row.id, '_tags': json.dumps(updated, ensure_ascii=False) if updated else None})
+            changed.append(row)
+    if params:
+        db.session.execute(table.update().where(table.c.id == bindparam('_id')).values(
+            tags=bindparam('_tags'), updated_at=now
+        ), params)
+    return len(params), changed
+
+
+def _apply_chunk(spec, rows, now):
+    """对一块题目执行一条（或几条）集合写入，返回各项影响行数"""
+    table = Question.__table__
+    operation = spec['operation']
+    ids = [row.id for row in rows]
+    active_rows = [row for row in rows if row.is_active]
+
+    if operation == 'move':
+        category_id = spec['options']['category_id']
+        # 原分类收到墓碑，新分类收到新增
+        _record_by_category(active_rows, OP_DELETE)
+        moved = db.session.execute(table.update().where(table.c.id.in_(ids)).values(
+            category_id=category_id, updated_at=now
+        )).rowcount
+        record_question_changes([row.id for row in active_rows], OP_UPSERT, category_id=category_id)
+        return {'moved': moved}
+
+    if operation in ('deactivate', 'activate'):
+        active = operation == 'activate'
+        affected = db.session.execute(table.update().where(table.c.id.in_(ids)).values(
+            is_active=active, updated_at=now
+        )).rowcount
+        _record_by_category(rows, OP_UPSERT if active else OP_DELETE)
+        return {'activated' if active else 'deactivated': affected}
+
+    if operation == 'retag':
+        retagged, changed = _retag(rows, spec['options'], now)
+        _record_by_category([row for row in changed if row.is_active], OP_UPSERT)
+        return {'retagged': retagged}
+
+    # delete：先删除错题本和收藏中的引用；有练习记录的题目保留历史，改为停用
+    counts = {
+        'wrong_answers': db.session.execute(
+            WrongAnswer.__table__.delete().where(WrongAnswer.__table__.c.question_id.in_(ids))
+        ).rowcount,
+        'favorites': db.session.execute(
+            Favorite.__table__.delete().where(Favorite.__table__.c.question_id.in_(ids))
+        ).rowcount,
+    }
+    practiced = set(db.session.scalars(
+        select(PracticeRecord.question_id).where(PracticeRecord.question_id.in_(ids)).distinct()
+    ).all())
+    deletable = [question_id for question_id in ids if question_id not in practiced]
+    kept = [row.id for row in active_rows if row.id in practiced]
+    _record_by_category(active_rows, OP_DELETE)
+    counts['deleted'] = db.session.execute(
+        table.delete().where(table.c.id.in_(deletable))
+    ).rowcount if deletable else 0
+    counts['deactivated'] = db.session.execute(table.update().where(table.c.id.in_(kept)).values(
+        is_active=False, updated_at=now
+    )).rowcount if kept else 0
+    return counts
+
+
+def run_bulk_operation(spec, chunk_size=None, progress=None):
+    """分块执行批量操作，每块在一个事务中提交
+
+    每块先按ID取出待处理的题目，再用集合式 UPDATE/DELETE 写入，并同步记录题目变更日志、
+    递增题目表版本号。操作可以安全地重复执行，中途失败后重新提交即可完成剩余部分。
+
+    Args:
+        spec: prepare_bulk_operation 的返回值
+        progress: 可选回调 progress(已处理题目数, 影响行数)，在每块提交前调用
+
+    Returns:
+        dict: matched（处理的题目数）和各项影响行数
+    """
+    chunk_size = chunk_size or current_app.config.get('QUESTION_BULK_CHUNK_SIZE', 500)
+    totals = defaultdict(int)
+    processed = 0
+    for rows in _iter_target_chunks(spec, chunk_size):
+        counts = _apply_chunk(spec, rows, datetime.utcnow())
+        bump_table_version('questions')
+        for name, value in counts.items():
+            totals[name] += value
+        processed += len(rows)
+        totals['matched'] = processed
+        if progress:
+            progress(processed, dict(totals))
+        db.session.commit()
+    totals['matched'] = processed
+    return dict(totals)
+
+
+class BulkJobRunner:
+    """后台执行批量任务的线程池，同一进程内的任务依次执行，避免相互争用行锁"""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='question-bulk')
+            return self._executor.submit(func, *args)
+
+
+# 全局后台任务执行器
+bulk_job_runner = BulkJobRunner()
+
+
+# 中断的任务标记失败时的错误信息
+INTERRUPTED_MESSAGE = '任务中断（服务重启或进程退出），批量操作可以安全地重新提交以完成剩余部分'
+
+
+def _run_job(app, job_id):
+    with app.app_context():
+        job = db.session.get(QuestionBulkJob, job_id)
+        job.status = 'running'
+        job.started_at = job.heartbeat_at = datetime.utcnow()
+        db.session.commit()
+        try:
+            def progress(processed, counts):
+                job.processed = processed
+                job.result = json.dumps(counts)
+                job.heartbeat_at = datetime.utcnow()
+
+            result = run_bulk_operation(json.loads(job.params), progress=progress)
+            job.status = 'completed'
+            job.processed = result['matched']
+            job.result = json.dumps(result)
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(QuestionBulkJob, job_id)
+            job.status = 'failed'
+            job.error_message = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+
+def _stale_before():
+    return datetime.utcnow() - timedelta(seconds=current_app.config.get('QUESTION_BULK_STALE_SECONDS', 600))
+
+
+def fail_if_stale(job):
+    """执行中的任务长时间没有心跳时标记为失败（不提交）
+
+    Returns:
+        bool: 是否标记
+    """
+    if job.status != 'running' or (job.heartbeat_at or job.started_at or job.created_at) >= _stale_before():
+        return False
+    job.status = 'failed'
+    job.error_message = INTERRUPTED_MESSAGE
+    job.finished_at = datetime.utcnow()
+    return True
+
+
+def fail_stale_jobs():
+    """把心跳超时的执行中任务标记为失败（不提交）
+
+    Returns:
+        int: 标记的任务数
+    """
+    table = QuestionBulkJob.__table__
+    now = datetime.utcnow()
+    return db.session.execute(table.update().where(
+        table.c.status == 'running',
+        func.coalesce(table.c.heartbeat_at, table.c.started_at, table.c.created_at) < _stale_before()
+    ).values(status='failed', error_message=INTERRUPTED_MESSAGE, finished_at=now)).rowcount
+
+
+def init_question_bulk(app):
+    """启动时清理上次进程退出时中断的后台任务（其他进程中仍在执行的任务有心跳，不受影响）"""
+    with app.app_context():
+        if fail_stale_jobs():
+            db.session.commit()
+
+
+def start_bulk_job(user_id, spec, total):
+    """创建后台批量任务
+
+    Returns:
+        QuestionBulkJob: 已提交的任务记录
+    """
+    job = QuestionBulkJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        operation=spec['operation'],
+        params=json.dumps(spec, ensure_ascii=False),
+        total=total
+    )
+    db.session.add(job)
+    db.session.commit()
+    bulk_job_runner.submit(_run_job, current_app._get_current_object(), job.id)
+    return job
@@ -0,0 +1,278 @@
+import json
+import time
+from flask import current_app
+from models import db, ProcessingLog
+from services.llm_client import llm_client, LLMError
+from services.question_io import QUESTION_TYPES
+from services.text_chunker import estimate_tokens
+
+# 每条消息的格式开销（角色标记等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# 单块输入的最小token预算，避免配置过小时退化为逐句调用
+MIN_CHUNK_TOKENS = 100
+
+TYPE_NAMES = {
+    'single_choice': '单选题',
+    'multiple_choice': '多选题',
+    'true_false': '判断题',
+    'fill_blank': '填空题',
+}
+
+SYSTEM_PROMPT = (
+    '你是题库整理助手。从用户提供的文本中提取题目，只输出一个JSON数组，不要输出其他内容。'
+    '数组的每个元素是一道题：{"type": 题型, "content": 题干, "options": 选项数组或null, '
+    '"answer": 答案, "explanation": 解析或null, "difficulty": 1-5的整数}。'
+    '题型只能是 {types}。单选题答案为选项字母，多选题答案为字母数组，判断题答案为true或false。'
+)
+
+
+class JsonObjectStream:
+    """从流式输出中增量解析JSON对象
+
+    模型按约定输出 [{...}, {...}]（或 {"questions": [{...}]}、逐个输出的 {...}），
+    每道题的右花括号一到就解析并返回，不等整个数组结束。
+    数组外的说明文字、Markdown 代码块标记会被忽略。
+    """
+
+    def __init__(self):
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._buffer = []
+        self._capture_depth = None  # 正在收集的对象开始时的嵌套深度
+        self._root_has_items = False  # 顶层对象内部已经按数组元素输出过对象
+
+    def _is_item_container(self):
+        # 顶层数组，或顶层对象中某个字段的数组
+        return self._stack == ['['] or self._stack == ['{', '[']
+
+    def feed(self, text):
+        """输入一段增量文本
+
+        Returns:
+            list: 本段文本中闭合的JSON对象
+        """
+        objects = []
+        for ch in text:
+            if self._in_string:
+                if self._capture_depth is not None:
+                    self._buffer.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '{':
+                if self._is_item_container():
+                    # 顶层对象只是外层包装，改为收集数组中的每个元素
+                    self._capture_depth = len(self._stack)
+                    self._buffer = []
+                    self._root_has_items = True
+                elif not self._stack:
+                    self._capture_depth = 0
+                    self._buffer = []
+                    self._root_has_items = False
+                self._stack.append('{')
+            elif ch == '[':
+                self._stack.append('[')
+            elif ch in '}]':
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if self._capture_depth is not None and len(self._stack) == self._capture_depth:
+                    self._buffer.append(ch)
+                    if ch == '}' and not (self._capture_depth == 0 and self._root_has_items):
+                        self._emit(objects)
+                    self._capture_depth = None
+                    self._buffer = []
+                    continue
+            elif ch == '"':
+                if not self._stack:
+                    continue
+                self._in_string = True
+            elif not self._stack:
+                continue
+
+            if self._capture_depth is not None:
+                self._buffer.append(ch)
+        return objects
+
+    def _emit(self, objects):
+        try:
+            item = json.loads(''.join(self._buffer))
+        except ValueError:
+            return
+        if isinstance(item, dict):
+            objects.append(item)
+
+
+def iter_json_objects(deltas):
+    """把增量文本流转换为JSON对象流"""
+    parser = JsonObjectStream()
+    for delta in deltas:
+        for item in parser.feed(delta):
+            yield item
+
+
+def allowed_question_types(upload_record):
+    types = [name.strip() for name in (upload_record.question_types or '').split(',') if name.strip()]
+    return [name for name in types if name in QUESTION_TYPES] or list(QUESTION_TYPES)
+
+
+def build_messages(text, upload_record):
+    """构造提取题目的对话消息"""
+    types = allowed_question_types(upload_record)
+    system = SYSTEM_PROMPT.replace('{types}', '、'.join(f'{name}（{TYPE_NAMES[name]}）' for name in types))
+    if not upload_record.include_answers:
+        system += '原文没有给出答案时，请根据题意给出答案。'
+    if not upload_record.include_explanations:
+        system += 'explanation 填 null。'
+    return [
+        {'role': 'system', 'content': system},
+        {'role': 'user', 'content': text},
+    ]
+
+
+def normalize_question(item, types):
+    """校验模型输出的一道题，无效时返回 None"""
+    question_type = item.get('type')
+    content = item.get('content')
+    if question_type not in types or not isinstance(content, str) or not content.strip():
+        return None
+    if item.get('answer') in (None, '', []):
+        return None
+    options = item.get('options')
+    if question_type in ('single_choice', 'multiple_choice') and not (isinstance(options, list) and options):
+        return None
+    try:
+        difficulty = min(5, max(1, int(item.get('difficulty') or 1)))
+    except (TypeError, ValueError):
+        difficulty = 1
+    return {
+        'type': question_type,
+        'content': content.strip(),
+        'options': options if isinstance(options, list) else None,
+        'answer': item['answer'],
+        'explanation': item.get('explanation') or None,
+        'difficulty': difficulty,
+    }
+
+
+def chunk_token_budget(upload_record, user=None):
+    """每块输入文本的token上限
+
+    同时满足两个约束：提示词 + 输入 + 输出上限不超过模型上下文；
+    按输出/输入比例估算的输出不超过用户设置的 max_tokens，避免输出被截断丢题。
+    """
+    config = current_app.config
+    max_tokens = (user or upload_record.user).max_tokens or 1000
+    prompt_tokens = estimate_tokens(build_messages('', upload_record)[0]['content']) + 2 * MESSAGE_OVERHEAD_TOKENS
+    by_context = config.get('LLM_CONTEXT_TOKENS', 8192) - prompt_tokens - max_tokens
+    by_output = int(max_tokens / config.get('LLM_OUTPUT_RATIO', 1.5))
+    return max(MIN_CHUNK_TOKENS, min(by_context, by_output))
+
+
+def estimate_prompt_tokens(messages):
+    return sum(estimate_tokens(message['content']) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def resolve_api_config(user):
+    """用户的大模型接口配置（未设置地址时使用默认接口）
+
+    Returns:
+        tuple: (base_url, api_key, model)
+    """
+    api_key = user.get_api_key()
+    if not api_key:
+        raise LLMError('请先在个人设置中配置API密钥')
+    base_url = user.api_base_url or current_app.config.get('LLM_DEFAULT_BASE_URL')
+    return base_url, api_key, user.ai_model
+
+
+def extract_questions(upload_record, chunks, user=None):
+    """逐块调用大模型提取题目，每道题解析完成后立即写入处理日志并输出
+
+    处理日志和 extracted_count 逐题提交，上传状态接口可以在整个响应结束前看到已提取的题目。
+    某一块调用失败时记录失败日志并继续处理后续文本块。
+
+    每次调用累计本地预估的输入token数和接口返回的实际用量到上传记录，用于校准装箱预算。
+
+    Args:
+        upload_record: 上传记录
+        chunks: 文本块的可迭代对象（如 ocr_upload_chunks 的结果，可以是 (文本块, token数)）
+        user: 提供API配置的用户，默认为上传者
+
+    Yields:
+        dict: 校验后的题目
+    """
+    user = user or upload_record.user
+    base_url, api_key, model = resolve_api_config(user)
+    types = allowed_question_types(upload_record)
+    extracted = upload_record.extracted_count or 0
+
+    for chunk_number, text in enumerate(chunks, 1):
+        if isinstance(text, tuple):
+            text = text[0]
+        started = time.perf_counter()
+        found = 0
+        invalid = 0
+        messages = build_messages(text, upload_record)
+        estimated = estimate_prompt_tokens(messages)
+        usage = {}
+        upload_record.llm_calls = (upload_record.llm_calls or 0) + 1
+        upload_record.estimated_tokens = (upload_record.estimated_tokens or 0) + estimated
+        try:
+            deltas = llm_client.stream_chat(base_url, api_key, model, messages, usage=usage,
+                                            max_tokens=user.max_tokens or 1000, temperature=0.1)
+            for item in iter_json_objects(deltas):
+                question = normalize_question(item, types)
+                if question is None:
+                    invalid += 1
+                    continue
+                found += 1
+                extracted += 1
+                upload_record.extracted_count = extracted
+                db.session.add(ProcessingLog(
+                    upload_record_id=upload_record.id,
+                    step_name=f'提取题目 #{extracted}',
+                    step_type='extraction',
+                    status='completed',
+                    message=f"[{TYPE_NAMES[question['type']]}] {question['content'][:100]}",
+                    output_data=json.dumps(question, ensure_ascii=False),
+                    duration_ms=int((time.perf_counter() - started) * 1000)
+                ))
+                db.session.commit()
+                yield question
+        except (LLMError, ValueError) as e:
+            db.session.add(ProcessingLog(
+                upload_record_id=upload_record.id,
+                step_name=f'AI提取 第{chunk_number}块',
+                step_type='extraction',
+                status='failed',
+                message=f'已提取{found}题后失败: {e}',
+                input_data=text[:200],
+                duration_ms=int((time.perf_counter() - started) * 1000)
+            ))
+            db.session.commit()
+            continue
+
+        message = f'提取{found}题' + (f'，忽略{invalid}条无效输出' if invalid else '')
+        message += f'；预估输入{estimated} tokens'
+        if usage:
+            upload_record.prompt_tokens = (upload_record.prompt_tokens or 0) + (usage.get('prompt_tokens') or 0)
+            upload_record.completion_tokens = (upload_record.completion_tokens or 0) + (usage.get('completion_tokens') or 0)
+            message += f"，实际输入{usage.get('prompt_tokens')} / 输出{usage.get('completion_tokens')} tokens"
+        db.session.add(ProcessingLog(
+            upload_record_id=upload_record.id,
+            step_name=f'AI提取 第{chunk_number}块',
+            step_type='extraction',
+            status='completed',
+            message=message,
+            input_data=text[:200],
+            duration_ms=int((time.perf_counter() - started) * 1000)
+        ))
+        db.session.commit()
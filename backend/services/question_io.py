@@ -0,0 +1,269 @@
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import select, func
+from models import db, Question
+from utils.change_log import OP_UPSERT, record_question_changes
+from utils.etag import bump_table_version
+from services.reference_data import get_category_ids
+
+EXPORT_COLUMNS = ['id', 'category_id', 'user_id', 'type', 'content', 'options', 'answer', 'explanation',
+                  'difficulty', 'source_file', 'tags', 'is_active', 'created_at', 'updated_at']
+JSON_COLUMNS = ('options', 'answer', 'tags')
+QUESTION_TYPES = ('single_choice', 'multiple_choice', 'true_false', 'fill_blank')
+
+# 输出缓冲达到该大小时才交给响应，减少生成器切换和网络写入次数
+FLUSH_SIZE = 64 * 1024
+
+# 导入时读取请求流的缓冲区大小
+READ_BUFFER_SIZE = 256 * 1024
+
+# 导入时最多返回的错误行数
+MAX_REPORTED_ERRORS = 100
+
+
+class QuestionImportError(ValueError):
+    """导入的某一行数据无效"""
+
+
+def iter_question_rows(category_id=None, user_id=None, include_inactive=False, chunk_size=1000):
+    """流式读取题目列（不构造ORM对象）
+
+    使用 yield_per 让驱动按批取数（PostgreSQL/MySQL 上为服务端游标），内存占用与题目总数无关。
+    """
+    table = Question.__table__
+    query = select(*(table.c[name] for name in EXPORT_COLUMNS)).order_by(table.c.id)
+    if category_id is not None:
+        query = query.where(table.c.category_id == category_id)
+    if user_id is not None:
+        query = query.where(table.c.user_id == user_id)
+    if not include_inactive:
+        query = query.where(table.c.is_active == True)
+    return db.session.execute(query.execution_options(yield_per=chunk_size))
+
+
+def question_row_to_dict(row):
+    """把题目列转换为与 Question.to_dict() 一致的字典"""
+    item = dict(zip(EXPORT_COLUMNS, row))
+    for name in JSON_COLUMNS:
+        item[name] = json.loads(item[name]) if item[name] else None
+    for name in ('created_at', 'updated_at'):
+        item[name] = item[name].isoformat() if item[name] else None
+    return item
+
+
+def iter_jsonl(rows):
+    """生成 JSON Lines 格式的导出内容"""
+    buffer = []
+    size = 0
+    for row in rows:
+        line = json.dumps(question_row_to_dict(row), ensure_ascii=False) + '\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= FLUSH_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_csv(rows):
+    """生成 CSV 格式的导出内容（JSON字段保留原始JSON文本，带BOM以便Excel识别UTF-8）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_COLUMNS)
+    active_index = EXPORT_COLUMNS.index('is_active')
+    time_indexes = [EXPORT_COLUMNS.index('created_at'), EXPORT_COLUMNS.index('updated_at')]
+    for row in rows:
+        values = list(row)
+        values[active_index] = 1 if values[active_index] else 0
+        for index in time_indexes:
+            values[index] = values[index].isoformat() if values[index] else ''
+        writer.writerow(values)
+        if buffer.tell() >= FLUSH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _iter_text_lines(stream):
+    """按行读取二进制流并解码（保留换行符，去掉首行的BOM）"""
+    if not isinstance(stream, io.BufferedIOBase):
+        # werkzeug 的 LimitedStream 没有实现 readline，按行迭代会逐字节读取
+        stream = io.BufferedReader(stream, READ_BUFFER_SIZE)
+    first = True
+    for raw in stream:
+        line = raw.decode('utf-8-sig' if first else 'utf-8')
+        first = False
+        yield line
+
+
+def iter_jsonl_records(stream):
+    """逐行解析 JSON Lines
+
+    Yields:
+        tuple: (行号, 字典或 QuestionImportError)
+    """
+    for line_number, line in enumerate(_iter_text_lines(stream), 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            yield line_number, QuestionImportError(f'JSON格式错误: {e}')
+            continue
+        if not isinstance(item, dict):
+            yield line_number, QuestionImportError('每行必须是一个JSON对象')
+            continue
+        yield line_number, item
+
+
+def iter_csv_records(stream):
+    """逐条解析 CSV（首行为表头，JSON字段为JSON文本）
+
+    Yields:
+        tuple: (行号, 字典或 QuestionImportError)
+    """
+    reader = csv.DictReader(_iter_text_lines(stream))
+    for item in reader:
+        line_number = reader.line_num
+        try:
+            for name in JSON_COLUMNS:
+                item[name] = json.loads(item[name]) if item.get(name) else None
+        except ValueError as e:
+            yield line_number, QuestionImportError(f'字段 {name} 不是有效的JSON: {e}')
+            continue
+        if item.get('is_active') in ('0', 'false', 'False'):
+            item['is_active'] = False
+        yield line_number, item
+
+
+def _json_text(value):
+    return json.dumps(value, ensure_ascii=False) if value is not None else None
+
+
+def build_question_row(item, user_id, category_ids, default_category_id=None):
+    """校验导入数据并转换为 questions 表的一行
+
+    原数据中的 id、user_id、时间字段不导入，题目归属导入者。
+    """
+    question_type = item.get('type')
+    if question_type not in QUESTION_TYPES:
+        raise QuestionImportError(f'不支持的题型: {question_type}')
+
+    content = (item.get('content') or '').strip()
+    if not content:
+        raise QuestionImportError('题目内容不能为空')
+    if item.get('answer') in (None, '', []):
+        raise QuestionImportError('答案不能为空')
+
+    category_id = item.get('category_id')
+    try:
+        category_id = int(category_id) if category_id not in (None, '') else None
+    except (TypeError, ValueError):
+        raise QuestionImportError(f'无效的分类ID: {category_id}')
+    if category_id not in category_ids:
+        category_id = default_category_id
+    if category_id is None:
+        raise QuestionImportError('分类不存在，且未指定默认分类')
+
+    try:
+        difficulty = int(item.get('difficulty') or 1)
+    except (TypeError, ValueError):
+        raise QuestionImportError('难度必须是1-5的整数')
+    if not 1 <= difficulty <= 5:
+        raise QuestionImportError('难度必须是1-5的整数')
+
+    now = datetime.utcnow()
+    return {
+        'category_id': category_id,
+        'user_id': user_id,
+        'type': question_type,
+        'content': content,
+        'options': _json_text(item.get('options')),
+        'answer': _json_text(item.get('answer')),
+        'explanation': item.get('explanation') or None,
+        'difficulty': difficulty,
+        'initial_difficulty': difficulty,
+        'source_file': item.get('source_file') or None,
+        'tags': _json_text(item.get('tags')),
+        'is_active': item.get('is_active') is not False,
+        'created_at': now,
+        'updated_at': now,
+    }
+
+
+def _insert_batch(rows):
+    """批量插入一批题目，并登记变更日志
+
+    支持批量 INSERT ... RETURNING 的数据库（SQLite、PostgreSQL、MariaDB）直接取回新题目的ID；
+    MySQL 不支持 RETURNING，改为普通的批量插入，再按导入者和本批的写入时间查回ID
+    （自增ID单调递增，先记下插入前的最大ID缩小查找范围）。
+    """
+    table = Question.__table__
+    # DATETIME 在 MySQL 上默认只精确到秒，去掉微秒保证按写入时间能查回本批数据
+    now = datetime.utcnow().replace(microsecond=0)
+    for row in rows:
+        row['created_at'] = row['updated_at'] = now
+
+    if db.engine.dialect.insert_executemany_returning:
+        result = db.session.execute(table.insert().returning(table.c.id, table.c.category_id), rows)
+    else:
+        max_id = db.session.execute(select(func.max(table.c.id))).scalar() or 0
+        db.session.execute(table.insert(), rows)
+        result = db.session.execute(select(table.c.id, table.c.category_id).where(
+            table.c.id > max_id, table.c.user_id == rows[0]['user_id'], table.c.created_at == now
+        ))
+
+    by_category = {}
+    for question_id, category_id in result:
+        by_category.setdefault(category_id, []).append(question_id)
+    for category_id, question_ids in by_category.items():
+        record_question_changes(question_ids, OP_UPSERT, category_id)
+    bump_table_version('questions')
+    db.session.commit()
+
+
+def import_questions(records, user_id, default_category_id=None, batch_size=1000):
+    """分批导入题目，内存占用只与批大小有关
+
+    无效行会被跳过并记录错误，已提交的批次不会因后续错误回滚。
+
+    Args:
+        records: iter_jsonl_records / iter_csv_records 的结果
+        user_id: 导入者ID
+        default_category_id: 数据中的分类不存在时使用的分类
+
+    Returns:
+        dict: {'imported', 'skipped', 'errors'}
+    """
+    category_ids = get_category_ids()
+    if default_category_id is not None and default_category_id not in category_ids:
+        raise QuestionImportError('默认分类不存在')
+
+    stats = {'imported': 0, 'skipped': 0, 'errors': []}
+    batch = []
+    for line_number, item in records:
+        try:
+            if isinstance(item, QuestionImportError):
+                raise item
+            batch.append(build_question_row(item, user_id, category_ids, default_category_id))
+        except QuestionImportError as e:
+            stats['skipped'] += 1
+            if len(stats['errors']) < MAX_REPORTED_ERRORS:
+                stats['errors'].append({'line': line_number, 'error': str(e)})
+            continue
+
+        if len(batch) >= batch_size:
+            _insert_batch(batch)
+            stats['imported'] += len(batch)
+            batch = []
+
+    if batch:
+        _insert_batch(batch)
+        stats['imported'] += len(batch)
+    return stats
@@ -0,0 +1,43 @@
+from sqlalchemy import select
+from models import db, Category
+from utils.cache import cache
+from utils.etag import get_table_versions
+
+CATEGORY_NAMESPACE = 'categories'
+
+
+def _load_categories():
+    # 回源始终读主库：刚写入后副本可能还没同步，读到的旧数据会以新版本号缓存下来
+    categories = db.session.scalars(
+        select(Category).order_by(Category.sort_order.asc(), Category.created_at.asc()),
+        bind_arguments={'bind': db.engine}
+    ).all()
+    return [category.to_dict() for category in categories]
+
+
+def get_category_list():
+    """按排序返回全部分类（Category.to_dict() 列表，只读，不要修改）"""
+    # 缓存键使用数据库中的表版本号：任一进程写入分类后，所有进程都会改用新键，
+    # ETag（同样来自表版本号）变化时响应体一定是新的
+    version = get_table_versions(['categories'])['categories']
+    return cache.get_or_load(CATEGORY_NAMESPACE, version, 'list', _load_categories)
+
+
+def get_category_dict(category_id):
+    """单个分类的字典，不存在时返回 None"""
+    for category in get_category_list():
+        if category['id'] == category_id:
+            return category
+    return None
+
+
+def get_category_ids():
+    return {category['id'] for category in get_category_list()}
+
+
+def get_default_category_id():
+    """默认分类ID，没有默认分类时返回 None"""
+    for category in get_category_list():
+        if category['is_default']:
+            return category['id']
+    return None
@@ -0,0 +1,162 @@
+import math
+import re
+
+try:
+    import tiktoken
+except ImportError:  # 可选依赖，未安装时按字符类别估算
+    tiktoken = None
+
+_PARAGRAPH_SPLIT = re.compile(r'\n\s*\n')
+
+# 中日韩字符（常见中文分词器约一字一个token），英文单词，数字，其他非空白字符
+_TOKEN_PATTERN = re.compile(r'([\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef])|([A-Za-z]+)|(\d+)|(\S)')
+
+# 段落之间的 "\n\n" 按一个token计
+SEPARATOR_TOKENS = 1
+
+_encoding = None
+
+
+def split_paragraphs(text):
+    """按空行切分段落，去掉首尾空白和空段落"""
+    return [paragraph.strip() for paragraph in _PARAGRAPH_SPLIT.split(text or '') if paragraph.strip()]
+
+
+def _split_long(paragraph, max_chunk_size):
+    """超长段落按行切分，单行仍超长时按长度硬切"""
+    pieces = []
+    current = ''
+    for line in paragraph.split('\n'):
+        while len(line) > max_chunk_size:
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(line[:max_chunk_size])
+            line = line[max_chunk_size:]
+        if current and len(current) + 1 + len(line) > max_chunk_size:
+            pieces.append(current)
+            current = line
+        else:
+            current = f'{current}\n{line}' if current else line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def iter_chunks(texts, max_chunk_size=3000):
+    """把按顺序到达的文本（如逐页OCR结果）合并切分为不超过 max_chunk_size 字符的块
+
+    以段落为单位累积，一旦凑满一块立即输出，不等待全部文本到达。
+
+    Args:
+        texts: 文本的可迭代对象（可以是生成器）
+        max_chunk_size: 每块最大字符数
+
+    Yields:
+        str: 文本块
+    """
+    current = []
+    size = 0
+    for text in texts:
+        for paragraph in split_paragraphs(text):
+            pieces = [paragraph] if len(paragraph) <= max_chunk_size else _split_long(paragraph, max_chunk_size)
+            for piece in pieces:
+                extra = len(piece) + (2 if current else 0)
+                if current and size + extra > max_chunk_size:
+                    yield '\n\n'.join(current)
+                    current = []
+                    size = 0
+                    extra = len(piece)
+                current.append(piece)
+                size += extra
+    if current:
+        yield '\n\n'.join(current)
+
+
+def estimate_tokens(text):
+    """估算文本的token数
+
+    安装了 tiktoken 时使用 cl100k_base 编码精确计数；否则按字符类别估算：
+    中文每字1个，英文每4个字母1个，数字每3位1个，标点每个1个。
+    """
+    global _encoding
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding('cl100k_base')
+        return len(_encoding.encode(text, disallowed_special=()))
+    count = 0
+    for cjk, word, digits, other in _TOKEN_PATTERN.findall(text):
+        if cjk or other:
+            count += 1
+        elif word:
+            count += math.ceil(len(word) / 4)
+        else:
+            count += math.ceil(len(digits) / 3)
+    return count
+
+
+def _split_to_budget(paragraph, tokens, token_budget):
+    """超出预算的段落按比例换算为字符数切分，切完仍超出的继续对半切"""
+    max_chars = max(1, len(paragraph) * token_budget // tokens)
+    pieces = []
+    for piece in _split_long(paragraph, max_chars):
+        piece_tokens = estimate_tokens(piece)
+        if piece_tokens > token_budget and len(piece) > 1:
+            middle = len(piece) // 2
+            pieces.extend(_split_to_budget(piece[:middle], estimate_tokens(piece[:middle]), token_budget))
+            pieces.extend(_split_to_budget(piece[middle:], estimate_tokens(piece[middle:]), token_budget))
+        else:
+            pieces.append((piece, piece_tokens))
+    return pieces
+
+
+def pack_paragraphs(items, token_budget):
+    """按原文顺序贪心装块（next-fit）：当前块放不下下一段时另起一块
+
+    同一道题的题干、选项、答案通常是相邻段落，块内必须保持原文中连续的一段，
+    模型才能看到完整的题目。段落不能重排时，贪心装满每一块得到的块数就是最少的。
+
+    Args:
+        items: [(段落, token数)] 的可迭代对象，token数不超过 token_budget
+        token_budget: 每块的token上限
+
+    Yields:
+        list: [(段落, token数)]
+    """
+    group = []
+    used = 0
+    for item in items:
+        cost = item[1] + (SEPARATOR_TOKENS if group else 0)
+        if group and used + cost > token_budget:
+            yield group
+            group = []
+            used = 0
+            cost = item[1]
+        group.append(item)
+        used += cost
+    if group:
+        yield group
+
+
+def iter_packed_chunks(texts, token_budget):
+    """按token预算把按顺序到达的文本装成尽量少的连续块
+
+    文本逐段到达（如逐页OCR结果），一块装满即输出，不等待后续文本。
+
+    Yields:
+        tuple: (文本块, 估算token数)
+    """
+    def pieces():
+        for text in texts:
+            for paragraph in split_paragraphs(text):
+                tokens = estimate_tokens(paragraph)
+                if tokens <= token_budget:
+                    yield paragraph, tokens
+                else:
+                    yield from _split_to_budget(paragraph, tokens, token_budget)
+
+    for group in pack_paragraphs(pieces(), token_budget):
+        yield '\n\n'.join(paragraph for paragraph, _ in group), \
+            sum(tokens for _, tokens in group) + SEPARATOR_TOKENS * (len(group) - 1)
@@ -0,0 +1,110 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from models import db, UploadRecord, Question, ProcessingLog
+from services.ocr import ocr_upload_chunks
+from services.question_extractor import chunk_token_budget, extract_questions
+from services.question_io import QuestionImportError, build_question_row
+from services.reference_data import get_category_ids, get_default_category_id
+
+
+class UploadProcessingRunner:
+    """后台解析上传文件的线程池
+
+    每个文件的处理大部分时间在等待OCR进程池和大模型流式输出，线程数即同时解析的文件数。
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('UPLOAD_PROCESSING_WORKERS', 2),
+                    thread_name_prefix='upload-processing'
+                )
+            return self._executor.submit(func, *args)
+
+
+# 全局后台解析执行器
+upload_processing_runner = UploadProcessingRunner()
+
+
+def save_extracted_question(record, question, category_ids, default_category_id):
+    """把提取出的一道题写入题库并立即提交，轮询状态时 saved_count 随之增长"""
+    item = dict(question, category_id=record.category_id, source_file=record.original_filename)
+    try:
+        row = build_question_row(item, record.user_id, category_ids, default_category_id)
+    except QuestionImportError:
+        return False
+    db.session.add(Question(**row))
+    record.saved_count = (record.saved_count or 0) + 1
+    db.session.commit()
+    return True
+
+
+def process_upload(record):
+    """上传文件的完整解析流程：逐页OCR，按token预算装箱，流式调用大模型提取题目并逐题入库
+
+    三个阶段都是生成器串联：第一页识别完成即可开始装箱，第一块装满即发起调用，
+    模型输出的第一道题解析完成就写入题库，不等待整份文件或整段响应结束。
+    """
+    record.status = 'processing'
+    record.processing_started_at = datetime.utcnow()
+    record.error_message = None
+    db.session.commit()
+
+    try:
+        category_ids = get_category_ids()
+        default_category_id = get_default_category_id()
+        chunks = ocr_upload_chunks(record, chunk_token_budget(record))
+        for question in extract_questions(record, chunks):
+            save_extracted_question(record, question, category_ids, default_category_id)
+    except Exception as e:
+        db.session.rollback()
+        record.status = 'failed'
+        record.error_message = str(e)
+    else:
+        if record.saved_count:
+            record.status = 'completed'
+        else:
+            record.status = 'failed'
+            record.error_message = '未能从文件中提取到题目，请查看处理日志'
+    record.processed_at = datetime.utcnow()
+    db.session.add(ProcessingLog(
+        upload_record_id=record.id,
+        step_name='解析完成' if record.status == 'completed' else '解析失败',
+        step_type='validation',
+        status=record.status,
+        message=record.error_message or f'提取{record.extracted_count}题，保存{record.saved_count}题',
+        duration_ms=int((record.processed_at - record.processing_started_at).total_seconds() * 1000)
+    ))
+    db.session.commit()
+
+
+def _run_processing(app, upload_id):
+    with app.app_context():
+        record = db.session.get(UploadRecord, upload_id)
+        if record is not None:
+            process_upload(record)
+
+
+def start_upload_processing(record):
+    """上传完成后提交后台解析（复用已有结果、非AI解析或关闭自动解析时不处理）
+
+    Returns:
+        bool: 是否已提交
+    """
+    if record.status != 'uploaded' or (record.parse_mode or 'ai') != 'ai':
+        return False
+    if not current_app.config.get('UPLOAD_AUTO_PROCESS', True):
+        return False
+    # 先标记为处理中再提交，上传接口返回后轮询到的状态不会停留在 uploaded
+    record.status = 'processing'
+    record.processing_started_at = datetime.utcnow()
+    db.session.commit()
+    upload_processing_runner.submit(_run_processing, current_app._get_current_object(), record.id)
+    return True
@@ -0,0 +1,318 @@
+import hashlib
+import os
+import threading
+import uuid
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from models import db, UploadRecord, StoredBlob, ProcessingLog
+
+# 边写边哈希时每次读取的字节数
+CHUNK_SIZE = 1024 * 1024
+
+# 决定解析结果的上传配置；内容和这些配置都相同时可以复用已完成的解析结果
+PARSE_SETTING_FIELDS = ('parse_mode', 'question_types', 'include_answers', 'include_explanations',
+                        'enable_split', 'max_chunk_size')
+BOOLEAN_SETTING_FIELDS = ('include_answers', 'include_explanations', 'enable_split')
+
+
+class UploadTooLarge(ValueError):
+    """上传文件超过大小限制"""
+
+
+def allowed_file(filename):
+    """文件扩展名是否在 ALLOWED_EXTENSIONS 中"""
+    allowed = current_app.config.get('ALLOWED_EXTENSIONS')
+    extension = os.path.splitext(filename)[1].lstrip('.').lower()
+    return not allowed or extension in allowed
+
+
+def file_type_error(filename):
+    """上传的文件类型不可解析时返回错误信息，否则返回 None"""
+    if os.path.splitext(filename)[1].lower() == '.doc':
+        return '不支持旧版 Word（.doc）文件，请另存为 .docx 后上传'
+    if not allowed_file(filename):
+        return '不支持的文件类型'
+    return None
+
+
+def get_blob_folder():
+    folder = current_app.config.get('BLOB_FOLDER') or os.path.join(current_app.config['UPLOAD_FOLDER'], 'blobs')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def get_temp_folder():
+    folder = current_app.config.get('UPLOAD_TEMP_FOLDER') or os.path.join(current_app.config['UPLOAD_FOLDER'], 'tmp')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def blob_path(sha256):
+    """内容寻址路径：blobs/ab/cd/abcd...（两级分片，避免单目录文件过多）"""
+    return os.path.join(get_blob_folder(), sha256[:2], sha256[2:4], sha256)
+
+
+def hash_file(path):
+    """计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_stream_to_temp(stream, max_size=None):
+    """把上传流写入临时文件，同时计算SHA-256（内存占用只有一个读取块）
+
+    Returns:
+        tuple: (临时文件路径, sha256, 字节数)
+    """
+    temp_path = os.path.join(get_temp_folder(), f'{uuid.uuid4().hex}.part')
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, 'wb') as f:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLarge('上传文件过大')
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+    return temp_path, digest.hexdigest(), size
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _acquire_reference(sha256, size):
+    """引用计数加一（不存在时创建记录）"""
+    table = StoredBlob.__table__
+    now = datetime.utcnow()
+    increment = table.update().where(table.c.sha256 == sha256).values(
+        ref_count=table.c.ref_count + 1, last_referenced_at=now
+    )
+    if db.session.execute(increment).rowcount == 0:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert().values(
+                    sha256=sha256, size=size, ref_count=1, created_at=now, last_referenced_at=now
+                ))
+        except IntegrityError:
+            # 并发上传了相同内容，对方已经创建了记录
+            db.session.execute(increment)
+    db.session.commit()
+
+
+def store_blob(temp_path, sha256, size):
+    """把已计算哈希的临时文件放入内容寻址存储并增加引用
+
+    先提交引用计数再放置文件，与 release_blob 的删除顺序配合，
+    保证并发的“最后一次删除”和“新上传”不会删掉仍被引用的文件。
+
+    Returns:
+        str: 存储路径
+    """
+    try:
+        _acquire_reference(sha256, size)
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+    path = blob_path(sha256)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 内容相同，直接覆盖即可；不判断是否存在，避免与并发删除竞争
+    os.replace(temp_path, path)
+    return path
+
+
+def save_upload_stream(stream, max_size=None):
+    """保存上传流到内容寻址存储
+
+    Returns:
+        tuple: (sha256, 字节数, 存储路径)
+    """
+    temp_path, sha256, size = write_stream_to_temp(stream, max_size)
+    return sha256, size, store_blob(temp_path, sha256, size)
+
+
+def _blob_referenced(sha256):
+    return db.session.execute(
+        select(StoredBlob.sha256).where(StoredBlob.sha256 == sha256)
+    ).first() is not None
+
+
+def release_blob(sha256):
+    """引用计数减一，最后一个引用释放时删除文件"""
+    table = StoredBlob.__table__
+    db.session.execute(table.update().where(table.c.sha256 == sha256, table.c.ref_count > 0).values(
+        ref_count=table.c.ref_count - 1
+    ))
+    deleted = db.session.execute(table.delete().where(table.c.sha256 == sha256, table.c.ref_count <= 0)).rowcount
+    db.session.commit()
+    if not deleted:
+        return False
+
+    # 先移走再确认没有被并发上传重新引用，被重新引用时放回原处
+    path = blob_path(sha256)
+    trash_path = f'{path}.{os.getpid()}-{threading.get_ident()}.deleting'
+    try:
+        os.replace(path, trash_path)
+    except FileNotFoundError:
+        return True
+    if _blob_referenced(sha256):
+        os.replace(trash_path, path)
+        return False
+    _remove_quietly(trash_path)
+    return True
+
+
+def normalize_parse_settings(data):
+    """把请求中的解析配置转换为上传记录的列值
+
+    question_types 可以是题型列表或逗号分隔的字符串，统一保存为逗号分隔的字符串；
+    布尔配置兼容表单提交的 'true' / 'false'。
+
+    Raises:
+        ValueError: 配置格式错误
+    """
+    settings = {}
+    for field in PARSE_SETTING_FIELDS + ('category_id',):
+        value = data.get(field)
+        if value is None:
+            continue
+        if field == 'question_types':
+            if isinstance(value, str):
+                value = value.split(',')
+            if not isinstance(value, (list, tuple)) or not all(isinstance(item, str) for item in value):
+                raise ValueError('题目类型格式错误')
+            value = ','.join(item.strip() for item in value if item.strip()) or None
+        elif field in BOOLEAN_SETTING_FIELDS:
+            value = value.strip().lower() in ('true', '1', 'yes', 'on') if isinstance(value, str) else bool(value)
+        elif field in ('max_chunk_size', 'category_id'):
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f'{field} 必须是整数')
+        else:
+            value = str(value)
+        settings[field] = value
+    return settings
+
+
+def parse_settings(record):
+    """上传记录的解析配置"""
+    return {field: getattr(record, field) for field in PARSE_SETTING_FIELDS}
+
+
+def find_reusable_upload(content_hash, settings, user_id, exclude_id=None):
+    """查找同一用户内容和解析配置都相同、且已处理完成的上传记录
+
+    提取出的题目归属上传者，其他用户的上传即使内容相同也要重新解析（文件本身仍然共用）。
+    """
+    query = UploadRecord.query.filter(
+        UploadRecord.user_id == user_id,
+        UploadRecord.content_hash == content_hash,
+        UploadRecord.status == 'completed',
+        UploadRecord.reused_from_id.is_(None)
+    )
+    for field, value in settings.items():
+        column = getattr(UploadRecord, field)
+        query = query.filter(column.is_(None) if value is None else column == value)
+    if exclude_id is not None:
+        query = query.filter(UploadRecord.id != exclude_id)
+    return query.order_by(UploadRecord.id.desc()).first()
+
+
+def link_to_existing(record, source):
+    """重复上传同一文件：题目已经在上传者的题库中，标记为完成且不再走解析流程
+
+    本次没有新增题目，提取和保存数量保持为0。
+    """
+    now = datetime.utcnow()
+    record.reused_from_id = source.id
+    record.status = 'completed'
+    record.extracted_count = 0
+    record.saved_count = 0
+    record.processing_started_at = now
+    record.processed_at = now
+    db.session.add(ProcessingLog(
+        upload_record=record,
+        step_name='复用解析结果',
+        step_type='parsing',
+        status='completed',
+        message=f'文件内容和解析配置与上传记录 #{source.id} 相同，其提取的 {source.saved_count} 道题目已在题库中，'
+                '本次不再重复解析',
+        duration_ms=0
+    ))
+
+
+def create_upload_record(user_id, stream, original_filename, settings=None, mime_type=None, max_size=None):
+    """保存上传文件并创建上传记录；相同内容已解析完成时直接复用结果
+
+    Returns:
+        tuple: (UploadRecord, 是否复用了已有结果)
+    """
+    sha256, size, path = save_upload_stream(stream, max_size)
+    try:
+        return register_stored_upload(user_id, sha256, size, path, original_filename, settings, mime_type)
+    except BaseException:
+        db.session.rollback()
+        release_blob(sha256)
+        raise
+
+
+def register_stored_upload(user_id, sha256, size, path, original_filename, settings=None, mime_type=None):
+    """为已放入内容寻址存储（且已持有引用）的文件创建上传记录
+
+    Returns:
+        tuple: (UploadRecord, 是否复用了已有结果)
+    """
+    record = UploadRecord(
+        user_id=user_id,
+        original_filename=original_filename,
+        stored_filename=sha256,
+        file_path=path,
+        file_size=size,
+        file_type=os.path.splitext(original_filename)[1].lstrip('.').lower() or 'bin',
+        mime_type=mime_type,
+        status='uploaded',
+        content_hash=sha256,
+        **(settings or {})
+    )
+    db.session.add(record)
+    db.session.flush()
+
+    source = find_reusable_upload(sha256, parse_settings(record), user_id, exclude_id=record.id)
+    if source is not None:
+        link_to_existing(record, source)
+    db.session.commit()
+    return record, source is not None
+
+
+def delete_upload_record(record):
+    """删除上传记录及其处理日志，并释放文件引用
+
+    旧版本按文件名平铺存储的记录没有 content_hash，直接删除文件。
+    """
+    content_hash = record.content_hash
+    legacy_path = None if content_hash else record.file_path
+
+    UploadRecord.query.filter(UploadRecord.reused_from_id == record.id).update(
+        {'reused_from_id': None}, synchronize_session=False
+    )
+    ProcessingLog.query.filter(ProcessingLog.upload_record_id == record.id).delete(synchronize_session=False)
+    db.session.delete(record)
+    db.session.commit()
+
+    if content_hash:
+        release_blob(content_hash)
+    elif legacy_path:
+        _remove_quietly(legacy_path)
@@ -0,0 +1,110 @@
+import os
+import sys
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from models import db, User, Category
+from auth import generate_token
+from utils.etag import init_table_versions
+from utils.compression import init_compression
+from utils.change_log import init_change_log
+from utils.metrics import init_metrics
+from utils.password_hasher import init_password_hasher
+from utils.token_revocation import init_token_revocation
+from utils.db_routing import init_db_routing
+from utils.cache import init_cache
+from services.ocr import init_ocr
+from services.llm_client import init_llm_client
+from services.paper_generator import init_question_index
+from services.question_bulk import init_question_bulk
+from routes.auth_routes import auth_bp
+from routes.question_routes import question_bp
+from routes.category_routes import category_bp
+from routes.practice_routes import practice_bp
+from routes.upload_routes import upload_bp
+from routes.sync_routes import sync_bp
+
+BLUEPRINTS = (auth_bp, question_bp, category_bp, practice_bp, upload_bp, sync_bp)
+
+
+def create_test_app(tmp_path, **overrides):
+    """与 app.create_app 相同的初始化流程，数据库和上传目录放在临时目录中"""
+    upload_folder = str(tmp_path / 'uploads')
+    app = Flask('shuashuati-test')
+    app.config.from_object(config['development'])
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+        SQLALCHEMY_BINDS={},
+        DB_REPLICA_BINDS=[],
+        UPLOAD_FOLDER=upload_folder,
+        BLOB_FOLDER=os.path.join(upload_folder, 'blobs'),
+        UPLOAD_TEMP_FOLDER=os.path.join(upload_folder, 'tmp'),
+        OCR_CACHE_FOLDER=os.path.join(upload_folder, 'ocr_cache'),
+        PACK_FOLDER=os.path.join(upload_folder, 'packs'),
+        PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',
+        TOKEN_REVOCATION_SYNC_SECONDS=None,
+        RATE_LIMIT_ENABLED=False,
+        CACHE_STORAGE_URL='memory://',
+        SYNC_SETTLE_SECONDS=0,
+        UPLOAD_AUTO_PROCESS=False
+    )
+    app.config.update(overrides)
+
+    db.init_app(app)
+    init_db_routing(app)
+    init_cache(app)
+    init_password_hasher(app)
+    init_token_revocation(app)
+    init_ocr(app)
+    init_llm_client(app)
+    init_question_index(app)
+    init_compression(app)
+    init_metrics(app)
+    for blueprint in BLUEPRINTS:
+        app.register_blueprint(blueprint)
+
+    with app.app_context():
+        db.create_all()
+        admin = User(username='admin', email='admin@example.com', role='admin')
+        admin.set_password('secret123')
+        user = User(username='student', email='student@example.com', role='user')
+        user.set_password('secret123')
+        db.session.add_all([admin, user, Category(name='数学', sort_order=1), Category(name='其他', is_default=True)])
+        db.session.commit()
+    init_table_versions(app)
+    init_change_log(app)
+    init_question_bulk(app)
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_test_app(tmp_path)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def auth_headers(app, user_id):
+    with app.app_context():
+        return {'Authorization': f'Bearer {generate_token(user_id)}'}
+
+
+@pytest.fixture
+def admin_headers(app):
+    return auth_headers(app, 1)
+
+
+@pytest.fixture
+def user_headers(app):
+    return auth_headers(app, 2)
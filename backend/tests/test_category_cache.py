@@ -0,0 +1,19 @@
+from models import db, Category
+
+
+def test_category_write_in_another_worker_invalidates_cache(app, client, user_headers):
+    first = client.get('/api/categories', headers=user_headers)
+    assert [category['name'] for category in first.get_json()['categories']] == ['其他', '数学']
+
+    # 另一个 worker 进程写入：本进程的缓存没有收到任何通知，只有数据库中的表版本号变化
+    with app.app_context():
+        db.session.get(Category, 1).name = '高等数学'
+        db.session.commit()
+
+    second = client.get('/api/categories', headers={**user_headers, 'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert [category['name'] for category in second.get_json()['categories']] == ['其他', '高等数学']
+
+    third = client.get('/api/categories', headers={**user_headers, 'If-None-Match': second.headers['ETag']})
+    assert third.status_code == 304
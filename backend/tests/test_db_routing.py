@@ -0,0 +1,122 @@
+"""只读副本路由：主库和副本分别是两个本地 SQLite 文件，副本中的邮箱与主库不同以区分读取来源"""
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timedelta
+import pytest
+from models import db
+from utils.db_routing import replica_router
+from conftest import create_test_app, auth_headers
+
+USER_ID = 2
+PRIMARY_EMAIL = 'student@example.com'
+REPLICA_EMAIL = 'replica@example.com'
+
+
+def set_replica(path, email=None, heartbeat_age=0):
+    with sqlite3.connect(path) as connection:
+        if email is not None:
+            connection.execute('UPDATE users SET email = ? WHERE id = ?', (email, USER_ID))
+        connection.execute('DELETE FROM replication_heartbeats')
+        connection.execute('INSERT INTO replication_heartbeats (id, beat_at) VALUES (1, ?)',
+                           (str(datetime.utcnow() - timedelta(seconds=heartbeat_age)),))
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    replica_path = tmp_path / 'replica.db'
+    app = create_test_app(tmp_path, SQLALCHEMY_BINDS={'replica': f'sqlite:///{replica_path}'},
+                          DB_REPLICA_BINDS=['replica'], DB_REPLICA_MAX_LAG_SECONDS=5,
+                          DB_REPLICA_CHECK_SECONDS=None, DB_READ_STICKY_SECONDS=0.5)
+    with app.app_context():
+        db.engines['replica'].dispose()
+        db.engine.dispose()
+    # 副本是主库的一份拷贝，心跳与主库同步
+    shutil.copy(tmp_path / 'test.db', replica_path)
+    set_replica(replica_path, email=REPLICA_EMAIL)
+    # 不启动后台检测线程，由各测试显式检测
+    with app.app_context():
+        replica_router.check(force=True)
+    app.replica_path = replica_path
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    # db 是全局实例，init_app 为每个绑定登记的元数据会留到后续测试的 create_all 中
+    db.metadatas.pop('replica', None)
+    replica_router.configure([])
+
+
+def read_email(client, headers):
+    response = client.get('/api/auth/profile', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['data']['email']
+
+
+def test_reads_go_to_replica(replica_app):
+    assert replica_router.lag['replica'] < 5
+    assert read_email(replica_app.test_client(), auth_headers(replica_app, USER_ID)) == REPLICA_EMAIL
+
+
+def test_reads_after_write_stick_to_primary(replica_app):
+    client = replica_app.test_client()
+    headers = auth_headers(replica_app, USER_ID)
+    response = client.put('/api/auth/profile', json={'email': 'primary@example.com'}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+
+    assert read_email(client, headers) == 'primary@example.com'
+    time.sleep(0.6)
+    # 粘滞时间过后回到副本（本测试中副本不会复制主库的写入）
+    assert read_email(client, headers) == REPLICA_EMAIL
+
+
+def test_write_does_not_pin_other_users_behind_same_address(replica_app):
+    client = replica_app.test_client()
+    response = client.put('/api/auth/profile', json={'email': 'admin2@example.com'},
+                          headers=auth_headers(replica_app, 1))
+    assert response.status_code == 200, response.get_json()
+    # 测试客户端的地址都相同，相当于反向代理之后的多个用户
+    assert read_email(client, auth_headers(replica_app, USER_ID)) == REPLICA_EMAIL
+
+
+def test_lagging_replica_falls_back_to_primary(replica_app):
+    set_replica(replica_app.replica_path, heartbeat_age=60)
+    with replica_app.app_context():
+        replica_router.check(force=True)
+    assert replica_router.lag['replica'] > 5
+    assert read_email(replica_app.test_client(), auth_headers(replica_app, USER_ID)) == PRIMARY_EMAIL
+
+    set_replica(replica_app.replica_path)
+    with replica_app.app_context():
+        replica_router.check(force=True)
+    assert read_email(replica_app.test_client(), auth_headers(replica_app, USER_ID)) == REPLICA_EMAIL
+
+
+def test_heartbeat_runs_in_background(replica_app):
+    set_replica(replica_app.replica_path, heartbeat_age=60)
+    replica_router.check_interval = 0.05
+    # 请求本身不做检测，只负责启动后台线程
+    read_email(replica_app.test_client(), auth_headers(replica_app, USER_ID))
+    deadline = time.monotonic() + 5
+    while replica_router.lag['replica'] < 5 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert read_email(replica_app.test_client(), auth_headers(replica_app, USER_ID)) == PRIMARY_EMAIL
+
+
+def test_replica_down_retries_on_primary(replica_app):
+    client = replica_app.test_client()
+    headers = auth_headers(replica_app, USER_ID)
+    assert read_email(client, headers) == REPLICA_EMAIL
+
+    # 副本不可用：文件位置变成目录，无法打开
+    with replica_app.app_context():
+        db.engines['replica'].dispose()
+    os.remove(replica_app.replica_path)
+    os.mkdir(replica_app.replica_path)
+
+    assert read_email(client, headers) == PRIMARY_EMAIL
+    assert replica_router.lag['replica'] is None
+    # 下一次心跳检测前不再尝试该副本
+    assert read_email(client, headers) == PRIMARY_EMAIL
@@ -0,0 +1,35 @@
+from models import db, Question, PracticeRecord
+from services.difficulty_calibration import calibrate_difficulty
+from services.question_io import build_question_row
+from conftest import create_test_app
+
+USER_ID = 2
+
+
+def test_full_run_restarts_from_extracted_level(tmp_path):
+    app = create_test_app(tmp_path, CALIBRATION_MIN_ATTEMPTS=5, CALIBRATION_MIN_DURATION_SECONDS=0)
+    with app.app_context():
+        row = build_question_row({'type': 'true_false', 'content': '1+1=3', 'answer': False, 'difficulty': 1,
+                                  'category_id': 1}, USER_ID, {1})
+        question = Question(**row)
+        db.session.add(question)
+        db.session.flush()
+        # 标为最简单的题几乎没人答对
+        db.session.add_all(PracticeRecord(user_id=USER_ID, question_id=question.id, user_answer='true',
+                                          is_correct=False, duration_seconds=10) for _ in range(30))
+        db.session.commit()
+
+        calibrate_difficulty(full=True)
+        first = db.session.get(Question, question.id)
+        first_level, first_score = first.difficulty, first.difficulty_score
+        assert first_level > 1
+        assert first.initial_difficulty == 1
+
+        # 第二次全量运行从提取时的等级开始，而不是上一次的校准结果
+        db.session.expire_all()
+        calibrate_difficulty(full=True)
+        second = db.session.get(Question, question.id)
+        assert (second.difficulty, second.difficulty_score) == (first_level, first_score)
+        assert second.initial_difficulty == 1
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,292 @@
+"""上传解析流水线与大模型流式客户端：在本地启动一个输出 SSE 的模拟接口"""
+import io
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from models import db, User, Question, UploadRecord, ProcessingLog
+from services.llm_client import llm_client, LLMError
+from services.question_extractor import extract_questions
+from conftest import create_test_app, auth_headers
+
+USER_ID = 2
+API_KEY = 'sk-' + 'a' * 40
+
+
+def question(index):
+    return {'type': 'single_choice', 'content': f'第{index}题：1+{index}=?', 'options': ['A. 1', 'B. 2'],
+            'answer': 'A', 'difficulty': 2}
+
+
+class MockLLMServer:
+    """按顺序为每个请求取出一个处理函数；处理函数通过 send_status / stream 写出响应"""
+
+    def __init__(self):
+        self.handlers = []
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                server.requests.append({'headers': dict(self.headers), 'body': json.loads(body)})
+                server.handlers.pop(0)(self)
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self._httpd.server_port}/v1'
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def send_status(handler, status, body=b'busy', headers=None):
+    handler.send_response(status)
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def stream(*steps):
+    """构造流式响应：str 为模型输出的一段文本，dict 为用量，Event 等待其被设置，数字为暂停秒数"""
+    def handle(handler):
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.send_header('Transfer-Encoding', 'chunked')
+        handler.end_headers()
+
+        def write(data):
+            payload = f'data: {data}\n\n'.encode('utf-8')
+            handler.wfile.write(b'%x\r\n' % len(payload) + payload + b'\r\n')
+            handler.wfile.flush()
+
+        for step in steps:
+            if isinstance(step, threading.Event):
+                step.wait(5)
+            elif isinstance(step, (int, float)):
+                time.sleep(step)
+            elif isinstance(step, dict):
+                write(json.dumps({'choices': [], 'usage': step}))
+            else:
+                # 按小片段输出，覆盖一个JSON对象跨多个事件的情况
+                for start in range(0, len(step), 7):
+                    write(json.dumps({'choices': [{'delta': {'content': step[start:start + 7]}}]},
+                                     ensure_ascii=False))
+        write('[DONE]')
+        handler.wfile.write(b'0\r\n\r\n')
+    return handle
+
+
+def questions_json(*indexes, opening=True, closing=True):
+    text = ', '.join(json.dumps(question(index), ensure_ascii=False) for index in indexes)
+    return ('[' if opening else ', ') + text + (']' if closing else '')
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = predicate()
+        if value:
+            return value
+        time.sleep(0.02)
+    raise AssertionError('等待超时')
+
+
+@pytest.fixture
+def llm_server():
+    server = MockLLMServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def llm_app(tmp_path, llm_server):
+    app = create_test_app(tmp_path, UPLOAD_AUTO_PROCESS=True, LLM_CONNECT_TIMEOUT=1, LLM_READ_TIMEOUT=0.5,
+                          LLM_MAX_RETRIES=1, LLM_RETRY_BACKOFF=0.01)
+    with app.app_context():
+        user = db.session.get(User, USER_ID)
+        user.api_base_url = llm_server.url
+        user.ai_model = 'mock-model'
+        user.set_api_key(API_KEY)
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def add_upload_record():
+    record = UploadRecord(user_id=USER_ID, original_filename='a.txt', stored_filename='a.txt', file_path='a.txt',
+                          file_size=1, file_type='txt', status='processing')
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+
+def upload_status(client, headers, upload_id):
+    response = client.get(f'/api/upload/status/{upload_id}', headers=headers)
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+
+def test_upload_saves_questions_while_response_streams(llm_app, llm_server):
+    release = threading.Event()
+    llm_server.handlers.append(stream(questions_json(1, closing=False), release,
+                                      questions_json(2, opening=False), {'prompt_tokens': 120, 'completion_tokens': 80}))
+    client = llm_app.test_client()
+    headers = auth_headers(llm_app, USER_ID)
+
+    response = client.post('/api/upload', data={
+        'file': (io.BytesIO('1. 1+1=?\nA. 1\nB. 2\n\n2. 1+2=?\nA. 1\nB. 2\n'.encode('utf-8')), 'questions.txt'),
+        'question_types': 'single_choice'
+    }, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    upload_id = response.get_json()['data']['file_id']
+
+    # 第一道题已入库时模型还在输出
+    status = wait_for(lambda: (lambda data: data if data['saved_count'] == 1 else None)(
+        upload_status(client, headers, upload_id)))
+    assert status['status'] == 'processing'
+    with llm_app.app_context():
+        assert [q.content for q in Question.query.filter_by(user_id=USER_ID)] == ['第1题：1+1=?']
+
+    release.set()
+    status = wait_for(lambda: (lambda data: data if data['status'] != 'processing' else None)(
+        upload_status(client, headers, upload_id)))
+    assert status['status'] == 'completed'
+    assert (status['extracted_count'], status['saved_count']) == (2, 2)
+    assert status['llm_calls'] == 1
+    assert (status['prompt_tokens'], status['completion_tokens']) == (120, 80)
+    assert status['estimated_tokens'] > 0
+
+    request = llm_server.requests[0]
+    assert request['headers']['Authorization'] == f'Bearer {API_KEY}'
+    assert request['body']['stream'] is True
+    assert request['body']['stream_options'] == {'include_usage': True}
+    assert request['body']['model'] == 'mock-model'
+    with llm_app.app_context():
+        saved = Question.query.filter_by(user_id=USER_ID).order_by(Question.id).all()
+        assert [q.source_file for q in saved] == ['questions.txt', 'questions.txt']
+
+
+def test_usage_accumulates_across_chunks(llm_app, llm_server):
+    llm_server.handlers += [
+        stream(questions_json(1), {'prompt_tokens': 100, 'completion_tokens': 40}),
+        stream(questions_json(2, 3), {'prompt_tokens': 110, 'completion_tokens': 70}),
+    ]
+    with llm_app.app_context():
+        record = add_upload_record()
+        found = list(extract_questions(record, [('第一块', 3), ('第二块', 3)]))
+        assert [item['content'] for item in found] == ['第1题：1+1=?', '第2题：1+2=?', '第3题：1+3=?']
+        record = db.session.get(UploadRecord, record.id)
+        assert record.llm_calls == 2
+        assert (record.prompt_tokens, record.completion_tokens) == (210, 110)
+        assert record.extracted_count == 3
+
+
+def test_retries_retryable_status_before_streaming(llm_app, llm_server):
+    llm_server.handlers += [
+        lambda handler: send_status(handler, 503, headers={'Retry-After': '0'}),
+        stream(questions_json(1)),
+    ]
+    with llm_app.app_context():
+        record = add_upload_record()
+        assert len(list(extract_questions(record, ['文本']))) == 1
+    assert len(llm_server.requests) == 2
+
+
+def test_does_not_retry_client_errors(llm_app, llm_server):
+    llm_server.handlers.append(lambda handler: send_status(handler, 401, b'invalid key'))
+    with llm_app.app_context():
+        with pytest.raises(LLMError) as error:
+            llm_client.chat(llm_server.url, API_KEY, 'mock-model', [])
+    assert error.value.status_code == 401
+    assert len(llm_server.requests) == 1
+
+
+def test_gives_up_after_retries(llm_app, llm_server):
+    llm_server.handlers += [lambda handler: send_status(handler, 502)] * 2
+    with llm_app.app_context():
+        with pytest.raises(LLMError) as error:
+            llm_client.chat(llm_server.url, API_KEY, 'mock-model', [])
+    assert error.value.status_code == 502
+    assert len(llm_server.requests) == 2
+
+
+def test_read_timeout_before_response_is_retried(llm_app, llm_server):
+    def slow(handler):
+        time.sleep(1)
+        send_status(handler, 503)
+
+    llm_server.handlers += [slow, stream(questions_json(1))]
+    with llm_app.app_context():
+        assert '第1题' in llm_client.chat(llm_server.url, API_KEY, 'mock-model', [])
+    assert len(llm_server.requests) == 2
+
+
+def test_stall_mid_stream_keeps_saved_questions_and_is_not_retried(llm_app, llm_server):
+    llm_server.handlers.append(stream(questions_json(1, closing=False), 1, questions_json(2, opening=False)))
+    with llm_app.app_context():
+        record = add_upload_record()
+        found = list(extract_questions(record, ['文本']))
+        assert [item['content'] for item in found] == ['第1题：1+1=?']
+        failed = ProcessingLog.query.filter_by(upload_record_id=record.id, status='failed').one()
+        assert '已提取1题后失败' in failed.message
+    assert len(llm_server.requests) == 1
+
+
+def test_upload_fails_without_extracted_questions(llm_app, llm_server):
+    llm_server.handlers += [lambda handler: send_status(handler, 500)] * 2
+    client = llm_app.test_client()
+    headers = auth_headers(llm_app, USER_ID)
+    response = client.post('/api/upload', data={'file': (io.BytesIO('1+1=?'.encode('utf-8')), 'q.txt')},
+                           headers=headers)
+    upload_id = response.get_json()['data']['file_id']
+    status = wait_for(lambda: (lambda data: data if data['status'] != 'processing' else None)(
+        upload_status(client, headers, upload_id)))
+    assert status['status'] == 'failed'
+    assert status['saved_count'] == 0
+    assert status['error_message']
+
+
+def test_docx_upload_is_extracted(llm_app, llm_server):
+    from docx import Document
+
+    llm_server.handlers.append(stream(questions_json(1)))
+    document = Document()
+    document.add_paragraph('1. 1+1=?')
+    document.add_paragraph('A. 1  B. 2')
+    buffer = io.BytesIO()
+    document.save(buffer)
+    buffer.seek(0)
+    client = llm_app.test_client()
+    headers = auth_headers(llm_app, USER_ID)
+    response = client.post('/api/upload', data={'file': (buffer, 'questions.docx')}, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    upload_id = response.get_json()['data']['file_id']
+    status = wait_for(lambda: (lambda data: data if data['status'] != 'processing' else None)(
+        upload_status(client, headers, upload_id)))
+    assert status['status'] == 'completed'
+    prompt = json.dumps(llm_server.requests[0]['body']['messages'], ensure_ascii=False)
+    assert '1. 1+1=?' in prompt and 'A. 1  B. 2' in prompt
+
+
+def test_legacy_doc_upload_is_rejected(llm_app):
+    client = llm_app.test_client()
+    headers = auth_headers(llm_app, USER_ID)
+    response = client.post('/api/upload', data={'file': (io.BytesIO(b'\xd0\xcf\x11\xe0'), 'questions.doc')},
+                           headers=headers)
+    assert response.status_code == 400
+    assert '.docx' in response.get_json()['error']
+    with llm_app.app_context():
+        assert UploadRecord.query.count() == 0
@@ -0,0 +1,33 @@
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from models import db
+from conftest import create_test_app
+
+
+def test_metrics_require_token_outside_development(tmp_path):
+    app = create_test_app(tmp_path, DEBUG=False, TESTING=False, METRICS_TOKEN=None)
+    client = app.test_client()
+    assert client.get('/api/metrics').status_code == 403
+    assert client.get('/api/metrics/slow-queries').status_code == 403
+
+    app.config['METRICS_TOKEN'] = 'scrape-token'
+    assert client.get('/api/metrics').status_code == 403
+    response = client.get('/api/metrics/slow-queries', headers={'Authorization': 'Bearer scrape-token'})
+    assert response.status_code == 200
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_failed_statement_does_not_leak_start_time(app):
+    with app.test_request_context('/'):
+        g._metrics_sampled = True
+        g._metrics_sql_count = 0
+        g._metrics_sql_seconds = 0.0
+        connection = db.session.connection()
+        with pytest.raises(OperationalError):
+            connection.execute(text('SELECT * FROM missing_table'))
+        assert not connection.info.get('_metrics_query_start')
+        db.session.rollback()
@@ -0,0 +1,24 @@
+import numpy as np
+from models import db, Question
+from services.paper_generator import _allocate_levels
+
+
+def test_allocation_survives_desired_level_outside_range():
+    available = np.array([[500, 0, 0, 0, 0], [100] * 5])
+    allocation = _allocate_levels(np.random.default_rng(1), available, [198, 2], 5, spread=1.0)
+    assert allocation.sum(axis=1).tolist() == [198, 2]
+    assert allocation[1, 4] == 2
+
+
+def test_infeasible_difficulty_returns_conflict(app, client, user_headers):
+    with app.app_context():
+        db.session.add_all(Question(category_id=1, user_id=1, type='true_false', content=f'判断{index}',
+                                    answer='true', difficulty=1) for index in range(500))
+        db.session.add_all(Question(category_id=1, user_id=1, type='single_choice', content=f'单选{level}-{index}',
+                                    answer='"A"', difficulty=level) for level in range(1, 6) for index in range(2))
+        db.session.commit()
+    response = client.post('/api/practice/papers', json={
+        'count': 200, 'type_ratios': {'single_choice': 0.01}, 'difficulty': 5
+    }, headers=user_headers)
+    assert response.status_code == 409, response.get_json()
+    assert response.get_json()['details']['target'] == 5
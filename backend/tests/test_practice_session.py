@@ -0,0 +1,157 @@
+import json
+from datetime import datetime
+import pytest
+from models import db, Question, PracticeRecord, WrongAnswer
+from services import practice_session
+from utils.cache import cache
+
+USER_ID = 2
+
+
+@pytest.fixture
+def session_id(app, client, user_headers):
+    with app.app_context():
+        db.session.add_all([
+            Question(category_id=1, user_id=1, type='single_choice', content=f'题目{index}',
+                     options=json.dumps(['甲', '乙']), answer='"A"', difficulty=1)
+            for index in range(4)
+        ])
+        db.session.commit()
+    response = client.post('/api/practice/sessions', json={'count': 4, 'mode': 'sequential'}, headers=user_headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['session']['session_id']
+
+
+def answer(client, headers, session_id, index, value='A'):
+    return client.post(f'/api/practice/sessions/{session_id}/answer', json={'index': index, 'answer': value},
+                       headers=headers)
+
+
+def session_state(client, headers, session_id):
+    response = client.get(f'/api/practice/sessions/{session_id}', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['session']
+
+
+def test_failed_commit_does_not_lock_the_question(app, client, user_headers, session_id, monkeypatch):
+    def fail(*args):
+        raise RuntimeError('数据库不可用')
+
+    monkeypatch.setattr(practice_session, '_record_wrong_answer', fail)
+    assert answer(client, user_headers, session_id, 0, 'B').status_code == 500
+    monkeypatch.undo()
+
+    response = answer(client, user_headers, session_id, 0, 'B')
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['session']['cursor'] == 1
+    with app.app_context():
+        assert PracticeRecord.query.filter_by(session_id=session_id).count() == 1
+
+
+def test_session_missing_from_cache_is_restored_from_database(app, client, user_headers, session_id):
+    assert answer(client, user_headers, session_id, 0).status_code == 200
+    assert answer(client, user_headers, session_id, 1, 'B').status_code == 200
+    # 缓存条目被淘汰，或请求落到没有共享缓存的另一个 worker
+    cache.clear()
+
+    state = session_state(client, user_headers, session_id)
+    assert (state['cursor'], state['answered'], state['correct']) == (2, 2, 1)
+    assert state['question']['content'] == '题目2'
+    assert answer(client, user_headers, session_id, 1).status_code == 409
+    assert answer(client, user_headers, session_id, 2).status_code == 200
+
+    cache.clear()
+    response = client.get('/api/practice/sessions/current', headers=user_headers)
+    assert response.status_code == 200
+    assert response.get_json()['session']['cursor'] == 3
+
+
+def test_stale_cached_session_defers_to_database(app, client, user_headers, session_id):
+    with app.app_context():
+        stale = cache.get(f'practice:{session_id}:state')
+    assert answer(client, user_headers, session_id, 0).status_code == 200
+    assert answer(client, user_headers, session_id, 1).status_code == 200
+
+    # 本进程缓存的进度停在作答之前（作答发生在另一个 worker）
+    with app.app_context():
+        cache.set(f'practice:{session_id}:state', stale)
+        cache.delete(f'practice:{session_id}:answers')
+    response = answer(client, user_headers, session_id, 0)
+    assert response.status_code == 409
+    assert session_state(client, user_headers, session_id)['cursor'] == 2
+
+    with app.app_context():
+        cache.set(f'practice:{session_id}:state', stale)
+    response = answer(client, user_headers, session_id, 2)
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['session']['cursor'] == 3
+    with app.app_context():
+        assert PracticeRecord.query.filter_by(session_id=session_id).count() == 3
+
+
+def test_ended_session_is_not_restored(client, user_headers, session_id):
+    assert client.delete(f'/api/practice/sessions/{session_id}', headers=user_headers).status_code == 200
+    assert client.get(f'/api/practice/sessions/{session_id}', headers=user_headers).status_code == 404
+
+
+def test_random_session_samples_matching_questions(app):
+    with app.app_context():
+        db.session.add_all(Question(category_id=category_id, user_id=1, type=kind, content=f'{kind}{index}',
+                                    answer='"A"', difficulty=level)
+                           for category_id in (1, 2) for kind in ('single_choice', 'true_false')
+                           for level in (1, 3) for index in range(5))
+        db.session.commit()
+        wanted = {question.id for question in Question.query.filter_by(category_id=2, type='true_false', difficulty=3)}
+        correct = min(wanted)
+        db.session.add(PracticeRecord(user_id=USER_ID, question_id=correct, user_answer='"A"', is_correct=True))
+        db.session.commit()
+
+        ids = practice_session.select_question_ids(USER_ID, category_id=2, question_type='true_false', difficulty=3,
+                                                   exclude_correct=True, count=20)
+        assert sorted(ids) == sorted(wanted - {correct})
+        assert len(practice_session.select_question_ids(USER_ID, count=7)) == 7
+
+        first = Question.query.filter_by(category_id=1).order_by(Question.id).limit(3).all()
+        assert practice_session.select_question_ids(USER_ID, mode='sequential', category_id=1, count=3) == \
+            [question.id for question in first]
+
+
+def test_concurrent_wrong_answer_is_counted_on_existing_row(app, monkeypatch):
+    with app.app_context():
+        question = Question(category_id=1, user_id=1, type='true_false', content='判断', answer='true')
+        db.session.add(question)
+        db.session.commit()
+        real_execute = db.session.execute
+
+        def racing_execute(statement, *args, **kwargs):
+            result = real_execute(statement, *args, **kwargs)
+            if getattr(statement, 'is_update', False) and statement.table.name == 'wrong_answers' and \
+                    not WrongAnswer.query.count():
+                # 另一个请求在本次更新之后、插入之前创建了错题记录
+                real_execute(WrongAnswer.__table__.insert().values(user_id=USER_ID, question_id=question.id,
+                                                                   error_count=1))
+            return result
+
+        monkeypatch.setattr(db.session, 'execute', racing_execute)
+        practice_session._record_wrong_answer(USER_ID, question.id, datetime.utcnow())
+        db.session.commit()
+        monkeypatch.undo()
+        assert [row.error_count for row in WrongAnswer.query.filter_by(user_id=USER_ID)] == [2]
+
+
+def test_history_export_accepts_offset_times(app, client, user_headers):
+    with app.app_context():
+        question = Question(category_id=1, user_id=1, type='true_false', content='判断', answer='true')
+        db.session.add(question)
+        db.session.flush()
+        db.session.add_all(PracticeRecord(user_id=USER_ID, question_id=question.id, user_answer='true', is_correct=True,
+                                          practiced_at=datetime(2026, 3, 1, hour)) for hour in (1, 3, 5))
+        db.session.commit()
+
+    # 北京时间 10:00 至 12:00 即 UTC 02:00 至 04:00
+    response = client.get('/api/practice/history/export', query_string={
+        'since': '2026-03-01T10:00:00+08:00', 'until': '2026-03-01T12:00:00+08:00'
+    }, headers=user_headers)
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(rows) == 1
@@ -0,0 +1,233 @@
+"""按 query_budgets.json 检查每个接口单次请求执行的SQL语句数
+
+每个接口在 CASES 中登记一个用例：setup 在计数之外准备数据并返回请求参数，
+随后只统计请求本身执行的语句。新增接口时需要同时登记预算和用例。
+"""
+import hashlib
+import io
+import json
+import pytest
+from models import db, Category, Question, UploadRecord, ProcessingLog, QuestionBulkJob, PracticeRecord
+from utils.query_budget import QueryCounter, load_budgets
+from conftest import auth_headers
+
+ADMIN_ID = 1
+USER_ID = 2
+CATEGORY_ID = 1
+
+
+def add_questions(count=5, user_id=ADMIN_ID, category_id=CATEGORY_ID):
+    questions = [
+        Question(category_id=category_id, user_id=user_id, type='single_choice', content=f'题目{index}',
+                 options=json.dumps(['甲', '乙', '丙', '丁'], ensure_ascii=False), answer='"A"',
+                 difficulty=index % 5 + 1, tags=json.dumps(['标签']))
+        for index in range(count)
+    ]
+    db.session.add_all(questions)
+    db.session.commit()
+    return [question.id for question in questions]
+
+
+def start_practice(client, headers, count=3):
+    response = client.post('/api/practice/sessions', json={'count': count}, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['session']['session_id']
+
+
+def start_upload(client, headers, content=b'1. 1+1=?\nA. 2\nB. 3\n'):
+    response = client.post('/api/upload/sessions', json={
+        'filename': 'questions.txt', 'size': len(content), 'sha256': hashlib.sha256(content).hexdigest()
+    }, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['session']['upload_id'], content
+
+
+def add_upload_record(user_id=USER_ID):
+    record = UploadRecord(user_id=user_id, original_filename='a.txt', stored_filename='a.txt', file_path='a.txt',
+                          file_size=1, file_type='txt', status='processing')
+    db.session.add(record)
+    db.session.flush()
+    db.session.add_all([ProcessingLog(upload_record_id=record.id, step_name=f'第{index}题', step_type='extraction',
+                                      status='completed') for index in range(3)])
+    db.session.commit()
+    return record.id
+
+
+def with_questions(method, url, count=5, **kwargs):
+    """先添加若干题目再发起请求的 setup"""
+    def setup(client, headers):
+        add_questions(count)
+        return method, url, kwargs
+    return setup
+
+
+def _delete_category(client, headers):
+    category = Category(name='空分类')
+    db.session.add(category)
+    db.session.commit()
+    return 'DELETE', f'/api/categories/{category.id}', {}
+
+
+def _answer(client, headers):
+    add_questions()
+    session_id = start_practice(client, headers)
+    return 'POST', f'/api/practice/sessions/{session_id}/answer', {'json': {'index': 0, 'answer': 'A'}}
+
+
+def _get_practice_session(client, headers):
+    add_questions()
+    return 'GET', f'/api/practice/sessions/{start_practice(client, headers)}', {}
+
+
+def _delete_practice_session(client, headers):
+    add_questions()
+    return 'DELETE', f'/api/practice/sessions/{start_practice(client, headers)}', {}
+
+
+def _get_current(client, headers):
+    add_questions()
+    start_practice(client, headers)
+    return 'GET', '/api/practice/sessions/current', {}
+
+
+def _export_history(client, headers):
+    question_ids = add_questions()
+    db.session.add_all([PracticeRecord(user_id=USER_ID, question_id=question_id, user_answer='"A"', is_correct=True)
+                        for question_id in question_ids])
+    db.session.commit()
+    return 'GET', '/api/practice/history/export', {}
+
+
+def upload_file(client, headers, content=b'1. 1+1=?\nA. 2\nB. 3\n'):
+    response = client.post('/api/upload', data={'file': (io.BytesIO(content), 'questions.txt')}, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['data']['id']
+
+
+def _upload_file(client, headers):
+    return 'POST', '/api/upload', {'data': {
+        'file': (io.BytesIO(b'1. 1+1=?\nA. 2\n'), 'questions.txt'), 'question_types': 'single_choice,true_false'
+    }}
+
+
+def _delete_upload(client, headers):
+    return 'DELETE', f'/api/upload/{upload_file(client, headers)}', {}
+
+
+def _get_upload_session(client, headers):
+    upload_id, _ = start_upload(client, headers)
+    return 'GET', f'/api/upload/sessions/{upload_id}', {}
+
+
+def _upload_chunk(client, headers):
+    upload_id, content = start_upload(client, headers)
+    return 'PUT', f'/api/upload/sessions/{upload_id}?offset=0', {'data': content}
+
+
+def _complete_upload(client, headers):
+    upload_id, content = start_upload(client, headers)
+    assert client.put(f'/api/upload/sessions/{upload_id}?offset=0', data=content, headers=headers).status_code == 200
+    return 'POST', f'/api/upload/sessions/{upload_id}/complete', {}
+
+
+def _abort_upload(client, headers):
+    upload_id, _ = start_upload(client, headers)
+    return 'DELETE', f'/api/upload/sessions/{upload_id}', {}
+
+
+def _get_bulk_job(client, headers):
+    job = QuestionBulkJob(id='job1', user_id=ADMIN_ID, operation='deactivate', params='{}', total=0)
+    db.session.add(job)
+    db.session.commit()
+    return 'GET', '/api/questions/bulk/jobs/job1', {}
+
+
+def _sync(client, headers):
+    add_questions(user_id=USER_ID)
+    return 'GET', '/api/sync/questions', {}
+
+
+def _import(client, headers):
+    lines = [json.dumps({'category_id': CATEGORY_ID, 'type': 'true_false', 'content': f'判断{index}',
+                         'answer': True}, ensure_ascii=False) for index in range(20)]
+    return 'POST', '/api/questions/import', {'data': '\n'.join(lines).encode('utf-8')}
+
+
+def _bulk(client, headers):
+    question_ids = add_questions(20)
+    return 'POST', '/api/questions/bulk', {'json': {'operation': 'retag', 'ids': question_ids, 'add_tags': ['新']}}
+
+
+# 接口 -> (发起请求的用户, setup)；setup 返回 (方法, 地址, test_client 的其他参数)
+CASES = {
+    'auth.register': (None, lambda c, h: ('POST', '/api/auth/register', {
+        'json': {'username': 'newbie', 'password': 'secret123', 'email': 'newbie@example.com'}})),
+    'auth.login': (None, lambda c, h: ('POST', '/api/auth/login', {
+        'json': {'username': 'student', 'password': 'secret123'}})),
+    'auth.get_current_user': (USER_ID, lambda c, h: ('GET', '/api/auth/me', {})),
+    'auth.get_profile': (USER_ID, lambda c, h: ('GET', '/api/auth/profile', {})),
+    'auth.update_profile': (USER_ID, lambda c, h: ('PUT', '/api/auth/profile', {
+        'json': {'nickname': '学生', 'email': 'student2@example.com'}})),
+    'auth.change_password': (USER_ID, lambda c, h: ('PUT', '/api/auth/password', {
+        'json': {'currentPassword': 'secret123', 'newPassword': 'secret456'}})),
+    'auth.logout': (USER_ID, lambda c, h: ('POST', '/api/auth/logout', {})),
+    'auth.get_api_config': (USER_ID, lambda c, h: ('GET', '/api/auth/api-config', {})),
+    'auth.update_api_config': (USER_ID, lambda c, h: ('PUT', '/api/auth/api-config', {
+        'json': {'aiModel': 'deepseek-chat', 'apiKey': 'sk-' + 'a' * 40, 'maxTokens': 2000}})),
+    'auth.test_api_connection': (USER_ID, lambda c, h: ('POST', '/api/auth/test-api', {
+        'json': {'apiKey': 'sk-' + 'a' * 40}})),
+    'categories.get_categories': (USER_ID, with_questions('GET', '/api/categories?include_count=true')),
+    'categories.get_category': (USER_ID, with_questions('GET', f'/api/categories/{CATEGORY_ID}')),
+    'categories.download_category_pack': (USER_ID, with_questions('GET', f'/api/categories/{CATEGORY_ID}/pack')),
+    'categories.create_category': (ADMIN_ID, lambda c, h: ('POST', '/api/categories', {'json': {'name': '物理'}})),
+    'categories.update_category': (ADMIN_ID, lambda c, h: ('PUT', f'/api/categories/{CATEGORY_ID}', {
+        'json': {'name': '高等数学', 'description': '微积分', 'sort_order': 3}})),
+    'categories.delete_category': (ADMIN_ID, _delete_category),
+    'categories.reorder_categories': (ADMIN_ID, lambda c, h: ('POST', '/api/categories/reorder', {
+        'json': {'category_orders': [{'id': 1, 'sort_order': 2}, {'id': 2, 'sort_order': 1}]}})),
+    'questions.export_questions': (ADMIN_ID, with_questions('GET', '/api/questions/export')),
+    'questions.import_question_bank': (ADMIN_ID, _import),
+    'questions.bulk_update_questions': (ADMIN_ID, _bulk),
+    'questions.get_bulk_job': (ADMIN_ID, _get_bulk_job),
+    'practice.get_summary': (USER_ID, lambda c, h: ('GET', '/api/practice/summary', {})),
+    'practice.export_history': (USER_ID, _export_history),
+    'practice.start_session': (USER_ID, with_questions('POST', '/api/practice/sessions', json={'count': 3})),
+    'practice.create_paper': (USER_ID, with_questions('POST', '/api/practice/papers', count=30,
+                                                      json={'count': 5, 'difficulty': 3})),
+    'practice.get_current': (USER_ID, _get_current),
+    'practice.get_practice_session': (USER_ID, _get_practice_session),
+    'practice.answer_question': (USER_ID, _answer),
+    'practice.delete_session': (USER_ID, _delete_practice_session),
+    'upload.upload_file': (USER_ID, _upload_file),
+    'upload.delete_upload': (USER_ID, _delete_upload),
+    'upload.create_upload_session': (USER_ID, lambda c, h: ('POST', '/api/upload/sessions', {
+        'json': {'filename': 'questions.txt', 'size': 10}})),
+    'upload.get_upload_session': (USER_ID, _get_upload_session),
+    'upload.upload_chunk': (USER_ID, _upload_chunk),
+    'upload.complete_upload_session': (USER_ID, _complete_upload),
+    'upload.abort_upload_session': (USER_ID, _abort_upload),
+    'upload.get_upload_status': (USER_ID, lambda c, h: ('GET', f'/api/upload/status/{add_upload_record()}', {})),
+    'sync.get_question_changes': (USER_ID, _sync),
+}
+
+
+def test_every_endpoint_has_budget_and_case(app):
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules() if '.' in rule.endpoint}
+    budgets = load_budgets()
+    assert endpoints - set(budgets) == set(), '以下接口没有登记查询预算'
+    assert set(budgets) - endpoints == set(), 'query_budgets.json 中有已不存在的接口'
+    assert endpoints - set(CASES) == set(), '以下接口没有查询预算测试用例'
+
+
+@pytest.mark.parametrize('endpoint', sorted(CASES))
+def test_endpoint_within_query_budget(app, client, endpoint):
+    user_id, setup = CASES[endpoint]
+    headers = auth_headers(app, user_id) if user_id else {}
+    with app.app_context():
+        method, url, kwargs = setup(client, headers)
+        # 流式响应在读取响应体时才执行查询，一并计入
+        with QueryCounter() as counter:
+            response = client.open(url, method=method, headers=headers, **kwargs)
+            response.get_data()
+    assert response.status_code < 300, response.get_data(as_text=True)
+    counter.assert_budget(load_budgets()[endpoint])
@@ -0,0 +1,87 @@
+import json
+from datetime import datetime, timedelta
+from models import db, Question, QuestionChange, QuestionBulkJob, PracticeRecord, WrongAnswer, Favorite
+from services.question_bulk import INTERRUPTED_MESSAGE, init_question_bulk
+
+
+def add_job(job_id, status, heartbeat_age):
+    now = datetime.utcnow()
+    db.session.add(QuestionBulkJob(id=job_id, user_id=1, operation='retag', params=json.dumps({}), status=status,
+                                   started_at=now - timedelta(hours=1),
+                                   heartbeat_at=now - timedelta(seconds=heartbeat_age)))
+
+
+def test_interrupted_jobs_are_marked_failed(app, client, admin_headers):
+    with app.app_context():
+        add_job('stale', 'running', 3600)
+        add_job('alive', 'running', 5)
+        add_job('polled', 'running', 3600)
+        db.session.commit()
+        # 重启时清理；其他进程中仍有心跳的任务不受影响
+        db.session.get(QuestionBulkJob, 'polled').heartbeat_at = datetime.utcnow()
+        db.session.commit()
+        init_question_bulk(app)
+        assert db.session.get(QuestionBulkJob, 'stale').status == 'failed'
+        assert db.session.get(QuestionBulkJob, 'alive').status == 'running'
+        db.session.get(QuestionBulkJob, 'polled').heartbeat_at = datetime.utcnow() - timedelta(hours=1)
+        db.session.commit()
+
+    # 执行任务的进程在启动之后退出：查询进度时发现
+    job = client.get('/api/questions/bulk/jobs/polled', headers=admin_headers).get_json()['job']
+    assert job['status'] == 'failed'
+    assert job['error_message'] == INTERRUPTED_MESSAGE
+    assert client.get('/api/questions/bulk/jobs/alive', headers=admin_headers).get_json()['job']['status'] == 'running'
+
+
+def add_questions(count, category_id=1):
+    questions = [Question(category_id=category_id, user_id=1, type='true_false', content=f'判断{index}',
+                          answer='true') for index in range(count)]
+    db.session.add_all(questions)
+    db.session.commit()
+    return [question.id for question in questions]
+
+
+def bulk(client, headers, **body):
+    response = client.post('/api/questions/bulk', json=body, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['result']
+
+
+def test_delete_keeps_practiced_questions_and_clears_references(app, client, admin_headers):
+    with app.app_context():
+        practiced, unused = add_questions(2)
+        db.session.add(PracticeRecord(user_id=2, question_id=practiced, user_answer='false', is_correct=False))
+        db.session.add_all([WrongAnswer(user_id=2, question_id=practiced), Favorite(user_id=2, question_id=practiced),
+                            Favorite(user_id=2, question_id=unused)])
+        db.session.commit()
+
+    result = bulk(client, admin_headers, operation='delete', ids=[practiced, unused])
+    assert (result['deleted'], result['deactivated']) == (1, 1)
+    assert (result['wrong_answers'], result['favorites']) == (1, 2)
+
+    with app.app_context():
+        # 有练习记录的题目保留历史，改为停用
+        assert db.session.get(Question, practiced).is_active is False
+        assert db.session.get(Question, unused) is None
+        assert PracticeRecord.query.filter_by(question_id=practiced).count() == 1
+        assert WrongAnswer.query.count() == 0
+        assert Favorite.query.count() == 0
+        tombstones = QuestionChange.query.filter(QuestionChange.question_id.in_([practiced, unused]),
+                                                 QuestionChange.operation == 'delete').all()
+        assert sorted(change.question_id for change in tombstones) == [practiced, unused]
+
+
+def test_move_records_tombstone_in_old_category_and_upsert_in_new(app, client, admin_headers):
+    with app.app_context():
+        question_ids = add_questions(2)
+        after = db.session.query(db.func.max(QuestionChange.id)).scalar()
+
+    assert bulk(client, admin_headers, operation='move', ids=question_ids, category_id=2)['moved'] == 2
+
+    with app.app_context():
+        changes = QuestionChange.query.filter(QuestionChange.id > after).order_by(QuestionChange.id).all()
+        assert sorted((change.question_id, change.category_id, change.operation) for change in changes) == sorted(
+            [(question_id, 1, 'delete') for question_id in question_ids]
+            + [(question_id, 2, 'upsert') for question_id in question_ids]
+        )
+        assert {question.category_id for question in Question.query.filter(Question.id.in_(question_ids))} == {2}
@@ -0,0 +1,29 @@
+from models import db, Question
+
+
+def sync(client, headers, cursor, **params):
+    response = client.get('/api/sync/questions', query_string=dict(params, cursor=cursor), headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_sync_covers_questions_served_in_packs(app, client, user_headers):
+    cursor = sync(client, user_headers, 0)['cursor']
+    with app.app_context():
+        # 管理员创建的题目同样出现在题包和练习会话中
+        db.session.add_all([Question(category_id=1, user_id=1, type='true_false', content=f'判断{index}',
+                                     answer='true') for index in range(2)])
+        db.session.commit()
+        first, second = [question.id for question in Question.query.order_by(Question.id)]
+
+    data = sync(client, user_headers, cursor, category_id=1)
+    assert sorted(item['id'] for item in data['questions']) == [first, second]
+
+    with app.app_context():
+        db.session.get(Question, first).is_active = False
+        db.session.get(Question, second).category_id = 2
+        db.session.commit()
+
+    data = sync(client, user_headers, data['cursor'], category_id=1)
+    assert data['questions'] == []
+    assert sorted(item['id'] for item in data['tombstones']) == [first, second]
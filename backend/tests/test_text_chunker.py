@@ -0,0 +1,43 @@
+import random
+from services.text_chunker import SEPARATOR_TOKENS, iter_packed_chunks, pack_paragraphs
+
+
+def min_contiguous_chunks(costs, budget):
+    """动态规划求保持顺序时的最少块数，用于对照贪心装块的结果"""
+    best = [0] + [None] * len(costs)
+    for end in range(1, len(costs) + 1):
+        used = -SEPARATOR_TOKENS
+        for start in range(end - 1, -1, -1):
+            used += costs[start] + SEPARATOR_TOKENS
+            if used > budget:
+                break
+            if best[start] is not None and (best[end] is None or best[start] + 1 < best[end]):
+                best[end] = best[start] + 1
+    return best[-1]
+
+
+def test_pack_keeps_paragraphs_contiguous_and_uses_fewest_chunks():
+    rng = random.Random(7)
+    for _ in range(200):
+        budget = rng.randint(20, 120)
+        items = [(f'段落{index}', rng.randint(1, budget)) for index in range(rng.randint(1, 40))]
+        groups = list(pack_paragraphs(items, budget))
+        assert [item for group in groups for item in group] == items
+        for group in groups:
+            assert sum(tokens for _, tokens in group) + SEPARATOR_TOKENS * (len(group) - 1) <= budget
+        assert len(groups) == min_contiguous_chunks([tokens for _, tokens in items], budget)
+
+
+def test_question_split_over_paragraphs_stays_in_one_chunk():
+    texts = ['1. 下列哪个是质数？\n\nA. 4  B. 6\n\nC. 7  D. 9\n\n答案：C', '2. 1+1=?\n\nA. 2  B. 3\n\n答案：A']
+    chunks = list(iter_packed_chunks(texts, 30))
+    assert [text for text, _ in chunks] == ['1. 下列哪个是质数？\n\nA. 4  B. 6\n\nC. 7  D. 9\n\n答案：C',
+                                             '2. 1+1=?\n\nA. 2  B. 3\n\n答案：A']
+    assert all(tokens <= 30 for _, tokens in chunks)
+
+
+def test_oversized_paragraph_is_split_to_budget():
+    chunks = list(iter_packed_chunks(['很长的段落' * 50], 40))
+    assert len(chunks) > 1
+    assert all(tokens <= 40 for _, tokens in chunks)
+    assert ''.join(text for text, _ in chunks) == '很长的段落' * 50
@@ -0,0 +1,392 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import msgpack
+
+try:
+    import redis
+except ImportError:  # 可选依赖，多进程共享缓存时需要
+    redis = None
+
+# 未命中的哨兵值（缓存的值本身可以是 None）
+_MISSING = object()
+
+
+class LRUTier:
+    """进程内LRU缓存，条目带过期时间
+
+    保存的是Python对象本身，调用方不能修改取回的值。
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (过期时间, 值)
+        self._lock = threading.Lock()
+
+    def get(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= now:
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._entries[key] = (now + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def hget(self, key, field, now=None):
+        """读取字典值中的一个字段"""
+        value = self.get(key, now)
+        return _MISSING if value is _MISSING else value.get(field, _MISSING)
+
+    def hadd(self, key, field, value, ttl, now=None):
+        """字段不存在时写入（对应 HSETNX），返回是否写入成功；键不存在时按 ttl 新建"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                entry = self._entries[key] = (now + ttl, {})
+            if field in entry[1]:
+                return False
+            entry[1][field] = value
+            return True
+
+    def hdel(self, key, field):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1].pop(field, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class LocalSharedTier:
+    """共享缓存层的进程内实现，接口与 RedisTier 相同
+
+    单进程部署不需要共享层；测试中可让多个 Cache 实例共用一个 LocalSharedTier 模拟多个 worker。
+    """
+
+    def __init__(self):
+        self._values = {}  # key -> (过期时间或None, 值)
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._values.get(key)
+        if entry is not None and entry[0] is not None and entry[0] <= now:
+            del self._values[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            return entry[1] if entry else None
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._values[key] = (time.monotonic() + ttl if ttl else None, value)
+
+    def add(self, key, value, ttl):
+        """键不存在时写入（对应 SET NX PX），返回是否写入成功"""
+        with self._lock:
+            now = time.monotonic()
+            if self._live(key, now) is not None:
+                return False
+            self._values[key] = (now + ttl, value)
+            return True
+
+    def incr(self, key):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            value = int(entry[1]) + 1 if entry else 1
+            self._values[key] = (None, str(value).encode())
+            return value
+
+    def delete(self, key, expected=None):
+        """删除键；指定 expected 时只在值相同时删除（释放自己持有的锁）"""
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            if entry is not None and (expected is None or entry[1] == expected):
+                del self._values[key]
+
+    def hset_many(self, key, mapping, ttl):
+        with self._lock:
+            self._values[key] = (time.monotonic() + ttl, dict(mapping))
+
+    def hget(self, key, field):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            return entry[1].get(field) if entry else None
+
+    def hadd(self, key, field, value, ttl):
+        with self._lock:
+            now = time.monotonic()
+            entry = self._live(key, now)
+            if entry is None:
+                entry = self._values[key] = (now + ttl, {})
+            if field in entry[1]:
+                return False
+            entry[1][field] = value
+            return True
+
+    def hdel(self, key, field):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            if entry is not None:
+                entry[1].pop(field, None)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class RedisTier:
+    """基于 Redis 的共享缓存层，多个 worker 进程共享缓存值和版本号"""
+
+    RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+    # 只在键没有过期时间时（新建的键）设置有效期，不延长已有键；
+    # 不使用 PEXPIRE 的 NX 选项，它需要 Redis 7
+    HADD_SCRIPT = """
+local added = redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2])
+if redis.call('PTTL', KEYS[1]) == -1 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[3])
+end
+return added
+"""
+
+    def __init__(self, url, prefix='cache:'):
+        if redis is None:
+            raise RuntimeError('使用共享缓存需要安装 redis 包')
+        self.client = redis.Redis.from_url(url, socket_timeout=1)
+        self.prefix = prefix
+        self._release = self.client.register_script(self.RELEASE_SCRIPT)
+        self._hadd = self.client.register_script(self.HADD_SCRIPT)
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key, value, ttl):
+        return bool(self.client.set(self.prefix + key, value, px=int(ttl * 1000), nx=True))
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def delete(self, key, expected=None):
+        if expected is None:
+            self.client.delete(self.prefix + key)
+        else:
+            self._release(keys=[self.prefix + key], args=[expected])
+
+    def hset_many(self, key, mapping, ttl):
+        pipeline = self.client.pipeline()
+        pipeline.delete(self.prefix + key)
+        pipeline.hset(self.prefix + key, mapping=mapping)
+        pipeline.pexpire(self.prefix + key, int(ttl * 1000))
+        pipeline.execute()
+
+    def hget(self, key, field):
+        return self.client.hget(self.prefix + key, field)
+
+    def hadd(self, key, field, value, ttl):
+        return bool(self._hadd(keys=[self.prefix + key], args=[field, value, int(ttl * 1000)]))
+
+    def hdel(self, key, field):
+        self.client.hdel(self.prefix + key, field)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+
+class Cache:
+    """两级缓存：进程内LRU + 可选的共享层（Redis）
+
+    缓存键带版本号，版本号由调用方提供，通常是数据表的版本号（utils.etag.get_table_versions）：
+    版本号保存在数据库中，所有进程看到同一个值，写入提交后旧版本的键自然不再被读取，
+    不需要逐个删除，也不依赖共享层。
+
+    防击穿：同一进程内同一个键只有一个线程执行加载函数，其他线程等待结果；
+    有共享层时再用带过期时间的锁保证所有进程中只有一个在回源，其余轮询共享层。
+    """
+
+    def __init__(self, shared=None, max_entries=10000, default_ttl=300, lock_timeout=5.0):
+        self._flights = {}  # 键 -> threading.Event
+        self._flights_lock = threading.Lock()
+        self.configure(shared, max_entries, default_ttl, lock_timeout)
+
+    def configure(self, shared=None, max_entries=10000, default_ttl=300, lock_timeout=5.0):
+        self.local = LRUTier(max_entries)
+        self.shared = shared
+        self.default_ttl = default_ttl
+        self.lock_timeout = lock_timeout
+
+    def get_or_load(self, namespace, version, key, loader, ttl=None):
+        """读取缓存，未命中时调用 loader() 加载并写入两级缓存
+
+        loader 的返回值需要能被 msgpack 序列化（有共享层时）。
+
+        Args:
+            version: 数据的版本号，数据变更后版本号改变，旧版本的缓存随之失效
+        """
+        ttl = ttl or self.default_ttl
+        full_key = f'{namespace}:{version}:{key}'
+        value = self.local.get(full_key)
+        if value is not _MISSING:
+            return value
+
+        with self._flights_lock:
+            flight = self._flights.get(full_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[full_key] = threading.Event()
+        if not leader:
+            flight.wait(self.lock_timeout)
+            value = self.local.get(full_key)
+            if value is not _MISSING:
+                return value
+            return loader()  # 加载线程失败或超时，自行加载
+
+        try:
+            value = self._load_shared(full_key, loader, ttl)
+            self.local.set(full_key, value, ttl)
+            return value
+        finally:
+            with self._flights_lock:
+                self._flights.pop(full_key, None)
+            flight.set()
+
+    def _load_shared(self, full_key, loader, ttl):
+        if self.shared is None:
+            return loader()
+        try:
+            raw = self.shared.get(full_key)
+            if raw is not None:
+                return msgpack.unpackb(raw, raw=False)
+            token = uuid.uuid4().hex.encode()
+            if not self.shared.add(f'lock:{full_key}', token, self.lock_timeout):
+                # 其他进程正在回源，等它写入共享层
+                deadline = time.monotonic() + self.lock_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(0.02)
+                    raw = self.shared.get(full_key)
+                    if raw is not None:
+                        return msgpack.unpackb(raw, raw=False)
+                return loader()
+        except Exception:
+            # 共享层故障时退化为只用本地缓存
+            return loader()
+
+        try:
+            value = loader()
+            try:
+                self.shared.set(full_key, msgpack.packb(value, use_bin_type=True), ttl)
+            except Exception:
+                pass
+            return value
+        finally:
+            try:
+                self.shared.delete(f'lock:{full_key}', expected=token)
+            except Exception:
+                pass
+
+    # 以下读写不带版本号，用于保存会话等可变状态：有共享层时只读写共享层（各进程看到同一份），
+    # 否则保存在本地LRU中
+
+    def _pack(self, value):
+        return msgpack.packb(value, use_bin_type=True)
+
+    def _unpack(self, raw):
+        return None if raw is None else msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+    def get(self, key):
+        if self.shared is not None:
+            return self._unpack(self.shared.get(key))
+        value = self.local.get(key)
+        return None if value is _MISSING else value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl or self.default_ttl
+        if self.shared is not None:
+            self.shared.set(key, self._pack(value), ttl)
+        else:
+            self.local.set(key, value, ttl)
+
+    def delete(self, *keys):
+        for key in keys:
+            if self.shared is not None:
+                self.shared.delete(key)
+            else:
+                self.local.delete(key)
+
+    def hset_many(self, key, mapping, ttl=None):
+        """整体写入一个字典（Redis 中为 hash），之后可以按字段 O(1) 读取"""
+        ttl = ttl or self.default_ttl
+        if self.shared is not None:
+            self.shared.hset_many(key, {str(field): self._pack(value) for field, value in mapping.items()}, ttl)
+        else:
+            self.local.set(key, {str(field): value for field, value in mapping.items()}, ttl)
+
+    def hget(self, key, field):
+        if self.shared is not None:
+            return self._unpack(self.shared.hget(key, str(field)))
+        value = self.local.hget(key, str(field))
+        return None if value is _MISSING else value
+
+    def hadd(self, key, field, value, ttl=None):
+        """字段不存在时写入，返回是否写入成功（可用于保证同一操作只执行一次）"""
+        ttl = ttl or self.default_ttl
+        if self.shared is not None:
+            return self.shared.hadd(key, str(field), self._pack(value), ttl)
+        return self.local.hadd(key, str(field), value, ttl)
+
+    def hdel(self, key, field):
+        if self.shared is not None:
+            self.shared.hdel(key, str(field))
+        else:
+            self.local.hdel(key, str(field))
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+
+# 全局缓存实例
+cache = Cache()
+
+
+def init_cache(app):
+    """按配置初始化缓存：memory:// 只使用进程内缓存，redis:// 增加共享层"""
+    url = app.config.get('CACHE_STORAGE_URL', 'memory://')
+    shared = None if url.startswith('memory://') else RedisTier(url)
+    cache.configure(
+        shared=shared,
+        max_entries=app.config.get('CACHE_LOCAL_MAX_ENTRIES', 10000),
+        default_ttl=app.config.get('CACHE_DEFAULT_TTL', 300),
+        lock_timeout=app.config.get('CACHE_LOCK_TIMEOUT', 5.0)
+    )
@@ -0,0 +1,89 @@
+from datetime import datetime
+from sqlalchemy import event, inspect, select, func, literal
+from models import db, Question, QuestionChange
+
+OP_UPSERT = 'upsert'
+OP_DELETE = 'delete'
+
+
+def _question_changes(session):
+    """根据 flush 前的会话状态生成题目变更记录"""
+    now = datetime.utcnow()
+    rows = []
+
+    for obj in session.new:
+        if isinstance(obj, Question) and obj.id is not None:
+            rows.append({'question_id': obj.id, 'category_id': obj.category_id,
+                         'operation': OP_UPSERT if obj.is_active is not False else OP_DELETE,
+                         'changed_at': now})
+
+    for obj in session.dirty:
+        if not isinstance(obj, Question) or not session.is_modified(obj):
+            continue
+        category_history = inspect(obj).attrs.category_id.history
+        if category_history.deleted and category_history.deleted[0] != obj.category_id:
+            # 移动分类：旧分类的订阅者收到墓碑
+            rows.append({'question_id': obj.id, 'category_id': category_history.deleted[0],
+                         'operation': OP_DELETE, 'changed_at': now})
+        rows.append({'question_id': obj.id, 'category_id': obj.category_id,
+                     'operation': OP_UPSERT if obj.is_active else OP_DELETE,
+                     'changed_at': now})
+
+    for obj in session.deleted:
+        if isinstance(obj, Question):
+            rows.append({'question_id': obj.id, 'category_id': obj.category_id,
+                         'operation': OP_DELETE, 'changed_at': now})
+    return rows
+
+
+def _after_flush(session, flush_context):
+    rows = _question_changes(session)
+    if rows:
+        session.connection().execute(QuestionChange.__table__.insert(), rows)
+
+
+def record_question_changes(question_ids, operation, category_id=None):
+    """为绕过ORM的批量写入手动记录题目变更
+
+    Args:
+        question_ids: 题目ID列表
+        operation: OP_UPSERT 或 OP_DELETE
+        category_id: 变更对应的分类；为None时按题目当前分类记录
+    """
+    if not question_ids:
+        return
+    now = datetime.utcnow()
+    if category_id is None:
+        pairs = db.session.query(Question.id, Question.category_id).filter(
+            Question.id.in_(list(question_ids))
+        ).all()
+    else:
+        pairs = [(question_id, category_id) for question_id in question_ids]
+    rows = [{'question_id': question_id, 'category_id': cat_id, 'operation': operation, 'changed_at': now}
+            for question_id, cat_id in pairs]
+    if rows:
+        db.session.execute(QuestionChange.__table__.insert(), rows)
+
+
+def init_change_log(app):
+    """注册题目变更跟踪事件；变更日志为空时用现有题目回填一次"""
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+
+    with app.app_context():
+        if db.session.query(QuestionChange.id).first() is None:
+            now = datetime.utcnow()
+            backfill = select(
+                Question.id, Question.category_id, literal(OP_UPSERT), literal(now)
+            ).where(Question.is_active == True).order_by(Question.id)
+            db.session.execute(
+                QuestionChange.__table__.insert().from_select(
+                    ['question_id', 'category_id', 'operation', 'changed_at'], backfill
+                )
+            )
+            db.session.commit()
+
+
+def current_version():
+    """当前最新的变更版本号"""
+    return db.session.query(func.max(QuestionChange.id)).scalar() or 0
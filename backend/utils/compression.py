@@ -0,0 +1,148 @@
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+# 值得压缩的响应类型
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/jsonl',
+    'text/plain',
+    'text/csv',
+    'text/html',
+    'text/css',
+    'application/javascript',
+}
+
+
+class GzipStream:
+    """gzip流式压缩器"""
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliStream:
+    """brotli流式压缩器"""
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=min(level, 11))
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdStream:
+    """zstd流式压缩器"""
+
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+def available_encodings():
+    """当前环境可用的编码及其流式压缩器"""
+    encodings = {'gzip': GzipStream}
+    if brotli is not None:
+        encodings['br'] = BrotliStream
+    if zstandard is not None:
+        encodings['zstd'] = ZstdStream
+    return encodings
+
+
+def compress_bytes(encoding, data, level):
+    """一次性压缩完整数据"""
+    stream = available_encodings()[encoding](level)
+    return stream.compress(data) + stream.finish()
+
+
+def compress_iter(encoding, chunks, level):
+    """流式压缩生成器响应，逐块输出压缩结果"""
+    stream = available_encodings()[encoding](level)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+def choose_encoding(app):
+    """根据 Accept-Encoding 和服务端偏好选择压缩编码，不压缩时返回None"""
+    encodings = available_encodings()
+    preferred = [name for name in app.config.get('COMPRESSION_ALGORITHMS', ['gzip']) if name in encodings]
+    if not preferred:
+        return None
+    return request.accept_encodings.best_match(preferred)
+
+
+def _should_compress(response):
+    """判断响应是否适合压缩"""
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers or 'Content-Range' in response.headers:
+        return False
+    if 'no-transform' in response.headers.get('Cache-Control', ''):
+        return False
+    # send_file 等文件响应需要保留 Range 支持
+    if response.direct_passthrough:
+        return False
+    return response.mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def init_compression(app):
+    """注册响应压缩中间件"""
+
+    @app.after_request
+    def compress_response(response):
+        if not app.config.get('COMPRESSION_ENABLED', False) or not _should_compress(response):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(app)
+        if encoding is None:
+            return response
+
+        level = app.config.get('COMPRESSION_LEVEL', 6)
+        if response.is_streamed:
+            # 生成器响应：长度未知，直接流式压缩
+            response.response = compress_iter(encoding, response.response, level)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < app.config.get('COMPRESSION_MIN_SIZE', 1024):
+                return response
+            response.set_data(compress_bytes(encoding, data, level))
+
+        response.headers['Content-Encoding'] = encoding
+        # 不同编码的响应体不同，强ETag需要降级为弱ETag
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    return compress_response
@@ -0,0 +1,245 @@
+import itertools
+import os
+import threading
+import time
+from datetime import datetime
+from flask import g, request, has_request_context, current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+from utils.rate_limit import client_ip
+
+# 只读请求的HTTP方法
+READ_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+def _is_write(clause):
+    if clause is None:
+        return False
+    if isinstance(clause, (UpdateBase, TextClause)):
+        # 原生SQL无法判断是否写入，按写入处理
+        return True
+    return getattr(clause, '_for_update_arg', None) is not None
+
+
+class RoutingSession(Session):
+    """按请求路由的会话：只读请求的查询发往副本，写入和 flush 始终使用主库
+
+    同一请求中一旦发生写入，后续查询也改用主库，保证请求内读到自己的写入。
+    没有请求上下文（命令行脚本、后台任务）时始终使用主库。
+    副本查询出现连接类错误（OperationalError）时，本请求改用主库重试，并暂停使用该副本。
+    """
+
+    def execute(self, *args, **kwargs):
+        return self._read_with_fallback(super().execute, *args, **kwargs)
+
+    def scalar(self, *args, **kwargs):
+        return self._read_with_fallback(super().scalar, *args, **kwargs)
+
+    def scalars(self, *args, **kwargs):
+        return self._read_with_fallback(super().scalars, *args, **kwargs)
+
+    def _read_with_fallback(self, method, *args, **kwargs):
+        read_bind = g.get('db_read_bind') if has_request_context() else None
+        try:
+            return method(*args, **kwargs)
+        except OperationalError:
+            if read_bind is None or g.get('db_read_bind') != read_bind:
+                raise
+            # 副本宕机：不等下一次心跳检测，立即停用该副本；只读请求没有未提交的写入，回滚后在主库重试
+            g.db_read_bind = None
+            replica_router.mark_unavailable(read_bind)
+            self.rollback()
+            return method(*args, **kwargs)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            read_bind = g.get('db_read_bind')
+            if read_bind is not None:
+                if self._flushing or _is_write(clause):
+                    g.db_read_bind = None
+                else:
+                    engine = self._db.engines.get(read_bind)
+                    if engine is not None and not self._has_own_bind(mapper, clause):
+                        return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    @staticmethod
+    def _has_own_bind(mapper, clause):
+        # 显式指定了 __bind_key__ 的模型仍按原配置路由（默认元数据的 bind_key 为 None）
+        table = getattr(mapper, 'local_table', None) if mapper is not None else clause
+        metadata = getattr(table, 'metadata', None)
+        return metadata is not None and metadata.info.get('bind_key') is not None
+
+
+class ReplicaRouter:
+    """只读副本路由
+
+    后台线程定期向主库写入心跳时间并从各副本读回，两者之差即为复制延迟；
+    延迟超过上限或连接失败的副本暂停使用，只读请求回退到主库。心跳不在请求中执行，
+    第一次检测完成之前所有请求都读主库。
+    用户写入后的一段时间内，其只读请求也走主库（读己之写）。
+    粘滞记录保存在进程内存中，多 worker 部署时需配合会话粘滞的负载均衡，
+    或把粘滞时间设为不小于最大复制延迟。
+    """
+
+    def __init__(self):
+        self.replicas = []
+        self.max_lag = 5
+        self.check_interval = 2
+        self.sticky_seconds = 10
+        self.lag = {}  # 副本 -> 延迟秒数（None 表示不可用）
+        self._healthy = []
+        self._next_check = 0.0
+        self._check_lock = threading.Lock()
+        self._monitor_lock = threading.Lock()
+        self._monitor_pid = None
+        self._stop = threading.Event()
+        self._cycle = itertools.cycle(())
+        self._sticky = {}  # 身份 -> 粘滞截止时间
+        self.max_sticky_keys = 100000
+
+    def configure(self, replicas, max_lag=5, check_interval=2, sticky_seconds=10):
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        self.lag = {}
+        self._healthy = []
+        self._next_check = 0.0
+        self._cycle = itertools.cycle(())
+        self._sticky.clear()
+        # 停止旧配置的检测线程，新线程在下一个请求到来时启动
+        self._stop.set()
+        self._stop = threading.Event()
+        self._monitor_pid = None
+
+    def _ensure_monitor(self):
+        # 多进程部署时 fork 之后的子进程需要自己的检测线程；check_interval 为 None 时不自动检测
+        if self.check_interval is None or self._monitor_pid == os.getpid():
+            return
+        with self._monitor_lock:
+            if self._monitor_pid == os.getpid():
+                return
+            thread = threading.Thread(target=self._monitor, args=(current_app._get_current_object(), self._stop),
+                                      name='replica-monitor', daemon=True)
+            thread.start()
+            self._monitor_pid = os.getpid()
+
+    def _monitor(self, app, stop):
+        with app.app_context():
+            while not stop.is_set():
+                self.check(force=True)
+                stop.wait(self.check_interval)
+
+    def check(self, force=False):
+        """写入心跳并测量各副本延迟，每 check_interval 秒最多执行一次（由后台线程调用）"""
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+        if not self._check_lock.acquire(blocking=False):
+            return  # 其他线程正在检查，沿用上次结果
+        try:
+            self._next_check = now + (self.check_interval or 0)
+            self._measure()
+        finally:
+            self._check_lock.release()
+
+    def _measure(self):
+        from models import db, ReplicationHeartbeat
+
+        table = ReplicationHeartbeat.__table__
+        engines = db.engines
+        beat_at = datetime.utcnow()
+        try:
+            with engines[None].begin() as connection:
+                if connection.execute(table.update().where(table.c.id == 1).values(beat_at=beat_at)).rowcount == 0:
+                    connection.execute(table.insert().values(id=1, beat_at=beat_at))
+        except Exception:
+            # 主库写入失败时无法判断延迟，保持上次结果
+            return
+
+        lag = {}
+        for key in self.replicas:
+            try:
+                with engines[key].connect() as connection:
+                    replica_beat = connection.execute(table.select().where(table.c.id == 1)).first()
+                lag[key] = (beat_at - replica_beat.beat_at).total_seconds() if replica_beat else None
+            except Exception:
+                lag[key] = None
+        self.lag = lag
+        self._set_healthy([key for key in self.replicas if lag[key] is not None and lag[key] <= self.max_lag])
+
+    def _set_healthy(self, healthy):
+        if healthy != self._healthy:
+            self._healthy = healthy
+            self._cycle = itertools.cycle(healthy)
+
+    def mark_unavailable(self, key):
+        """查询副本失败时调用，下一次心跳检测前不再使用该副本"""
+        lag = dict(self.lag)
+        lag[key] = None
+        self.lag = lag
+        self._set_healthy([healthy for healthy in self._healthy if healthy != key])
+
+    @staticmethod
+    def _identities():
+        """返回 (令牌键, 客户端IP键)
+
+        反向代理之后所有客户端可能共用一个地址，带令牌的写入只对该令牌粘滞；注册、登录等写入还没有令牌，
+        按客户端IP粘滞（与限流相同，部署在代理之后时需开启 RATE_LIMIT_TRUST_PROXY）。
+        """
+        token = request.headers.get('Authorization')
+        return (f'token:{token}' if token else None), f'ip:{client_ip()}'
+
+    def is_sticky(self, now=None):
+        now = time.monotonic() if now is None else now
+        return any(self._sticky.get(key, 0) > now for key in self._identities() if key)
+
+    def mark_write(self, now=None):
+        now = time.monotonic() if now is None else now
+        if len(self._sticky) > self.max_sticky_keys:
+            self._sticky = {key: until for key, until in self._sticky.items() if until > now}
+        token_key, ip_key = self._identities()
+        self._sticky[token_key or ip_key] = now + self.sticky_seconds
+
+    def choose(self):
+        """为当前只读请求选择副本，没有可用副本时返回 None（使用主库）"""
+        if not self.replicas or self.is_sticky():
+            return None
+        self._ensure_monitor()
+        if not self._healthy:
+            return None
+        try:
+            return next(self._cycle)
+        except StopIteration:
+            return None
+
+
+# 全局副本路由实例
+replica_router = ReplicaRouter()
+
+
+def init_db_routing(app):
+    """配置了只读副本时注册请求路由"""
+    replicas = [key for key in app.config.get('DB_REPLICA_BINDS') or () if key in (app.config.get('SQLALCHEMY_BINDS') or {})]
+    replica_router.configure(
+        replicas,
+        max_lag=app.config.get('DB_REPLICA_MAX_LAG_SECONDS', 5),
+        check_interval=app.config.get('DB_REPLICA_CHECK_SECONDS', 2),
+        sticky_seconds=app.config.get('DB_READ_STICKY_SECONDS', 10)
+    )
+    if not replicas:
+        return
+
+    @app.before_request
+    def route_read_requests():
+        g.db_read_bind = replica_router.choose() if request.method in READ_METHODS else None
+
+    @app.after_request
+    def remember_writes(response):
+        # GET 中的维护性写入（如清理过期记录）不是用户数据变更，不触发粘滞
+        if request.method not in READ_METHODS and response.status_code < 400:
+            replica_router.mark_write()
+        return response
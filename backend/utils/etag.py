@@ -0,0 +1,134 @@
+from functools import wraps
+import hashlib
+from datetime import datetime
+from flask import g, request, make_response, current_app, has_request_context
+from sqlalchemy import event
+from models import db, TableVersion
+
+# 需要维护版本号的数据表
+TRACKED_TABLES = {'categories', 'questions'}
+
+
+def bump_table_version(*table_names, connection=None):
+    """递增数据表版本号
+
+    ORM 写入会在 flush 时自动递增；批量 UPDATE/DELETE 等绕过 ORM 的写入需要手动调用。
+
+    Args:
+        table_names: 需要递增的表名
+        connection: 可选的数据库连接，默认使用当前会话的连接
+    """
+    if connection is None:
+        connection = db.session.connection()
+    table = TableVersion.__table__
+    now = datetime.utcnow()
+    for table_name in sorted(set(table_names)):
+        result = connection.execute(
+            table.update()
+            .where(table.c.table_name == table_name)
+            .values(version=table.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(table_name=table_name, version=1, updated_at=now))
+
+
+def get_table_versions(table_names):
+    """读取数据表版本号
+
+    只读请求（GET/HEAD）内每张表只读取一次，ETag 和按版本号缓存的数据共用同一次查询；
+    写入请求中提交后版本号会变化，每次重新读取。
+
+    Returns:
+        dict: 表名 -> 版本号，没有记录的表视为0
+    """
+    memo = None
+    if has_request_context() and request.method in ('GET', 'HEAD'):
+        memo = g.setdefault('table_versions', {})
+        missing = [name for name in table_names if name not in memo]
+    else:
+        missing = list(table_names)
+
+    versions = {name: 0 for name in missing}
+    if missing:
+        rows = db.session.query(TableVersion.table_name, TableVersion.version).filter(
+            TableVersion.table_name.in_(missing)
+        ).all()
+        versions.update({name: version for name, version in rows})
+    if memo is None:
+        return versions
+    memo.update(versions)
+    return {name: memo[name] for name in table_names}
+
+
+def _changed_tables(session):
+    """收集本次 flush 中被修改的受跟踪数据表"""
+    tables = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table_name = getattr(obj, '__tablename__', None)
+        if table_name in TRACKED_TABLES and (obj not in session.dirty or session.is_modified(obj)):
+            tables.add(table_name)
+    return tables
+
+
+def _after_flush(session, flush_context):
+    # after_flush 中 new/dirty/deleted 仍保留 flush 前的状态
+    tables = _changed_tables(session)
+    if tables:
+        bump_table_version(*tables, connection=session.connection())
+
+
+def init_table_versions(app):
+    """注册版本号跟踪事件，并为受跟踪的表创建初始版本记录"""
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+
+    with app.app_context():
+        existing = {row.table_name for row in TableVersion.query.all()}
+        for table_name in TRACKED_TABLES - existing:
+            db.session.add(TableVersion(table_name=table_name, version=0))
+        db.session.commit()
+
+
+def compute_etag(table_names, scope=''):
+    """根据数据表版本号和请求参数计算ETag"""
+    versions = get_table_versions(table_names)
+    raw = '|'.join(f'{name}:{versions[name]}' for name in sorted(versions))
+    raw = f'{raw}|{request.full_path}|{scope}'
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+def etag_cached(*table_names, per_user=False):
+    """装饰器：为只读接口提供条件GET支持
+
+    ETag 只依赖数据表版本号、请求路径和参数，命中 If-None-Match 时直接返回304，
+    不执行视图函数中的查询和序列化。需放在 token_required 之后（内层）使用。
+
+    Args:
+        table_names: 响应内容所依赖的数据表
+        per_user: 响应是否因用户而异（为True时ETag中包含当前用户ID）
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not current_app.config.get('ETAG_ENABLED', True):
+                return f(*args, **kwargs)
+
+            scope = ''
+            if per_user and args:
+                scope = f'user:{getattr(args[0], "id", "")}'
+            etag = compute_etag(table_names, scope)
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            # 客户端可以缓存，但每次使用前必须重新验证
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+        return decorated
+    return decorator
@@ -0,0 +1,210 @@
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from flask import request, g, jsonify, current_app, has_request_context, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 请求耗时直方图的桶边界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """固定桶边界的累计直方图"""
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """进程内指标注册表
+
+    每个 worker 进程各自统计，多进程部署时由 Prometheus 分别抓取后聚合。
+    """
+
+    def __init__(self, slow_query_samples=100):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)  # (endpoint, method, status) -> 次数
+        self.latency = defaultdict(Histogram)  # (endpoint, method) -> 直方图
+        self.sql_statements = defaultdict(int)  # endpoint -> SQL语句数
+        self.sql_seconds = defaultdict(float)  # endpoint -> SQL总耗时
+        self.slow_queries = defaultdict(int)  # endpoint -> 慢查询数
+        self.slow_query_samples = deque(maxlen=slow_query_samples)
+
+    def record_request(self, endpoint, method, status, seconds=None, sql_count=0, sql_seconds=0.0):
+        """记录一次请求；seconds为None表示该请求未被采样"""
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            if seconds is not None:
+                self.latency[(endpoint, method)].observe(seconds)
+                self.sql_statements[endpoint] += sql_count
+                self.sql_seconds[endpoint] += sql_seconds
+
+    def record_slow_query(self, endpoint, statement, seconds):
+        """记录慢查询样本"""
+        with self._lock:
+            self.slow_queries[endpoint] += 1
+            self.slow_query_samples.append({
+                'endpoint': endpoint,
+                'statement': statement[:500],
+                'duration_ms': round(seconds * 1000, 2),
+                'recorded_at': datetime.utcnow().isoformat()
+            })
+
+    def reset(self):
+        """清空所有指标"""
+        with self._lock:
+            self.requests.clear()
+            self.latency.clear()
+            self.sql_statements.clear()
+            self.sql_seconds.clear()
+            self.slow_queries.clear()
+            self.slow_query_samples.clear()
+
+    def render_prometheus(self):
+        """导出为 Prometheus 文本格式"""
+        with self._lock:
+            requests = dict(self.requests)
+            latency = {key: (list(h.counts), h.total, h.count) for key, h in self.latency.items()}
+            sql_statements = dict(self.sql_statements)
+            sql_seconds = dict(self.sql_seconds)
+            slow_queries = dict(self.slow_queries)
+
+        lines = [
+            '# HELP shuashuati_http_requests_total HTTP requests by endpoint, method and status.',
+            '# TYPE shuashuati_http_requests_total counter',
+        ]
+        for (endpoint, method, status), value in sorted(requests.items()):
+            lines.append(f'shuashuati_http_requests_total{{endpoint="{_escape(endpoint)}",'
+                         f'method="{method}",status="{status}"}} {value}')
+
+        lines += [
+            '# HELP shuashuati_http_request_duration_seconds Sampled request latency.',
+            '# TYPE shuashuati_http_request_duration_seconds histogram',
+        ]
+        for (endpoint, method), (counts, total, count) in sorted(latency.items()):
+            labels = f'endpoint="{_escape(endpoint)}",method="{method}"'
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f'shuashuati_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'shuashuati_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'shuashuati_http_request_duration_seconds_sum{{{labels}}} {total:.6f}')
+            lines.append(f'shuashuati_http_request_duration_seconds_count{{{labels}}} {count}')
+
+        for name, help_text, values, fmt in [
+            ('shuashuati_sql_statements_total', 'SQL statements executed by sampled requests.', sql_statements, '{}'),
+            ('shuashuati_sql_duration_seconds_total', 'SQL time spent by sampled requests.', sql_seconds, '{:.6f}'),
+            ('shuashuati_sql_slow_queries_total', 'SQL statements slower than the threshold.', slow_queries, '{}'),
+        ]:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for endpoint, value in sorted(values.items()):
+                lines.append(f'{name}{{endpoint="{_escape(endpoint)}"}} {fmt.format(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# 全局指标注册表
+metrics_registry = MetricsRegistry()
+
+
+def _current_endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and g.get('_metrics_sampled'):
+        conn.info.setdefault('_metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_metrics_query_start')
+    if not starts or not has_request_context() or not g.get('_metrics_sampled'):
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    g._metrics_sql_count += 1
+    g._metrics_sql_seconds += elapsed
+    if elapsed * 1000 >= current_app.config.get('METRICS_SLOW_QUERY_MS', 200):
+        metrics_registry.record_slow_query(_current_endpoint(), statement, elapsed)
+
+
+def _handle_error(context):
+    # 出错的语句不会触发 after_cursor_execute，开始时间要在这里取出，否则会留在连接池中的连接上
+    connection = context.connection
+    starts = connection.info.get('_metrics_query_start') if connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def init_metrics(app):
+    """注册请求指标中间件、SQL事件钩子和 /api/metrics 接口"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    @app.before_request
+    def start_request_metrics():
+        sample_rate = app.config.get('METRICS_SAMPLE_RATE', 1.0)
+        g._metrics_sampled = sample_rate >= 1.0 or random.random() < sample_rate
+        if g._metrics_sampled:
+            g._metrics_started = time.perf_counter()
+            g._metrics_sql_count = 0
+            g._metrics_sql_seconds = 0.0
+
+    @app.after_request
+    def record_request_metrics(response):
+        if request.endpoint == 'metrics':
+            return response
+        if g.get('_metrics_sampled'):
+            metrics_registry.record_request(
+                _current_endpoint(), request.method, response.status_code,
+                time.perf_counter() - g._metrics_started,
+                g._metrics_sql_count, g._metrics_sql_seconds
+            )
+        else:
+            metrics_registry.record_request(_current_endpoint(), request.method, response.status_code)
+        return response
+
+    def _authorized():
+        # 慢查询样本包含原始SQL，未配置令牌时只在开发和测试环境开放
+        token = app.config.get('METRICS_TOKEN')
+        if not token:
+            return app.debug or app.testing
+        return request.headers.get('Authorization') == f'Bearer {token}'
+
+    def metrics():
+        """Prometheus 指标接口"""
+        if not _authorized():
+            return jsonify({'error': '无权访问监控指标'}), 403
+        return Response(metrics_registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    def slow_queries():
+        """最近的慢查询样本"""
+        if not _authorized():
+            return jsonify({'error': '无权访问监控指标'}), 403
+        return jsonify({'slow_queries': list(metrics_registry.slow_query_samples)})
+
+    app.add_url_rule('/api/metrics', 'metrics', metrics, methods=['GET'])
+    app.add_url_rule('/api/metrics/slow-queries', 'metrics_slow_queries', slow_queries, methods=['GET'])
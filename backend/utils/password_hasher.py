@@ -0,0 +1,108 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = 'pbkdf2:sha256:600000'
+
+
+def canonical_method(method):
+    """哈希参数的完整写法
+
+    Werkzeug 会补全省略的参数（如 scrypt -> scrypt:32768:8:1，pbkdf2 -> pbkdf2:sha256:600000），
+    存储的哈希前缀是补全后的写法，这里对空密码哈希一次取出前缀用于比较。
+    """
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+class PasswordHasherBusy(Exception):
+    """密码哈希线程池已满，请求应被快速拒绝"""
+
+    def __init__(self, retry_after=1):
+        super().__init__('密码服务繁忙，请稍后重试')
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """有界线程池中的密码哈希/校验
+
+    PBKDF2/scrypt 在 hashlib 中执行时会释放 GIL，放到独立线程池里既能利用多核，
+    又能限制同时进行的哈希数量，避免登录高峰把所有请求线程的 CPU 吃光。
+    运行中 + 排队的任务超过上限时立即抛出 PasswordHasherBusy。
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, max_workers=None, max_pending=None, timeout=10):
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self.configure(method, max_workers, max_pending, timeout)
+
+    def configure(self, method=DEFAULT_METHOD, max_workers=None, max_pending=None, timeout=10):
+        """更新哈希参数和并发上限（已创建的线程池会在下次使用时重建）"""
+        with self._lock:
+            self.method = method
+            self._canonical_method = None
+            self.max_workers = max_workers or os.cpu_count() or 2
+            self.max_pending = self.max_workers * 2 if max_pending is None else max_pending
+            self.timeout = timeout
+            self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _get_executor(self):
+        # 多进程部署时 fork 之后的子进程需要自己的线程池
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='password-hasher')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, func, *args):
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHasherBusy()
+
+    def hash(self, password):
+        """按当前配置的算法和强度生成密码哈希"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """校验密码"""
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """哈希的算法或强度与当前配置不一致时返回True"""
+        if not password_hash or password_hash.count('$') < 2:
+            return True
+        if self._canonical_method is None:
+            # 第一次检查时计算，避免导入模块时就做一次完整强度的哈希
+            self._canonical_method = canonical_method(self.method)
+        return password_hash.split('$', 1)[0] != self._canonical_method
+
+
+# 全局密码哈希器实例
+password_hasher = PasswordHasher()
+
+
+def init_password_hasher(app):
+    """按应用配置初始化密码哈希器"""
+    password_hasher.configure(
+        method=app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+        max_workers=app.config.get('PASSWORD_HASH_WORKERS'),
+        max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING'),
+        timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+    )
@@ -0,0 +1,127 @@
+import json
+import os
+from collections import defaultdict
+from functools import wraps
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 各接口的查询预算基线文件
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'query_budgets.json')
+
+# 同一语句重复多少次视为疑似N+1
+DEFAULT_REPEAT_THRESHOLD = 3
+
+
+class QueryBudgetExceeded(AssertionError):
+    """查询数量超出预算或出现疑似N+1查询"""
+
+
+class QueryCounter:
+    """统计代码块内执行的SQL语句（用于测试）
+
+    用法:
+        with QueryCounter() as counter:
+            client.get('/api/categories?include_count=true', headers=headers)
+        assert counter.count <= 3, counter.report()
+    """
+
+    def __init__(self, engine=None):
+        """初始化计数器
+
+        Args:
+            engine: 要监听的引擎，默认监听所有引擎
+        """
+        self.target = engine if engine is not None else Engine
+        self.statements = []
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.target, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event.remove(self.target, 'before_cursor_execute', self._before_cursor_execute)
+        return False
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def repeated(self, threshold=DEFAULT_REPEAT_THRESHOLD):
+        """找出重复执行的语句
+
+        Returns:
+            list: [(SQL文本, 执行次数, 不同参数组数)]，参数不同的重复通常是循环内查询（N+1）
+        """
+        groups = defaultdict(list)
+        for statement, parameters in self.statements:
+            groups[statement].append(repr(parameters))
+        return sorted(
+            ((statement, len(params), len(set(params)))
+             for statement, params in groups.items() if len(params) >= threshold),
+            key=lambda item: -item[1]
+        )
+
+    def report(self, threshold=DEFAULT_REPEAT_THRESHOLD):
+        """生成便于阅读的统计报告"""
+        lines = [f'共执行 {self.count} 条SQL语句']
+        for statement, times, distinct in self.repeated(threshold):
+            kind = '疑似N+1' if distinct > 1 else '重复查询'
+            lines.append(f'[{kind}] 执行 {times} 次（{distinct} 组参数）: {" ".join(statement.split())[:200]}')
+        return '\n'.join(lines)
+
+    def assert_budget(self, max_queries, repeat_threshold=DEFAULT_REPEAT_THRESHOLD, allow_repeats=False):
+        """断言查询数量不超过预算，且没有疑似N+1查询"""
+        if self.count > max_queries:
+            raise QueryBudgetExceeded(f'SQL语句数 {self.count} 超出预算 {max_queries}\n{self.report(repeat_threshold)}')
+        if not allow_repeats and any(distinct > 1 for _, _, distinct in self.repeated(repeat_threshold)):
+            raise QueryBudgetExceeded(f'检测到疑似N+1查询\n{self.report(repeat_threshold)}')
+
+
+def load_budgets(path=BUDGET_FILE):
+    """读取查询预算基线：{'蓝图.视图函数': 最大语句数}"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['budgets']
+
+
+def get_budget(endpoint, path=BUDGET_FILE):
+    """获取某个接口的查询预算"""
+    budgets = load_budgets(path)
+    if endpoint not in budgets:
+        raise KeyError(f'{endpoint} 没有登记查询预算，请在 query_budgets.json 中补充')
+    return budgets[endpoint]
+
+
+class assert_max_queries:
+    """上下文管理器/装饰器：代码块内的SQL语句数不得超过预算
+
+    Args:
+        budget: 最大语句数，或 query_budgets.json 中登记的接口名
+        allow_repeats: 是否允许参数不同的重复语句
+    """
+
+    def __init__(self, budget, allow_repeats=False, repeat_threshold=DEFAULT_REPEAT_THRESHOLD):
+        self.budget = get_budget(budget) if isinstance(budget, str) else budget
+        self.allow_repeats = allow_repeats
+        self.repeat_threshold = repeat_threshold
+        self.counter = QueryCounter()
+
+    def __enter__(self):
+        self.counter.__enter__()
+        return self.counter
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.counter.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None:
+            self.counter.assert_budget(self.budget, self.repeat_threshold, self.allow_repeats)
+        return False
+
+    def __call__(self, f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            with assert_max_queries(self.budget, self.allow_repeats, self.repeat_threshold):
+                return f(*args, **kwargs)
+        return decorated
@@ -0,0 +1,191 @@
+import math
+import threading
+import time
+import zlib
+from functools import wraps
+from flask import request, jsonify, current_app
+
+try:
+    import redis
+except ImportError:  # 可选依赖，多进程共享限流时需要
+    redis = None
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(text):
+    """解析限流规则，如 '10/minute'、'100/hour'
+
+    Returns:
+        tuple: (每秒补充的令牌数, 桶容量)
+    """
+    count, _, period = text.partition('/')
+    count = int(count)
+    seconds = _PERIODS[period.strip().rstrip('s')]
+    return count / seconds, count
+
+
+class LocalBackend:
+    """进程内令牌桶存储
+
+    CPython 没有原子的比较交换操作，这里用按键哈希分片的锁代替全局锁：
+    不同键之间互不阻塞，同一键的更新仍然是原子的。
+    键数超过 max_keys 后，每 prune_interval 秒最多由一个请求清理一次空闲的桶。
+    """
+
+    def __init__(self, stripes=64, max_keys=100000, prune_interval=60):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._buckets = {}  # key -> (剩余令牌, 上次更新时间)
+        self.max_keys = max_keys
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+        self._prune_lock = threading.Lock()
+
+    def consume(self, key, rate, capacity, now=None):
+        """尝试消耗一个令牌
+
+        Returns:
+            tuple: (是否放行, 剩余令牌数, 需要等待的秒数)
+        """
+        now = time.monotonic() if now is None else now
+        if len(self._buckets) > self.max_keys and now >= self._next_prune:
+            self._maybe_prune(now)
+
+        lock = self._locks[zlib.crc32(key.encode()) % len(self._locks)]
+        with lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return True, int(tokens - 1), 0.0
+            self._buckets[key] = (tokens, now)
+            return False, 0, (1 - tokens) / rate
+
+    def _maybe_prune(self, now):
+        if not self._prune_lock.acquire(blocking=False):
+            return  # 其他线程正在清理
+        try:
+            if now >= self._next_prune:
+                self._next_prune = now + self.prune_interval
+                self.prune(now)
+        finally:
+            self._prune_lock.release()
+
+    def prune(self, now=None, idle_seconds=3600):
+        """清理长时间未使用的桶（已补满的桶与新建桶等价）"""
+        now = time.monotonic() if now is None else now
+        for key, (_, updated) in list(self._buckets.items()):
+            if now - updated > idle_seconds:
+                self._buckets.pop(key, None)
+
+    def reset(self):
+        self._buckets.clear()
+
+
+class RedisBackend:
+    """基于 Redis 的共享令牌桶，多个 worker 进程共享同一份计数"""
+
+    SCRIPT = """
+local tokens_ts = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tokens = tonumber(tokens_ts[1]) or capacity
+local ts = tonumber(tokens_ts[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens), tostring(wait)}
+"""
+
+    def __init__(self, url, prefix='ratelimit:'):
+        if redis is None:
+            raise RuntimeError('使用共享限流需要安装 redis 包')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(self.SCRIPT)
+
+    def consume(self, key, rate, capacity, now=None):
+        now = time.time() if now is None else now
+        allowed, tokens, wait = self._script(keys=[self.prefix + key], args=[rate, capacity, now])
+        return bool(allowed), int(float(tokens)), float(wait)
+
+    def reset(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """按配置创建限流存储：memory:// 为进程内存储，redis:// 为共享存储"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                url = current_app.config.get('RATE_LIMIT_STORAGE_URL', 'memory://')
+                _backend = LocalBackend() if url.startswith('memory://') else RedisBackend(url)
+    return _backend
+
+
+def set_backend(backend):
+    """替换限流存储（测试中可注入独立的 LocalBackend 模拟共享存储）"""
+    global _backend
+    _backend = backend
+
+
+def client_ip():
+    """客户端IP；部署在反向代理之后时需开启 RATE_LIMIT_TRUST_PROXY"""
+    if current_app.config.get('RATE_LIMIT_TRUST_PROXY') and request.headers.get('X-Forwarded-For'):
+        return request.headers['X-Forwarded-For'].split(',')[0].strip()
+    return request.remote_addr or 'unknown'
+
+
+def rate_limit(limit, key_by='user', scope=None):
+    """装饰器：按用户或IP对接口限流
+
+    key_by='user' 时需放在 token_required 之后（内层），使用当前用户ID作为键；
+    未登录接口使用 key_by='ip'。
+
+    Args:
+        limit: 限流规则，如 '10/minute'
+        key_by: 'user' 或 'ip'
+        scope: 限流分组名，默认使用视图函数名（多个接口可共享同一个桶）
+    """
+    rate, capacity = parse_rate(limit)
+
+    def decorator(f):
+        bucket_scope = scope or f.__name__
+
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not current_app.config.get('RATE_LIMIT_ENABLED', True):
+                return f(*args, **kwargs)
+
+            if key_by == 'user' and args and getattr(args[0], 'id', None) is not None:
+                identity = f'user:{args[0].id}'
+            else:
+                identity = f'ip:{client_ip()}'
+
+            allowed, _, wait = get_backend().consume(f'{bucket_scope}:{identity}', rate, capacity)
+            if not allowed:
+                retry_after = max(1, math.ceil(wait))
+                return jsonify({'error': '请求过于频繁，请稍后再试'}), 429, {
+                    'Retry-After': str(retry_after),
+                    'X-RateLimit-Limit': str(capacity),
+                    'X-RateLimit-Remaining': '0'
+                }
+            return f(*args, **kwargs)
+
+        return decorated
+    return decorator
@@ -0,0 +1,106 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from models import db, RevokedToken
+
+
+class RevocationSet:
+    """进程内的已吊销令牌集合
+
+    以过期字典（jti -> 过期时间）保存，每次检查只是一次字典查找；定期从 revoked_tokens 表
+    增量同步，使其他 worker 进程中的登出也能生效。令牌过期后对应条目会被清理。
+    sync_interval 为 None 时不从数据库同步（单进程或基准测试）。
+    """
+
+    def __init__(self, sync_interval=5):
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._expires = {}
+        self._last_revoked_at = None
+        self._next_sync = 0.0
+        self._next_prune = 0.0
+
+    def add(self, jti, expires_at):
+        """把令牌加入本进程的吊销集合"""
+        with self._lock:
+            self._expires[jti] = expires_at
+
+    def is_revoked(self, jti):
+        """判断令牌是否已吊销（不访问数据库）"""
+        if self.sync_interval is not None and time.monotonic() >= self._next_sync:
+            self.sync()
+        expires_at = self._expires.get(jti)
+        return expires_at is not None and expires_at > datetime.utcnow()
+
+    def sync(self):
+        """从数据库增量加载新吊销的令牌，并定期清理过期条目
+
+        读取和清理都使用独立的数据库连接，不会提交或回滚当前请求的会话；
+        数据库暂时不可用时沿用上次同步的结果，到下一个同步周期再重试。
+        """
+        with self._lock:
+            if time.monotonic() < self._next_sync:
+                return
+            self._next_sync = time.monotonic() + self.sync_interval
+
+        now = datetime.utcnow()
+        table = RevokedToken.__table__
+        query = select(table.c.jti, table.c.expires_at, table.c.revoked_at).where(table.c.expires_at > now)
+        if self._last_revoked_at is not None:
+            # 多留一段重叠窗口，容忍各 worker 之间的时钟偏差和事务提交延迟
+            query = query.where(table.c.revoked_at >= self._last_revoked_at - timedelta(seconds=60))
+        try:
+            with db.engine.connect() as connection:
+                rows = connection.execute(query).all()
+        except Exception:
+            return
+
+        with self._lock:
+            for jti, expires_at, revoked_at in rows:
+                self._expires[jti] = expires_at
+                if self._last_revoked_at is None or revoked_at > self._last_revoked_at:
+                    self._last_revoked_at = revoked_at
+
+        if time.monotonic() >= self._next_prune:
+            self.prune(now)
+
+    def prune(self, now=None):
+        """移除已过期的令牌（内存和数据库中），数据库清理失败时等下一次清理"""
+        now = now or datetime.utcnow()
+        with self._lock:
+            self._next_prune = time.monotonic() + 3600
+            self._expires = {jti: expires_at for jti, expires_at in self._expires.items() if expires_at > now}
+        table = RevokedToken.__table__
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(table.delete().where(table.c.expires_at <= now))
+        except Exception:
+            with self._lock:
+                self._next_prune = 0.0  # 下次同步时重试
+
+    def clear(self):
+        """清空本进程的吊销集合（下次检查时重新全量同步）"""
+        with self._lock:
+            self._reset()
+
+
+# 全局吊销集合实例
+revocation_set = RevocationSet()
+
+
+def revoke_token(jti, user_id, expires_at):
+    """吊销令牌：写入数据库并立即在本进程生效"""
+    if db.session.get(RevokedToken, jti) is None:
+        db.session.add(RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at))
+        db.session.commit()
+    revocation_set.add(jti, expires_at)
+
+
+def init_token_revocation(app):
+    """按配置初始化吊销集合"""
+    revocation_set.sync_interval = app.config.get('TOKEN_REVOCATION_SYNC_SECONDS', 5)
+    revocation_set.clear()